@@ -0,0 +1,38 @@
+import argparse
+import os
+import tempfile
+import time
+from argparse import Namespace
+
+from benchmarks.datagen import generate
+from src.csv_processor import process_csv
+
+
+def run(path, workers, where, aggregate):
+    args = Namespace(file=path, where=where, order_by=None, aggregate=aggregate, engine="python", workers=workers)
+    start = time.perf_counter()
+    result = process_csv(args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scaling of --workers for --where + --aggregate queries")
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--where", default="price>500")
+    parser.add_argument("--aggregate", default="rating=avg")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.csv")
+        generate(path, args.rows)
+
+        baseline, _ = run(path, 1, args.where, args.aggregate)
+        print(f"workers=1  {baseline:8.3f}s  speedup 1.00x")
+        for workers in range(2, args.max_workers + 1):
+            elapsed, _ = run(path, workers, args.where, args.aggregate)
+            print(f"workers={workers:<2} {elapsed:8.3f}s  speedup {baseline / elapsed:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+import argparse
+import random
+import string
+from dataclasses import dataclass
+from typing import List, Iterator
+
+
+@dataclass
+class ColumnSpec:
+    name: str
+    kind: str = 'str'
+    cardinality: int = 0
+    width: int = 8
+    low: float = 0
+    high: float = 1000
+
+    @classmethod
+    def parse(cls, text: str) -> 'ColumnSpec':
+        # name:kind[:key=value...], например "brand:str:card=5:width=10" или "price:int:low=100:high=1500"
+        name, kind, *options = text.split(':')
+        if kind not in ('str', 'int', 'float'):
+            raise ValueError(f"Unknown column type '{kind}' in '{text}'. Use: str, int, float")
+
+        spec = cls(name, kind)
+        for option in options:
+            key, value = option.split('=', 1)
+            if key == 'card':
+                spec.cardinality = int(float(value))
+            elif key == 'width':
+                spec.width = int(value)
+            elif key in ('low', 'high'):
+                setattr(spec, key, float(value))
+            else:
+                raise ValueError(f"Unknown column option '{key}' in '{text}'")
+        return spec
+
+
+DEFAULT_COLUMNS = [
+    ColumnSpec('name', 'str', cardinality=0, width=16),
+    ColumnSpec('brand', 'str', cardinality=5, width=8),
+    ColumnSpec('price', 'int', low=100, high=1500),
+    ColumnSpec('rating', 'float', low=1, high=5),
+]
+
+
+def _word(rng: random.Random, width: int) -> str:
+    return ''.join(rng.choices(string.ascii_lowercase, k=width))
+
+
+class _ColumnGenerator:
+    def __init__(self, spec: ColumnSpec, rng: random.Random):
+        self.spec = spec
+        self.rng = rng
+        self.pool = None
+        if spec.cardinality:
+            # Словарь значений строится заранее, чтобы кардинальность была точной
+            self.pool = [self._fresh() for _ in range(spec.cardinality)]
+
+    def _fresh(self) -> str:
+        spec, rng = self.spec, self.rng
+        if spec.kind == 'int':
+            return str(rng.randint(int(spec.low), int(spec.high)))
+        if spec.kind == 'float':
+            return f"{rng.uniform(spec.low, spec.high):.2f}"
+        return _word(rng, spec.width)
+
+    def __call__(self) -> str:
+        if self.pool is not None:
+            return self.rng.choice(self.pool)
+        return self._fresh()
+
+
+def generate_rows(columns: List[ColumnSpec], rows: int, seed: int = 42) -> Iterator[str]:
+    rng = random.Random(seed)
+    generators = [_ColumnGenerator(spec, rng) for spec in columns]
+    yield ','.join(spec.name for spec in columns) + '\n'
+    for _ in range(rows):
+        yield ','.join(generate() for generate in generators) + '\n'
+
+
+def generate(path: str, rows: int, columns: List[ColumnSpec] = None, seed: int = 42):
+    with open(path, 'w', encoding='utf-8', newline='') as file:
+        file.writelines(generate_rows(columns or DEFAULT_COLUMNS, rows, seed))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Deterministic synthetic CSV generator')
+    parser.add_argument('output', help='Path of the CSV file to write')
+    parser.add_argument('--rows', type=lambda value: int(float(value)), default=100_000,
+                        help='Number of data rows, e.g. 1e6 (default: 100000)')
+    parser.add_argument('--column', action='append', type=ColumnSpec.parse, default=None,
+                        help='Column spec name:type[:card=N][:width=N][:low=X][:high=X]; repeat for each column')
+    parser.add_argument('--extra-columns', type=int, default=0,
+                        help='Append this many padding string columns to make rows wider')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    columns = list(args.column or DEFAULT_COLUMNS)
+    columns += [ColumnSpec(f'extra{i}', 'str', width=12) for i in range(args.extra_columns)]
+    generate(args.output, args.rows, columns, args.seed)
+
+
+if __name__ == '__main__':
+    main()
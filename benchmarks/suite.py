@@ -0,0 +1,177 @@
+import argparse
+import contextlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from typing import List, Dict, Any, Callable, Optional
+
+from benchmarks.datagen import DEFAULT_COLUMNS, ColumnSpec, generate
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+SIZES = [10_000, 100_000, 1_000_000]
+CASES = ['read_csv', 'apply_filter', 'aggregate_data', 'apply_sort', 'main', 'main_wide']
+# main читает узкий файл из 4 колонок, main_wide — тот же запрос по файлу из 120 колонок:
+# так видно обе стороны порога, после которого агрегат читает только нужные колонки
+WIDE_CASES = ('main_wide',)
+WIDE_COLUMNS = DEFAULT_COLUMNS + [ColumnSpec(f'extra{i}', 'int', low=0, high=100000) for i in range(116)]
+WHERE = 'price>500'
+AGGREGATE = 'rating=avg'
+ORDER_BY = 'price=desc'
+
+
+def peak_rss_mb() -> Optional[float]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux отдаёт килобайты, macOS — байты
+    return peak / (1 << 20) if sys.platform == 'darwin' else peak / 1024
+
+
+def _prepare(case: str, path: str) -> Callable[[], Any]:
+    from src.csv_processor import read_csv, apply_filter, aggregate_data, apply_sort
+
+    if case == 'read_csv':
+        return lambda: read_csv(path)
+    if case in ('main', 'main_wide'):
+        return lambda: _run_main(path)
+
+    data = read_csv(path)
+    if case == 'apply_filter':
+        return lambda: apply_filter(data, WHERE)
+    if case == 'aggregate_data':
+        return lambda: aggregate_data(data, AGGREGATE)
+    if case == 'apply_sort':
+        return lambda: apply_sort(data, ORDER_BY)
+    raise ValueError(f"Unknown benchmark case: {case}")
+
+
+def _run_main(path: str):
+    import main as cli
+    argv = sys.argv
+    sys.argv = ['main.py', '--file', path, '--where', WHERE, '--aggregate', AGGREGATE]
+    try:
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            cli.main()
+    finally:
+        sys.argv = argv
+
+
+def measure(case: str, path: str, repeat: int) -> Dict[str, Any]:
+    func = _prepare(case, path)
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return {'seconds': min(timings), 'peak_rss_mb': peak_rss_mb()}
+
+
+def run_case(case: str, path: str, rows: int, repeat: int) -> Dict[str, Any]:
+    # Каждый замер в отдельном процессе, чтобы пиковая память относилась только к нему
+    output = subprocess.run(
+        [sys.executable, '-m', 'benchmarks.suite', '--measure', case, '--file', path, '--repeat', str(repeat)],
+        check=True, capture_output=True, text=True,
+    ).stdout
+    result = json.loads(output)
+    size_mb = os.path.getsize(path) / (1 << 20)
+    seconds = result['seconds']
+    return {
+        'case': case,
+        'rows': rows,
+        'seconds': seconds,
+        'rows_per_sec': rows / seconds if seconds else None,
+        'mb_per_sec': size_mb / seconds if seconds else None,
+        'peak_rss_mb': result['peak_rss_mb'],
+    }
+
+
+def compare(results: List[Dict[str, Any]], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    previous = {(entry['case'], entry['rows']): entry for entry in baseline['results']}
+    regressions = []
+    for entry in results:
+        old = previous.get((entry['case'], entry['rows']))
+        if old is None:
+            continue
+        ratio = entry['seconds'] / old['seconds']
+        entry['baseline_ratio'] = ratio
+        if ratio > 1 + threshold:
+            regressions.append(f"{entry['case']} @ {entry['rows']} rows: {ratio:.2f}x slower than baseline")
+    return regressions
+
+
+def print_table(results: List[Dict[str, Any]]):
+    print(f"{'case':<16}{'rows':>10}{'seconds':>10}{'rows/s':>14}{'MB/s':>9}{'RSS MB':>9}{'vs base':>9}")
+    for entry in results:
+        rss = entry['peak_rss_mb']
+        ratio = entry.get('baseline_ratio')
+        print(f"{entry['case']:<16}{entry['rows']:>10}{entry['seconds']:>10.3f}{entry['rows_per_sec']:>14,.0f}"
+              f"{entry['mb_per_sec']:>9.1f}{'-' if rss is None else f'{rss:.0f}':>9}"
+              f"{'-' if ratio is None else f'{ratio:.2f}x':>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark read/filter/aggregate/sort and the main.py path')
+    parser.add_argument('--sizes', type=lambda value: [int(float(size)) for size in value.split(',')],
+                        default=SIZES, help='Comma-separated row counts, e.g. 1e4,1e5,1e6,1e7')
+    parser.add_argument('--cases', type=lambda value: value.split(','), default=CASES,
+                        help=f"Comma-separated cases (default: {','.join(CASES)})")
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per case; the fastest is reported')
+    parser.add_argument('--data-dir', default=None, help='Keep generated CSV files here and reuse them')
+    parser.add_argument('--output', default=None, help='Write results as JSON to this file')
+    parser.add_argument('--baseline', default=None, help='Compare with a JSON file from a previous run')
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help='Relative slowdown reported as a regression (default: 0.10)')
+    parser.add_argument('--measure', default=None, help=argparse.SUPPRESS)
+    parser.add_argument('--file', default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        print(json.dumps(measure(args.measure, args.file, args.repeat)))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = args.data_dir or tmp
+        os.makedirs(data_dir, exist_ok=True)
+        results = []
+        for rows in args.sizes:
+            for case in args.cases:
+                wide = case in WIDE_CASES
+                path = os.path.join(data_dir, f"bench_{rows}{'_wide' if wide else ''}.csv")
+                if not os.path.exists(path):
+                    generate(path, rows, WIDE_COLUMNS if wide else None)
+                results.append(run_case(case, path, rows, args.repeat))
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as file:
+            regressions = compare(results, json.load(file), args.threshold)
+
+    print_table(results)
+    if args.output:
+        report = {
+            'meta': {
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            },
+            'results': results,
+        }
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2)
+
+    for message in regressions:
+        print(f"REGRESSION: {message}", file=sys.stderr)
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,14 @@
 import sys
 from tabulate import tabulate
 from src.cli import parse_args
-from src.csv_processor import process_csv
+from src.aggregates import aggregate_label
+from src.csv_processor import SCALAR_TYPES, run_pipeline, parse_aggregation
+from src.index import build_index
+from src.partitions import input_paths
+from src.query import Query
+from src.result_cache import DiskResultCache
+from src.stats import Recorder, profiled
+from src.writers import open_output, write_grid, write_rows
 from src.exceptions import CSVProcessingError, FileValidationError, ArgumentError, FilterError, AggregationError, \
     ColumnNotFoundError, SortError, EmptyDataError, TypeConversionError
 
@@ -12,23 +19,78 @@ def print_error(message):
     print(f"{RED}Error: {message}{ENDC}", file=sys.stderr)
 
 
+def render(args, result):
+    output_format = args.output_format
+    if isinstance(result, SCALAR_TYPES):
+        col, func = parse_aggregation(args.aggregate[0])
+        header = aggregate_label(col, func)
+        if output_format == 'grid':
+            with open_output(args.output) as stream:
+                stream.write(tabulate([[result]], headers=[header], tablefmt="grid", floatfmt=".2f") + '\n')
+            return
+        result = [{header: result}]
+
+    if output_format != 'grid':
+        with open_output(args.output, binary=output_format == 'binary') as stream:
+            write_rows(result, output_format, stream)
+        return
+
+    options = {}
+    if args.group_by:
+        options = {'floatfmt': ".2f", 'disable_numparse': [0]}
+    elif args.aggregate:
+        options = {'floatfmt': ".2f"}
+    with open_output(args.output) as stream:
+        write_grid(result, stream, args.max_rows, **options)
+
+
 def main():
+    if sys.argv[1:2] == ['serve']:
+        from src.server import main as serve
+        serve(sys.argv[2:])
+        return
+
     try:
         args = parse_args()
-        result = process_csv(args)
+        if args.build_index:
+            for path in input_paths(args.file):
+                for col in args.build_index:
+                    print(f"Index for column '{col}' written to {build_index(path, col)}")
+            if not (args.where or args.aggregate or args.order_by):
+                return
 
-        if isinstance(result, list):
-            if not result:
-                print("No matching records found")
+        if args.explain:
+            print(Query.from_args(args).explain())
+            return
+
+        if args.follow:
+            from src.follow import follow
+            with open_output(args.output) as stream:
+                follow(args, stream)
+            return
+
+        recorder = Recorder() if args.stats or args.stats_json else None
+        with profiled(args.profile, sys.stderr):
+            if args.result_cache:
+                # Готовый результат того же запроса к неизменённому файлу берётся из кэша
+                result_cache = DiskResultCache(ttl=args.result_cache_ttl)
+                result = result_cache.process(args, recorder)
             else:
-                printable = [{k: v for k, v in row.items()} for row in result]
-                print(tabulate(printable, headers="keys", tablefmt="grid"))
-        else:
-            col, func = args.aggregate.split('=')
-            func_name = {'avg': 'average', 'min': 'minimum', 'max': 'maximum'}.get(func, func)
-            header = [f"{col} ({func_name})"]
-            table = [[result]]
-            print(tabulate(table, headers=header, tablefmt="grid", floatfmt=".2f"))
+                # Строки идут из конвейера прямо в выбранный формат, без промежуточного списка
+                result = run_pipeline(args, recorder)
+            if recorder is None:
+                render(args, result)
+            else:
+                recorder.track('render', lambda: render(args, result))
+
+        if recorder is not None:
+            recorder.finish()
+            if args.stats:
+                print(recorder.format(), file=sys.stderr)
+                if args.result_cache:
+                    print(f"Result cache: {'hit' if result_cache.hits else 'miss'}", file=sys.stderr)
+            if args.stats_json:
+                recorder.write_json(args.stats_json)
 
     except FileValidationError as e:
         print_error(str(e))
@@ -5,4 +5,5 @@ setup(
     version="0.1",
     packages=find_packages(),
     install_requires=["tabulate"],
+    extras_require={"numpy": ["numpy"], "zstd": ["zstandard"]},
 )
@@ -0,0 +1,260 @@
+import math
+import re
+from itertools import chain
+from typing import List, Dict, Any, Iterable, Optional, Sequence, Tuple, Union
+from src.exceptions import AggregationError
+
+Number = Union[int, float]
+
+AGGREGATE_FUNCTIONS = ('avg', 'min', 'max', 'sum', 'count', 'stddev', 'variance', 'median')
+AGGREGATE_LABELS = {'avg': 'average', 'min': 'minimum', 'max': 'maximum'}
+MOMENT_FUNCTIONS = ('stddev', 'variance')
+PERCENTILE_PATTERN = re.compile(r'p(\d+(?:\.\d+)?)')
+DEFAULT_COMPRESSION = 200
+
+
+def percentile_of(func_name: str) -> Optional[float]:
+    if func_name == 'median':
+        return 0.5
+
+    match = PERCENTILE_PATTERN.fullmatch(func_name)
+    if match is None or float(match.group(1)) > 100:
+        return None
+    return float(match.group(1)) / 100
+
+
+def is_aggregate_function(func_name: str) -> bool:
+    return func_name in AGGREGATE_FUNCTIONS or percentile_of(func_name) is not None
+
+
+def aggregate_label(col: str, func_name: str) -> str:
+    return f"{col} ({AGGREGATE_LABELS.get(func_name, func_name)})"
+
+
+def exact_quantile(values: Sequence[Number], q: float) -> Number:
+    # Линейная интерполяция между соседними значениями, как в numpy.percentile
+    values = sorted(values)
+    position = q * (len(values) - 1)
+    lower = math.floor(position)
+    fraction = position - lower
+    if not fraction:
+        return values[lower]
+    return values[lower] + (values[lower + 1] - values[lower]) * fraction
+
+
+class QuantileSketch:
+    # Сливающий t-digest: первые compression * 50 значений хранятся как есть и дают точный ответ,
+    # дальше они сжимаются в центроиды, число которых ограничено примерно compression
+    __slots__ = ('compression', 'buffer', 'means', 'weights')
+
+    def __init__(self, compression: int = DEFAULT_COMPRESSION):
+        self.compression = compression
+        self.buffer: List[Number] = []
+        self.means: List[float] = []
+        self.weights: List[int] = []
+
+    @property
+    def exact(self) -> bool:
+        return not self.weights
+
+    def add(self, value: Number):
+        self.buffer.append(value)
+        if len(self.buffer) >= self.compression * 50:
+            self.compress()
+
+    def merge(self, other: 'QuantileSketch') -> 'QuantileSketch':
+        if other.exact:
+            for value in other.buffer:
+                self.add(value)
+        else:
+            self.compress(other.means + other.buffer, other.weights + [1] * len(other.buffer))
+        return self
+
+    def compress(self, means: Sequence[float] = (), weights: Sequence[int] = ()):
+        points = sorted(chain(zip(self.means, self.weights), zip(means, weights), ((v, 1) for v in self.buffer)))
+        self.buffer = []
+        if not points:
+            return
+
+        total = sum(weight for _, weight in points)
+        scale = self.compression / (2 * math.pi)
+        merged_means = []
+        merged_weights = []
+        current_mean, current_weight = points[0]
+        done = 0
+        k_lower = scale * math.asin(-1)
+        for mean, weight in points[1:]:
+            q = (done + current_weight + weight) / total
+            if scale * math.asin(2 * q - 1) - k_lower <= 1:
+                current_weight += weight
+                current_mean += (mean - current_mean) * weight / current_weight
+                continue
+
+            merged_means.append(current_mean)
+            merged_weights.append(current_weight)
+            done += current_weight
+            k_lower = scale * math.asin(2 * done / total - 1)
+            current_mean, current_weight = mean, weight
+
+        merged_means.append(current_mean)
+        merged_weights.append(current_weight)
+        self.means = merged_means
+        self.weights = merged_weights
+
+    def quantile(self, q: float, minimum: Number, maximum: Number) -> Number:
+        if self.exact:
+            return exact_quantile(self.buffer, q)
+
+        self.compress()
+        total = sum(self.weights)
+        target = q * total
+        cumulative = 0
+        previous_center, previous_mean = 0, minimum
+        for mean, weight in zip(self.means, self.weights):
+            center = cumulative + weight / 2
+            if target < center:
+                return previous_mean + (mean - previous_mean) * (target - previous_center) / (center - previous_center)
+            previous_center, previous_mean = center, mean
+            cumulative += weight
+
+        if total <= previous_center:
+            return maximum
+        return previous_mean + (maximum - previous_mean) * (target - previous_center) / (total - previous_center)
+
+
+class Accumulator:
+    __slots__ = ('count', 'total', 'minimum', 'maximum', 'moments', 'mean', 'm2', 'sketch')
+
+    def __init__(self, functions: Iterable[str] = (), compression: int = DEFAULT_COMPRESSION):
+        functions = set(functions)
+        self.count = 0
+        self.total = 0
+        self.minimum: Optional[Number] = None
+        self.maximum: Optional[Number] = None
+        self.moments = any(func_name in MOMENT_FUNCTIONS for func_name in functions)
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.sketch = None
+        if any(percentile_of(func_name) is not None for func_name in functions):
+            self.sketch = QuantileSketch(compression)
+
+    def add(self, value: Number):
+        self.count += 1
+        self.total += value
+        if self.minimum is None or value < self.minimum:
+            self.minimum = value
+        if self.maximum is None or value > self.maximum:
+            self.maximum = value
+        if self.moments:
+            # Welford: дисперсия без хранения значений и без потери точности на больших суммах
+            delta = value - self.mean
+            self.mean += delta / self.count
+            self.m2 += delta * (value - self.mean)
+        if self.sketch is not None:
+            self.sketch.add(value)
+
+    def update(self, values: Iterable[Number]) -> 'Accumulator':
+        if self.moments or self.sketch is not None:
+            for value in values:
+                self.add(value)
+            return self
+
+        count = self.count
+        total = self.total
+        minimum = self.minimum
+        maximum = self.maximum
+        for value in values:
+            count += 1
+            total += value
+            if minimum is None or value < minimum:
+                minimum = value
+            if maximum is None or value > maximum:
+                maximum = value
+
+        self.count = count
+        self.total = total
+        self.minimum = minimum
+        self.maximum = maximum
+        return self
+
+    def merge(self, other: 'Accumulator') -> 'Accumulator':
+        if other.count:
+            self.total += other.total
+            if self.minimum is None or other.minimum < self.minimum:
+                self.minimum = other.minimum
+            if self.maximum is None or other.maximum > self.maximum:
+                self.maximum = other.maximum
+            if self.moments:
+                count = self.count + other.count
+                delta = other.mean - self.mean
+                self.mean += delta * other.count / count
+                self.m2 += other.m2 + delta * delta * self.count * other.count / count
+            if self.sketch is not None:
+                self.sketch.merge(other.sketch)
+            self.count += other.count
+        return self
+
+    def result(self, func_name: str) -> Number:
+        if not self.count:
+            raise AggregationError("Cannot aggregate empty dataset")
+
+        if func_name == "avg":
+            return self.total / self.count
+        elif func_name == "min":
+            return self.minimum
+        elif func_name == "max":
+            return self.maximum
+        elif func_name == "sum":
+            return self.total
+        elif func_name == "count":
+            return self.count
+        elif func_name in MOMENT_FUNCTIONS and self.moments:
+            variance = self.m2 / (self.count - 1) if self.count > 1 else 0.0
+            return math.sqrt(variance) if func_name == "stddev" else variance
+
+        q = percentile_of(func_name)
+        if q is not None and self.sketch is not None:
+            return self.sketch.quantile(q, self.minimum, self.maximum)
+        raise AggregationError(f"Unsupported aggregation function: {func_name}")
+
+
+class GroupedAggregation:
+    def __init__(self, group_col: Optional[str], specs: List[Tuple[str, str]],
+                 compression: int = DEFAULT_COMPRESSION):
+        self.group_col = group_col
+        self.specs = specs
+        self.compression = compression
+        self.columns = list(dict.fromkeys(col for col, _ in specs))
+        self.functions = [[func_name for col, func_name in specs if col == column] for column in self.columns]
+        self.groups: Dict[Any, List[Accumulator]] = {}
+
+    def add(self, key: Any, values: Sequence[Number]):
+        accumulators = self.groups.get(key)
+        if accumulators is None:
+            accumulators = self.groups[key] = [
+                Accumulator(functions, self.compression) for functions in self.functions
+            ]
+        for accumulator, value in zip(accumulators, values):
+            # None — пустая ячейка nullable-колонки, в агрегаты она не входит
+            if value is not None:
+                accumulator.add(value)
+
+    def merge(self, other: 'GroupedAggregation') -> 'GroupedAggregation':
+        for key, accumulators in other.groups.items():
+            mine = self.groups.get(key)
+            if mine is None:
+                self.groups[key] = accumulators
+                continue
+            for accumulator, partial in zip(mine, accumulators):
+                accumulator.merge(partial)
+        return self
+
+    def results(self) -> List[Dict[str, Any]]:
+        positions = {col: i for i, col in enumerate(self.columns)}
+        rows = []
+        for key, accumulators in self.groups.items():
+            row = {} if self.group_col is None else {self.group_col: key}
+            for col, func_name in self.specs:
+                row[aggregate_label(col, func_name)] = accumulators[positions[col]].result(func_name)
+            rows.append(row)
+        return rows
@@ -0,0 +1,197 @@
+import hashlib
+import json
+import mmap
+import os
+import struct
+import tempfile
+from array import array
+from typing import List, Dict, Any, Iterator, Optional, Tuple
+
+from src.fingerprint import default_cache_dir, fingerprint
+from src.table import Table, NumericColumn, StringColumn, read_table
+
+MAGIC = b'CSVTBL01'
+DEFAULT_MAX_BYTES = 10 << 30
+
+
+class PackedStrings:
+    def __init__(self, blob: memoryview, offsets: memoryview, null_index: Optional[int]):
+        self.blob = blob
+        self.offsets = offsets
+        self.null_index = null_index
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> Optional[str]:
+        if i == self.null_index:
+            return None
+        return str(self.blob[self.offsets[i]:self.offsets[i + 1]], 'utf-8')
+
+    def __iter__(self) -> Iterator[Optional[str]]:
+        for i in range(len(self)):
+            yield self[i]
+
+
+def _pack_strings(values) -> Tuple[bytes, array, Optional[int]]:
+    offsets = array('q', [0])
+    chunks = []
+    null_index = None
+    position = 0
+    for i, text in enumerate(values):
+        if text is None:
+            null_index = i
+            encoded = b''
+        else:
+            encoded = text.encode('utf-8')
+        chunks.append(encoded)
+        position += len(encoded)
+        offsets.append(position)
+    return b''.join(chunks), offsets, null_index
+
+
+def _column_sections(column) -> Tuple[Dict[str, Any], List[Tuple[str, str, bytes]]]:
+    if isinstance(column, StringColumn):
+        blob, offsets, null_index = _pack_strings(column.values)
+        meta = {'kind': 'str', 'null_index': null_index}
+        return meta, [('codes', 'I', bytes(column.codes)), ('offsets', 'q', offsets.tobytes()), ('blob', 'B', blob)]
+
+    meta = {'kind': column.kind, 'overrides': {str(i): text for i, text in column.overrides.items()}}
+    sections = [('data', column.typecode, bytes(column.data))]
+    if column.int_literals is not None:
+        sections.append(('int_literals', 'b', bytes(column.int_literals)))
+    return meta, sections
+
+
+def write_table(path: str, table: Table, source: Dict[str, Any]):
+    columns = []
+    blobs = []
+    position = 0
+    for name, column in table.columns.items():
+        meta, sections = _column_sections(column)
+        meta['name'] = name
+        meta['sections'] = {}
+        for section, fmt, data in sections:
+            meta['sections'][section] = [position, len(data), fmt]
+            padding = -len(data) % 8
+            blobs.append(data + b'\0' * padding)
+            position += len(data) + padding
+        columns.append(meta)
+
+    header = json.dumps({'source': source, 'length': len(table), 'columns': columns}).encode('utf-8')
+    prefix = MAGIC + struct.pack('<Q', len(header)) + header
+    prefix += b'\0' * (-len(prefix) % 8)
+
+    directory = os.path.dirname(path)
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            file.write(prefix)
+            for blob in blobs:
+                file.write(blob)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def map_table(path: str, source: Dict[str, Any]) -> Optional[Table]:
+    with open(path, mode='rb') as file:
+        mm = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    if mm[:len(MAGIC)] != MAGIC:
+        mm.close()
+        return None
+
+    header_length = struct.unpack_from('<Q', mm, len(MAGIC))[0]
+    start = len(MAGIC) + 8
+    header = json.loads(mm[start:start + header_length])
+    if header['source'] != source:
+        mm.close()
+        return None
+
+    base = start + header_length
+    base += -base % 8
+    view = memoryview(mm)
+
+    def section(meta, name):
+        offset, length, fmt = meta['sections'][name]
+        return view[base + offset:base + offset + length].cast(fmt)
+
+    columns = {}
+    for meta in header['columns']:
+        if meta['kind'] == 'str':
+            values = PackedStrings(section(meta, 'blob'), section(meta, 'offsets'), meta['null_index'])
+            columns[meta['name']] = StringColumn(values, section(meta, 'codes'))
+            continue
+
+        overrides = {int(i): text for i, text in meta['overrides'].items()}
+        int_literals = section(meta, 'int_literals') if 'int_literals' in meta['sections'] else None
+        columns[meta['name']] = NumericColumn(meta['kind'], section(meta, 'data'), overrides, int_literals)
+
+    return Table(columns, header['length'])
+
+
+class TableCache:
+    def __init__(self, directory: Optional[str] = None, max_bytes: Optional[int] = None):
+        self.directory = directory or default_cache_dir()
+        if max_bytes is None:
+            max_bytes = int(os.environ.get('CSV_PROCESSOR_CACHE_SIZE', DEFAULT_MAX_BYTES))
+        self.max_bytes = max_bytes
+
+    def entry_path(self, file_path: str) -> str:
+        name = hashlib.blake2b(os.path.abspath(file_path).encode('utf-8'), digest_size=16).hexdigest()
+        return os.path.join(self.directory, f"{name}.tbl")
+
+    def load(self, file_path: str, source: Dict[str, Any]) -> Optional[Table]:
+        path = self.entry_path(file_path)
+        try:
+            table = map_table(path, source)
+        except (OSError, ValueError, KeyError, struct.error):
+            return None
+
+        if table is not None:
+            os.utime(path)
+        return table
+
+    def store(self, file_path: str, table: Table, source: Dict[str, Any]):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            path = self.entry_path(file_path)
+            write_table(path, table, source)
+            self.evict(keep=path)
+        except OSError:
+            pass
+
+    def evict(self, keep: Optional[str] = None):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.tbl'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            os.unlink(path)
+            total -= size
+
+
+def load_table(file_path: str, use_cache: bool = True, rebuild: bool = False,
+               cache: Optional[TableCache] = None) -> Table:
+    if not use_cache:
+        return read_table(file_path)
+
+    cache = cache or TableCache()
+    source = fingerprint(file_path)
+    if not rebuild:
+        table = cache.load(file_path, source)
+        if table is not None:
+            return table
+
+    table = read_table(file_path)
+    cache.store(file_path, table, source)
+    return table
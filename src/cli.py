@@ -1,16 +1,82 @@
 import os
+import re
 import argparse
+from .compression import strip_compression_suffix
+from .aggregates import AGGREGATE_FUNCTIONS, DEFAULT_COMPRESSION, is_aggregate_function
 from .exceptions import CSVProcessingError, FileValidationError
+from .expressions import is_compound, parse_expression
+from .partitions import expand_inputs, input_paths
+from .writers import OUTPUT_FORMATS, GRID_MAX_ROWS
 
 
-def validate_args(args):
-    if not os.path.exists(args.file):
-        raise FileValidationError(f"File not found: {args.file}")
+def positive_int(value):
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid number: '{value}'")
+
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"Value must be a positive integer, got {number}")
+
+    return number
+
+
+def non_negative_int(value):
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid number: '{value}'")
+
+    if number < 0:
+        raise argparse.ArgumentTypeError(f"Value must be zero or a positive integer, got {number}")
+
+    return number
+
+
+def memory_size(value):
+    units = {'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30}
+    text = value.strip().upper().rstrip('B')
+    multiplier = 1
+    if text and text[-1] in units:
+        multiplier = units[text[-1]]
+        text = text[:-1]
+
+    try:
+        size = int(float(text) * multiplier)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid memory size: '{value}'. Example: 512M")
+
+    if size < 1:
+        raise argparse.ArgumentTypeError(f"Memory size must be positive, got '{value}'")
+
+    return size
 
-    if not args.file.lower().endswith('.csv'):
-        raise FileValidationError("Only CSV files are supported")
 
-    if args.where is not None:
+def validate_args(args):
+    for path in input_paths(args.file):
+        if not os.path.exists(path):
+            raise FileValidationError(f"File not found: {path}")
+
+        if not strip_compression_suffix(path).lower().endswith('.csv'):
+            raise FileValidationError("Only CSV files are supported (optionally compressed: .gz, .bz2, .xz, .zst)")
+
+    schema = getattr(args, 'schema', None)
+    if isinstance(schema, str) and not os.path.exists(schema):
+        raise FileValidationError(f"Schema file not found: {schema}")
+
+    pattern = getattr(args, 'partition_pattern', None)
+    if isinstance(pattern, str):
+        try:
+            re.compile(pattern)
+        except re.error as e:
+            raise ValueError(f"Invalid partition pattern: '{pattern}': {e}")
+
+    if args.where is not None and is_compound(args.where):
+        try:
+            parse_expression(args.where)
+        except CSVProcessingError as e:
+            raise ValueError(e.message)
+    elif args.where is not None:
         operators = ['>', '<', '=', '>=', '<=', '!=']
         if not any(op in args.where for op in operators):
             raise ValueError(
@@ -26,27 +92,29 @@ def validate_args(args):
             )
 
     if args.aggregate is not None:
-        if '=' not in args.aggregate:
-            raise ValueError(
-                f"Invalid aggregation format: '{args.aggregate}'. "
-                "Use format: column=function. Example: 'price=avg'"
-            )
-
-        parts = args.aggregate.split('=', 1)
-        col = parts[0].strip()
-        func = parts[1].strip().lower() if len(parts) > 1 else ''
-
-        if not col or not func:
-            raise ValueError(
-                f"Invalid aggregation format: '{args.aggregate}'. "
-                "Use format: column=function. Example: 'price=avg'"
-            )
-
-        if func not in ('avg', 'min', 'max'):
-            raise ValueError(
-                f"Unsupported aggregation function: '{func}'. "
-                "Use: avg, min, max"
-            )
+        aggregates = [args.aggregate] if isinstance(args.aggregate, str) else args.aggregate
+        for aggregate in aggregates:
+            if '=' not in aggregate:
+                raise ValueError(
+                    f"Invalid aggregation format: '{aggregate}'. "
+                    "Use format: column=function. Example: 'price=avg'"
+                )
+
+            parts = aggregate.split('=', 1)
+            col = parts[0].strip()
+            func = parts[1].strip().lower() if len(parts) > 1 else ''
+
+            if not col or not func:
+                raise ValueError(
+                    f"Invalid aggregation format: '{aggregate}'. "
+                    "Use format: column=function. Example: 'price=avg'"
+                )
+
+            if not is_aggregate_function(func):
+                raise ValueError(
+                    f"Unsupported aggregation function: '{func}'. "
+                    f"Use: {', '.join(AGGREGATE_FUNCTIONS)} or a percentile such as p90"
+                )
 
     if args.order_by is not None:
         if '=' not in args.order_by:
@@ -72,20 +140,86 @@ def validate_args(args):
             )
 
 
-def parse_args():
-    parser = argparse.ArgumentParser(
+def build_parser(parser_class=argparse.ArgumentParser):
+    parser = parser_class(
         description='Process CSV files with filtering, aggregation and sorting'
     )
-    parser.add_argument('--file', type=str, required=True,
-                        help='Path to CSV file (required)')
+    parser.add_argument('--file', type=str, required=True, nargs='+',
+                        help='Path to CSV file (required); several paths or globs such as "sales/*.csv" '
+                             'are read in parallel and their results merged')
+    parser.add_argument('--partition-pattern', type=str, default=None, metavar='REGEX',
+                        help='Regex with named groups taking column values from file paths '
+                             '(e.g. "sales_(?P<date>[0-9-]+)\\.csv"); files the --where filter rules out are skipped')
     parser.add_argument('--where', type=str, default=None,
-                        help='Filter condition (e.g. "price>500")')
-    parser.add_argument('--aggregate', type=str, default=None,
-                        help='Aggregation operation (e.g. "rating=avg")')
+                        help='Filter condition (e.g. "price>500" or "brand IN (apple, xiaomi) AND NOT rating<4.5")')
+    parser.add_argument('--aggregate', type=str, default=None, action='append',
+                        help='Aggregation operation (e.g. "rating=avg", "price=p90"); may be repeated')
+    parser.add_argument('--group-by', type=str, default=None,
+                        help='Aggregate separately for each value of this column (e.g. "brand")')
+    parser.add_argument('--quantile-compression', type=positive_int, default=DEFAULT_COMPRESSION,
+                        help='Accuracy of the median/percentile sketch: higher is more exact and uses '
+                             f'more memory (default: {DEFAULT_COMPRESSION})')
     parser.add_argument('--order-by', type=str, default=None,
                         help='Sorting operation (e.g. "price=desc")')
-
-    args = parser.parse_args()
+    parser.add_argument('--limit', type=positive_int, default=None,
+                        help='Output at most N rows; with --order-by keeps only the top N')
+    parser.add_argument('--sort-memory', type=memory_size, default=None,
+                        help='Sort with temporary files, keeping at most this much in memory (e.g. 512M)')
+    parser.add_argument('--engine', type=str, default='python',
+                        choices=['python', 'columnar', 'numpy'],
+                        help='Execution engine: streaming rows, columnar table or NumPy (default: python)')
+    parser.add_argument('--workers', type=positive_int, default=None,
+                        help='Number of processes for chunked parallel reading (default: 1; '
+                             'with several files: number of CPUs)')
+    parser.add_argument('--output-format', type=str, default='grid', choices=OUTPUT_FORMATS,
+                        help='Result format: grid table for reading, or csv/tsv/jsonl/binary streamed '
+                             'row by row (default: grid)')
+    parser.add_argument('--output', type=str, default=None, metavar='PATH',
+                        help='Write the result to this file instead of stdout')
+    parser.add_argument('--max-rows', type=non_negative_int, default=GRID_MAX_ROWS,
+                        help=f'Rows shown in grid output; 0 shows all (default: {GRID_MAX_ROWS})')
+    parser.add_argument('--build-index', type=str, default=None, action='append', metavar='COLUMN',
+                        help='Write a sidecar index for this column next to the CSV; '
+                             'later --where queries on it read only matching rows')
+    parser.add_argument('--stats', action='store_true',
+                        help='Print time, rows in/out, bytes read and peak memory of each stage to stderr')
+    parser.add_argument('--stats-json', type=str, default=None, metavar='PATH',
+                        help='Write the per-stage statistics as JSON to this file')
+    parser.add_argument('--explain', action='store_true',
+                        help='Print the optimized query plan instead of running the query')
+    parser.add_argument('--profile', action='store_true',
+                        help='Run under cProfile and print the hottest functions to stderr')
+    parser.add_argument('--schema', type=str, default=None, metavar='PATH',
+                        help='JSON file mapping columns to types (int, float, decimal, date, bool, str; '
+                             'append ? for nullable); other columns are inferred')
+    parser.add_argument('--schema-sample', type=non_negative_int, default=None, metavar='N',
+                        help='Infer column types from the first N rows of each file (default 10000; '
+                             '0 scans the whole file)')
+    parser.add_argument('--follow', action='store_true',
+                        help='Keep watching an append-only CSV and print new matching rows or updated aggregates')
+    parser.add_argument('--follow-interval', type=float, default=2.0, metavar='SECONDS',
+                        help='How often --follow checks the file for new rows (default: 2)')
+    parser.add_argument('--checkpoint', type=str, default=None, metavar='PATH',
+                        help='File keeping the --follow offset and aggregate state between runs '
+                             '(default: in the cache directory)')
+    parser.add_argument('--result-cache', action='store_true',
+                        help='Reuse the result of an identical earlier query while the CSV is unchanged')
+    parser.add_argument('--result-cache-ttl', type=float, default=None, metavar='SECONDS',
+                        help='Ignore cached results older than this')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Do not read or write the parsed table cache')
+    parser.add_argument('--rebuild-cache', action='store_true',
+                        help='Re-parse the CSV and overwrite its cache entry')
+    return parser
+
+
+def parse_args(argv=None, parser=None):
+    parser = parser or build_parser()
+    args = parser.parse_args(argv)
+    args.file = expand_inputs(args.file)
+
+    if args.group_by and not args.aggregate:
+        parser.error("--group-by requires at least one --aggregate")
 
     validate_args(args)
 
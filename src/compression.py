@@ -0,0 +1,166 @@
+import bz2
+import gzip
+import io
+import lzma
+import mmap
+import os
+import struct
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Iterator, Optional, TextIO, Tuple
+
+from src.exceptions import ArgumentError
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Сжатие определяется по расширению, а если его нет — по первым байтам файла
+EXTENSIONS = {'.gz': 'gzip', '.gzip': 'gzip', '.bgz': 'gzip', '.bz2': 'bz2', '.zst': 'zstd', '.zstd': 'zstd',
+              '.xz': 'xz'}
+MAGIC = ((b'\x1f\x8b', 'gzip'), (b'BZh', 'bz2'), (b'\x28\xb5\x2f\xfd', 'zstd'), (b'\xfd7zXZ\x00', 'xz'))
+# Заголовок блока BGZF: gzip с FEXTRA, подполе 'BC' хранит размер блока
+BGZF_HEADER = struct.Struct('<4sI2sH2sHH')
+BGZF_PREFIX = b'\x1f\x8b\x08\x04'
+BATCH_SIZE = 4 << 20
+GZIP_WBITS = 16 + zlib.MAX_WBITS
+
+
+def compression_of(file_path: str) -> Optional[str]:
+    kind = EXTENSIONS.get(os.path.splitext(file_path)[1].lower())
+    if kind is not None:
+        return kind
+    try:
+        with open(file_path, mode='rb') as file:
+            head = file.read(6)
+    except OSError:
+        return None
+    for magic, kind in MAGIC:
+        if head.startswith(magic):
+            return kind
+    return None
+
+
+def is_compressed(file_path: str) -> bool:
+    return compression_of(file_path) is not None
+
+
+def strip_compression_suffix(file_path: str) -> str:
+    root, extension = os.path.splitext(file_path)
+    return root if extension.lower() in EXTENSIONS else file_path
+
+
+def require_zstandard():
+    if zstandard is None:
+        raise ArgumentError("Reading .zst files requires the zstandard package. Install zstandard")
+
+
+def bgzf_blocks(file_path: str) -> Optional[List[Tuple[int, int]]]:
+    # Блоки находятся по заголовкам без распаковки; обычный gzip так не разбить, для него None
+    size = os.path.getsize(file_path)
+    if size == 0:
+        return None
+    with open(file_path, mode='rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        blocks = []
+        offset = 0
+        while offset < size:
+            if offset + BGZF_HEADER.size > size:
+                return None
+            prefix, _, _, xlen, subfield, slen, bsize = BGZF_HEADER.unpack_from(mm, offset)
+            if prefix != BGZF_PREFIX or xlen < 6 or subfield != b'BC' or slen != 2:
+                return None
+            blocks.append((offset, bsize + 1))
+            offset += bsize + 1
+        return blocks if offset == size else None
+
+
+def _batches(blocks: List[Tuple[int, int]]) -> Iterator[Tuple[int, List[int]]]:
+    start, sizes, length = blocks[0][0], [], 0
+    for offset, size in blocks:
+        if length >= BATCH_SIZE:
+            yield start, sizes
+            start, sizes, length = offset, [], 0
+        sizes.append(size)
+        length += size
+    yield start, sizes
+
+
+def _decompress(file_path: str, start: int, sizes: List[int]) -> bytes:
+    with open(file_path, mode='rb') as file:
+        file.seek(start)
+        view = memoryview(file.read(sum(sizes)))
+    # Каждый блок — отдельный gzip-член; zlib отпускает GIL на время распаковки,
+    # поэтому потоки действительно работают параллельно
+    parts = []
+    position = 0
+    for size in sizes:
+        parts.append(zlib.decompress(view[position:position + size], GZIP_WBITS))
+        position += size
+    return b''.join(parts)
+
+
+def parallel_chunks(file_path: str, blocks: List[Tuple[int, int]], workers: int) -> Iterator[bytes]:
+    # Пакеты блоков распаковываются впереди чтения, но не больше чем на 2 × workers пакетов
+    batches = iter(_batches(blocks))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = []
+        for start, sizes in batches:
+            pending.append(executor.submit(_decompress, file_path, start, sizes))
+            if len(pending) >= workers * 2:
+                break
+        while pending:
+            yield pending.pop(0).result()
+            batch = next(batches, None)
+            if batch is not None:
+                pending.append(executor.submit(_decompress, file_path, *batch))
+
+
+class ChunkStream(io.RawIOBase):
+    def __init__(self, chunks: Iterator[bytes]):
+        self.chunks = chunks
+        self.buffer = memoryview(b'')
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, target) -> int:
+        while not self.buffer:
+            chunk = next(self.chunks, None)
+            if chunk is None:
+                return 0
+            self.buffer = memoryview(chunk)
+        size = min(len(target), len(self.buffer))
+        target[:size] = self.buffer[:size]
+        self.buffer = self.buffer[size:]
+        return size
+
+    def close(self):
+        close = getattr(self.chunks, 'close', None)
+        if close is not None:
+            close()
+        super().close()
+
+
+def open_binary(file_path: str, workers: int = 1):
+    kind = compression_of(file_path)
+    if kind is None:
+        return open(file_path, mode='rb')
+    if kind == 'gzip':
+        blocks = bgzf_blocks(file_path) if workers > 1 else None
+        if blocks and len(blocks) > 1:
+            return io.BufferedReader(ChunkStream(parallel_chunks(file_path, blocks, workers)))
+        return gzip.open(file_path, mode='rb')
+    if kind == 'bz2':
+        return bz2.open(file_path, mode='rb')
+    if kind == 'xz':
+        return lzma.open(file_path, mode='rb')
+    require_zstandard()
+    return zstandard.ZstdDecompressor().stream_reader(open(file_path, mode='rb'), closefd=True)
+
+
+def open_text(file_path: str, workers: int = 1, newline: Optional[str] = None) -> TextIO:
+    if not is_compressed(file_path):
+        return open(file_path, mode='r', encoding='utf-8', newline=newline)
+    # Распаковка идёт потоком по мере чтения, на диск ничего не пишется
+    return io.TextIOWrapper(open_binary(file_path, workers), encoding='utf-8', newline=newline)
@@ -1,32 +1,56 @@
 import csv
-import os
 import operator
-from typing import List, Dict, Union, Callable, Any
+from decimal import Decimal
+from itertools import chain, islice
+from typing import List, Dict, Union, Callable, Any, Iterable, Iterator, Optional, Tuple
 from src.exceptions import ColumnNotFoundError, FilterError, AggregationError, SortError, CSVProcessingError
-from src.operations import OPERATIONS_REGISTRY
+from src.aggregates import Accumulator, GroupedAggregation, DEFAULT_COMPRESSION, is_aggregate_function
+from src.compression import is_compressed, open_text
+from src.rows import Row, column_getter, positions, to_rows
+from src.schema import CONVERSION_ERRORS, Schema
 
+# Результат-скаляр одиночной агрегации; decimal-колонки дают Decimal
+SCALAR_TYPES = (int, float, Decimal)
 
-def read_csv(file_path: str) -> List[Dict[str, str]]:
-    with open(file_path, mode='r', encoding='utf-8') as file:
-        reader = csv.DictReader(file)
-        return [row for row in reader]
 
+def iter_csv(file_path: str, workers: int = 1) -> Iterator[Row]:
+    # Сжатые файлы (.gz, .bz2, .xz, .zst) распаковываются потоком прямо при чтении.
+    # Строки — списки из csv.reader с одной картой заголовка на весь файл, а не словарь на каждую строку
+    with open_text(file_path, workers) as file:
+        reader = csv.reader(file)
+        header = next(reader, None)
+        if header is not None:
+            yield from to_rows(header, reader)
 
-def apply_filter(data: List[Dict[str, Any]], condition: str) -> List[Dict[str, Any]]:
+
+def read_csv(file_path: str) -> List[Row]:
+    return list(iter_csv(file_path))
+
+
+def apply_filter(data: List[Dict[str, Any]], condition: str, schema: Optional[Schema] = None) -> List[Dict[str, Any]]:
     if not condition or not data:
         return data
 
-    operators_map = {
-        ">=": operator.ge,
-        "<=": operator.le,
-        "!=": operator.ne,
-        ">": operator.gt,
-        "<": operator.lt,
-        "=": operator.eq
-    }
+    from src.table import Table
+    if isinstance(data, Table):
+        return data.filter(condition, schema)
+
+    return list(iter_filter(data, condition, schema))
+
 
+OPERATORS_MAP = {
+    ">=": operator.ge,
+    "<=": operator.le,
+    "!=": operator.ne,
+    ">": operator.gt,
+    "<": operator.lt,
+    "=": operator.eq
+}
+
+
+def parse_condition(condition: str) -> Tuple[str, str, Union[str, float, int]]:
     op_symbol = None
-    for symbol in operators_map:
+    for symbol in OPERATORS_MAP:
         if symbol in condition:
             op_symbol = symbol
             break
@@ -35,35 +59,80 @@ def apply_filter(data: List[Dict[str, Any]], condition: str) -> List[Dict[str, A
         raise FilterError(f"Invalid operator in condition: {condition}")
 
     col, value_str = condition.split(op_symbol, 1)
-    col = col.strip()
-    value_str = value_str.strip()
-
-    if col not in data[0]:
-        available = list(data[0].keys())
-        raise ColumnNotFoundError(col, available)
 
     try:
-        value = infer_type(value_str)
+        value = infer_type(value_str.strip())
     except Exception as e:
         raise FilterError(f"Error parsing filter value: {e}")
 
-    op_func = operators_map[op_symbol]
-    filtered = []
+    return col.strip(), op_symbol, value
 
-    for row in data:
-        try:
-            row_value = infer_type(row[col])
 
-            if isinstance(row_value, str) and op_symbol in ("=", "!="):
-                if op_func(row_value.lower(), value.lower()):
-                    filtered.append(row)
-            else:
-                if op_func(row_value, value):
-                    filtered.append(row)
-        except Exception as e:
-            raise FilterError(f"Error comparing values in row: {e}")
+def compile_condition(op_symbol: str, value: Union[str, float, int]) -> Callable[[str], bool]:
+    op_func = OPERATORS_MAP[op_symbol]
+
+    if isinstance(value, (int, float)):
+        # Числовое сравнение: нечисловая ячейка — ошибка при любом операторе
+        # Целый литерал сравнивается с целой ячейкой без перевода во float, иначе большие числа теряют точность
+        parsers = (int, float) if isinstance(value, int) else (float,)
+
+        def matches(cell):
+            for parse in parsers:
+                try:
+                    return op_func(parse(cell), value)
+                except (TypeError, ValueError):
+                    pass
+            raise FilterError(f"Error comparing values in row: '{cell}' is not comparable with {value}")
+
+    elif op_symbol in ("=", "!="):
+        # Числовая ячейка никогда не совпадает со строкой, поэтому достаточно сравнить нижний регистр
+        target = value.lower()
+
+        def matches(cell):
+            try:
+                return op_func(cell.strip().lower(), target)
+            except AttributeError as e:
+                raise FilterError(f"Error comparing values in row: {e}")
+
+    else:
+        def matches(cell):
+            try:
+                return op_func(infer_type(cell), value)
+            except Exception as e:
+                raise FilterError(f"Error comparing values in row: {e}")
+
+    return matches
+
 
-    return filtered
+def compile_filter(condition: str, columns: Iterable[str], schema: Optional[Schema] = None,
+                   index: Optional[Dict[str, int]] = None) -> Callable[[Dict[str, Any]], bool]:
+    # Составное выражение компилируется в один предикат, колонки проверяются по заголовку один раз;
+    # с картой позиций предикат читает значения компактной строки по номеру
+    from src.expressions import compile_expression
+    return compile_expression(condition, columns, schema, index)
+
+
+def iter_filter(rows: Iterable[Dict[str, Any]], condition: str,
+                schema: Optional[Schema] = None) -> Iterator[Dict[str, Any]]:
+    rows = iter(rows)
+    first = next(rows, None)
+    if first is None:
+        return
+
+    predicate = compile_filter(condition, first.keys(), schema, positions(first))
+    if schema is None:
+        yield from filter(predicate, chain((first,), rows))
+        return
+
+    # Ошибка конвертации ловится один раз на весь цикл, а не на каждую ячейку
+    row = first
+    try:
+        for row in chain((first,), rows):
+            if predicate(row):
+                yield row
+    except CONVERSION_ERRORS:
+        schema.check(row)
+        raise
 
 
 def infer_type(value: str) -> Union[str, float, int]:
@@ -76,93 +145,306 @@ def infer_type(value: str) -> Union[str, float, int]:
             return value.strip()
 
 
-def aggregate_data(data: List[Dict[str, Any]], operation: str) -> float:
-    if not data:
+def sort_key(value: Any) -> Union[str, float, int]:
+    # Результаты группировки уже числовые, строки из CSV приводим как обычно
+    if isinstance(value, (int, float)):
+        return value
+    return infer_type(value)
+
+
+def aggregate_data(data: Iterable[Dict[str, Any]], operation: str,
+                   compression: int = DEFAULT_COMPRESSION, schema: Optional[Schema] = None) -> float:
+    from src.table import Table
+    if isinstance(data, Table):
+        return data.aggregate(operation, schema, compression)
+
+    rows = iter(data)
+    first = next(rows, None)
+    if first is None:
         raise AggregationError("Cannot aggregate empty dataset")
 
+    col, func_name = parse_aggregation(operation)
+
+    if col not in first:
+        raise ColumnNotFoundError(f"Column '{col}' not found in CSV")
+
+    if not is_aggregate_function(func_name):
+        raise AggregationError(f"Unsupported aggregation function: {func_name}")
+
+    accumulator = Accumulator((func_name,), compression)
+    if schema is not None:
+        return accumulator.update(typed_values(chain((first,), rows), col, schema, (func_name,))).result(func_name)
+    return accumulator.update(numeric_values(chain((first,), rows), col)).result(func_name)
+
+
+def parse_aggregation(operation: str) -> Tuple[str, str]:
     if "=" not in operation:
         raise AggregationError(f"Invalid aggregation format: {operation}")
 
     col, func_name = operation.split("=", 1)
-    col = col.strip()
-    func_name = func_name.strip().lower()
+    return col.strip(), func_name.strip().lower()
 
-    if col not in data[0]:
-        raise ColumnNotFoundError(f"Column '{col}' not found in CSV")
 
-    values = []
-    for row in data:
-        try:
-            value = infer_type(row[col])
-            if not isinstance(value, (int, float)):
-                raise AggregationError(f"Column '{col}' contains non-numeric values")
-            values.append(value)
-        except Exception as e:
-            raise AggregationError(f"Error processing value in row: {e}")
+def aggregate_specs(aggregate: Union[str, Iterable[str], None]) -> List[str]:
+    if not aggregate:
+        return []
+    if isinstance(aggregate, str):
+        return [aggregate]
+    return list(aggregate)
 
-    if not values:
-        raise AggregationError(f"No valid numeric values in column '{col}'")
 
+def numeric_value(cell: Any, col: str) -> Union[int, float]:
     try:
-        if func_name == "avg":
-            return sum(values) / len(values)
-        elif func_name == "min":
-            return min(values)
-        elif func_name == "max":
-            return max(values)
-        else:
-            raise AggregationError(f"Unsupported aggregation function: {func_name}")
+        value = infer_type(cell)
+        if not isinstance(value, (int, float)):
+            raise AggregationError(f"Column '{col}' contains non-numeric values")
     except Exception as e:
-        raise AggregationError(f"Aggregation error: {e}")
+        raise AggregationError(f"Error processing value in row: {e}")
+
+    return value
+
+
+def numeric_values(rows: Iterable[Dict[str, Any]], col: str) -> Iterator[Union[int, float]]:
+    rows = iter(rows)
+    first = next(rows, None)
+    if first is None:
+        return
+    index = positions(first)
+    if index is not None:
+        i = index[col]
+        for row in chain((first,), rows):
+            yield numeric_value(row.fields[i], col)
+        return
+    for row in chain((first,), rows):
+        yield numeric_value(row[col], col)
+
+
+def typed_values(rows: Iterable[Dict[str, Any]], col: str, schema: Schema,
+                 functions: Iterable[str] = ()) -> Iterator[Any]:
+    convert = schema.numeric_converter(col, functions)
+    nullable = schema.column(col).nullable
+    rows = iter(rows)
+    row = next(rows, None)
+    if row is None:
+        return
+    get = column_getter(row, col)
+    try:
+        for row in chain((row,), rows):
+            value = convert(get(row))
+            if not nullable or value is not None:
+                yield value
+    except CONVERSION_ERRORS:
+        schema.check(row)
+        raise
+
+
+def prepare_grouping(columns: Iterable[str], group_col: Optional[str], operations: Iterable[str],
+                     compression: int = DEFAULT_COMPRESSION) -> GroupedAggregation:
+    columns = list(columns)
+    if group_col is not None and group_col not in columns:
+        raise ColumnNotFoundError(group_col, columns)
+
+    specs = []
+    for operation in operations:
+        col, func_name = parse_aggregation(operation)
+        if col not in columns:
+            raise ColumnNotFoundError(col, columns)
+        if not is_aggregate_function(func_name):
+            raise AggregationError(f"Unsupported aggregation function: {func_name}")
+        specs.append((col, func_name))
+
+    return GroupedAggregation(group_col, specs, compression)
+
+
+def feed_grouping(grouping: GroupedAggregation, rows: Iterable[Dict[str, Any]],
+                  schema: Optional[Schema] = None) -> GroupedAggregation:
+    # Один проход: в памяти только по набору аккумуляторов на каждую группу
+    group_col = grouping.group_col
+    columns = grouping.columns
+    add = grouping.add
+    if schema is not None:
+        return _feed_typed(grouping, rows, schema)
+    rows = iter(rows)
+    first = next(rows, None)
+    if first is None:
+        return grouping
+    rows = chain((first,), rows)
+    index = positions(first)
+    if index is not None:
+        # Компактные строки: колонки читаются по заранее найденным позициям
+        cells = [(index[col], col) for col in columns]
+        if group_col is None:
+            for row in rows:
+                fields = row.fields
+                add(None, [numeric_value(fields[i], col) for i, col in cells])
+            return grouping
+        key = index[group_col]
+        for row in rows:
+            fields = row.fields
+            add(fields[key], [numeric_value(fields[i], col) for i, col in cells])
+        return grouping
+
+    if group_col is None:
+        for row in rows:
+            add(None, [numeric_value(row[col], col) for col in columns])
+        return grouping
+
+    for row in rows:
+        add(row[group_col], [numeric_value(row[col], col) for col in columns])
+    return grouping
+
+
+def _feed_typed(grouping: GroupedAggregation, rows: Iterable[Dict[str, Any]], schema: Schema) -> GroupedAggregation:
+    group_col = grouping.group_col
+    add = grouping.add
+    rows = iter(rows)
+    row = next(rows, None)
+    if row is None:
+        return grouping
+    converters = [(column_getter(row, col), schema.numeric_converter(col, functions))
+                  for col, functions in zip(grouping.columns, grouping.functions)]
+    group = (lambda row: None) if group_col is None else column_getter(row, group_col)
+    try:
+        for row in chain((row,), rows):
+            add(group(row), [convert(get(row)) for get, convert in converters])
+    except CONVERSION_ERRORS:
+        schema.check(row)
+        raise
+    return grouping
+
+
+def group_aggregate(data: Iterable[Dict[str, Any]], group_col: Optional[str], operations: Union[str, Iterable[str]],
+                    compression: int = DEFAULT_COMPRESSION, schema: Optional[Schema] = None) -> List[Dict[str, Any]]:
+    from src.table import Table
+    if isinstance(data, Table):
+        return data.group_aggregate(group_col, aggregate_specs(operations), compression, schema)
+
+    rows = iter(data)
+    first = next(rows, None)
+    if first is None:
+        return []
+
+    grouping = prepare_grouping(first.keys(), group_col, aggregate_specs(operations), compression)
+    return feed_grouping(grouping, chain((first,), rows), schema).results()
+
+
+def aggregate_many(data: Iterable[Dict[str, Any]], operations: Iterable[str],
+                   compression: int = DEFAULT_COMPRESSION, schema: Optional[Schema] = None) -> Dict[str, Any]:
+    # Все агрегаты считаются за один проход, как одна группа без ключа
+    results = group_aggregate(data, None, operations, compression, schema)
+    if not results:
+        raise AggregationError("Cannot aggregate empty dataset")
+    return results[0]
+
+
+def referenced_columns(where: Optional[str], order_by: Optional[str], aggregate: Union[str, List[str], None],
+                       group_by: Optional[str] = None) -> Optional[List[str]]:
+    try:
+        columns = []
+        if where:
+            from src.expressions import parse_expression
+            columns.extend(parse_expression(where).columns())
+        if order_by:
+            columns.append(order_by.split('=', 1)[0].strip())
+        if group_by:
+            columns.append(group_by)
+        for operation in aggregate_specs(aggregate):
+            columns.append(parse_aggregation(operation)[0])
+    except CSVProcessingError:
+        return None
 
+    return columns
 
-def process_csv(args) -> Union[List[Dict[str, Any]], float]:
-    if not os.path.exists(args.file):
-        raise FileNotFoundError(f"File not found: {args.file}")
 
-    # Чтение данных
-    data = read_csv(args.file)
+def load_data(file_path: str, engine: str = 'python', columns: Optional[List[str]] = None,
+              use_cache: bool = False, rebuild_cache: bool = False,
+              workers: int = 1) -> Union[Iterator[Dict[str, str]], Any]:
+    if engine == 'columnar':
+        from src.cache import load_table
+        return load_table(file_path, use_cache=use_cache, rebuild=rebuild_cache)
+    if engine == 'numpy':
+        from src.cache import load_table
+        from src.numpy_engine import require_numpy, to_numpy_table
+        require_numpy()
+        return to_numpy_table(load_table(file_path, use_cache=use_cache, rebuild=rebuild_cache))
 
-    operations_order = ['where', 'order_by', 'aggregate']
+    if use_cache:
+        # Повторные запросы к тому же файлу читают строки из разобранной таблицы в кэше, а не разбирают CSV
+        from src.cache import load_table
+        return load_table(file_path, rebuild=rebuild_cache).rows(columns)
 
-    result = data
-    for op_name in operations_order:
-        arg_value = getattr(args, op_name, None)
-        if arg_value:
-            operation = OPERATIONS_REGISTRY.get(op_name)
-            if not operation:
-                raise CSVProcessingError(f"Unsupported operation: {op_name}")
+    # Сжатый файл нельзя отобразить в память, его читает потоковый распаковщик
+    if columns and not is_compressed(file_path):
+        from src.scanner import iter_projected
+        rows = iter_projected(file_path, columns, selective=True)
+        if rows is not None:
+            return rows
 
-            result = operation.execute(result, arg_value)
+    return iter_csv(file_path, workers)
 
-    return result
 
+def run_pipeline(args, recorder=None, data: Any = None) -> Union[Iterator[Dict[str, Any]], float]:
+    # Аргументы превращаются в ленивый запрос; оптимизатор выбирает способ чтения и убирает лишние стадии
+    from src.query import Query
+    return Query.from_args(args, data).execute(recorder)
 
-def apply_sort(data: List[Dict], condition: str) -> List[Dict]:
+
+def apply_limit(data: Iterable[Dict[str, Any]], limit: int) -> Iterable[Dict[str, Any]]:
+    from src.table import Table
+    if isinstance(data, Table):
+        return data.take(range(min(limit, len(data))))
+
+    return islice(data, limit)
+
+
+def process_csv(args, recorder=None) -> Union[List[Dict[str, Any]], float]:
+    result = run_pipeline(args, recorder)
+    if isinstance(result, SCALAR_TYPES):
+        return result
+
+    if recorder is not None:
+        return recorder.track('collect', lambda: list(result))
+    return list(result)
+
+
+def apply_sort(data: List[Dict], condition: str, schema: Optional[Schema] = None) -> List[Dict]:
 
     if not data:
         return data
 
-    if '=' not in condition:
-        raise SortError(f"Invalid sort format: {condition}. Use 'column=asc|desc'")
-
-    col, direction = condition.split('=', 1)
-    col = col.strip()
-    direction = direction.strip().lower()
+    from src.table import Table
+    if isinstance(data, Table):
+        return data.sort(condition, schema)
 
-    if direction not in ('asc', 'desc'):
-        raise SortError(f"Invalid sort direction: {direction}. Use 'asc' or 'desc'")
+    col, reverse = parse_sort(condition)
 
     if col not in data[0]:
         raise ColumnNotFoundError(f"Column '{col}' not found in CSV")
 
-    reverse = (direction == 'desc')
+    if schema is not None and schema.sorts_typed(col):
+        from src.sorting import typed_sort
+        return typed_sort(data, col, reverse, schema)
 
+    get = column_getter(data[0], col)
     try:
         return sorted(
             data,
-            key=lambda x: infer_type(x[col]),
+            key=lambda x: sort_key(get(x)),
             reverse=reverse
         )
     except Exception as e:
         raise SortError(f"Sorting error: {e}")
+
+
+def parse_sort(condition: str) -> Tuple[str, bool]:
+    if '=' not in condition:
+        raise SortError(f"Invalid sort format: {condition}. Use 'column=asc|desc'")
+
+    col, direction = condition.split('=', 1)
+    col = col.strip()
+    direction = direction.strip().lower()
+
+    if direction not in ('asc', 'desc'):
+        raise SortError(f"Invalid sort direction: {direction}. Use 'asc' or 'desc'")
+
+    return col, direction == 'desc'
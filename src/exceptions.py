@@ -7,6 +7,15 @@ class CSVProcessingError(Exception):
     def __str__(self):
         return f"[{self.code}] {self.message}"
 
+    def __reduce__(self):
+        return _restore_error, (type(self), self.message, self.code)
+
+
+def _restore_error(cls, message, code):
+    error = cls.__new__(cls)
+    CSVProcessingError.__init__(error, message, code)
+    return error
+
 
 class FileValidationError(CSVProcessingError):
     def __init__(self, message):
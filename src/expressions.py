@@ -0,0 +1,371 @@
+import re
+from decimal import Decimal
+from functools import reduce
+from typing import List, Dict, Any, Callable, Iterable, Optional, Set, Tuple, Union
+
+from src.csv_processor import OPERATORS_MAP, parse_condition, compile_condition, infer_type
+from src.exceptions import ColumnNotFoundError, FilterError, TypeConversionError
+from src.schema import CONVERTERS, CONVERSION_ERRORS, Schema
+
+Value = Union[str, float, int]
+Predicate = Callable[[Dict[str, Any]], bool]
+
+KEYWORDS = ('AND', 'OR', 'NOT', 'IN', 'BETWEEN')
+# После готового условия связками могут быть только AND и OR; NOT, IN и BETWEEN в значении — обычные слова
+VALUE_KEYWORDS = ('AND', 'OR')
+COMPOUND_PATTERN = re.compile(r"[()]|\b(?:AND|OR|NOT|IN|BETWEEN)\b", re.IGNORECASE)
+OPERATOR_PATTERN = re.compile(r">=|<=|!=|>|<|=")
+TOKEN_PATTERN = re.compile(r"""
+    \s*(?:
+        (?P<string>'(?:[^']|'')*'|"(?:[^"]|"")*")
+      | (?P<op>>=|<=|!=|>|<|=)
+      | (?P<punct>[(),])
+      | (?P<word>[^\s()=<>!,'"]+)
+    )""", re.VERBOSE)
+
+# Грубые оценки доли строк, проходящих условие: по ним более избирательные проверки идут первыми
+SELECTIVITY = {'=': 0.1, '!=': 0.9, '>': 0.4, '<': 0.4, '>=': 0.4, '<=': 0.4}
+
+
+class Expression:
+    cost = 1.0
+    selectivity = 0.5
+
+    def columns(self) -> List[str]:
+        raise NotImplementedError
+
+    def compile(self, schema: Optional[Schema] = None, index: Optional[Dict[str, int]] = None) -> Predicate:
+        raise NotImplementedError
+
+    def resolve(self, columns: Iterable[str]):
+        columns = list(columns)
+        for col in self.columns():
+            if col not in columns:
+                raise ColumnNotFoundError(col, columns)
+
+
+class Comparison(Expression):
+    def __init__(self, col: str, op_symbol: str, value: Value):
+        self.col = col
+        self.op_symbol = op_symbol
+        self.value = value
+        self.selectivity = SELECTIVITY[op_symbol]
+        # Нечисловое сравнение на <, > проходит через infer_type и стоит дороже
+        if not isinstance(value, (int, float)) and op_symbol not in ('=', '!='):
+            self.cost = 3.0
+
+    def columns(self) -> List[str]:
+        return [self.col]
+
+    @property
+    def textual(self) -> bool:
+        # Равенство со строкой сравнивает текст без учёта регистра при любой схеме
+        return isinstance(self.value, str) and self.op_symbol in ('=', '!=')
+
+    def compile(self, schema: Optional[Schema] = None, index: Optional[Dict[str, int]] = None) -> Predicate:
+        col = self.col
+        if schema is None or self.textual:
+            matches = compile_condition(self.op_symbol, self.value)
+        else:
+            matches = self.typed_matcher(schema)
+        return _on_column(matches, col, index)
+
+    def typed_target(self, schema: Schema) -> Tuple[str, Any]:
+        # Тип, в который переводятся ячейки, и значение условия, приведённое к нему
+        column = schema.column(self.col)
+        value = self.value
+        if isinstance(value, (int, float)):
+            kind = column.kind if column.numeric else 'float'
+            if kind == 'decimal':
+                value = Decimal(str(value))
+            return kind, value
+        try:
+            return column.kind, CONVERTERS[column.kind](value)
+        except CONVERSION_ERRORS:
+            raise TypeConversionError(value, self.col, column.kind)
+
+    def typed_matcher(self, schema: Schema) -> Callable[[Optional[str]], bool]:
+        # Ячейка переводится одним конвертером типа колонки, без try/except на каждую строку
+        kind, value = self.typed_target(schema)
+        convert = schema.converter(self.col, kind)
+        op_func = OPERATORS_MAP[self.op_symbol]
+        if schema.column(self.col).nullable:
+            return lambda cell: (converted := convert(cell)) is not None and op_func(converted, value)
+        return lambda cell: op_func(convert(cell), value)
+
+
+class Membership(Expression):
+    def __init__(self, col: str, values: List[Value]):
+        self.col = col
+        self.values = values
+        self.numbers: Set[float] = {float(value) for value in values if isinstance(value, (int, float))}
+        self.strings: Set[str] = {value.lower() for value in values if isinstance(value, str)}
+        self.selectivity = min(0.1 * len(values), 0.9)
+
+    def columns(self) -> List[str]:
+        return [self.col]
+
+    def matcher(self) -> Callable[[str], bool]:
+        numbers = self.numbers
+        strings = self.strings
+
+        def matches(cell):
+            if strings and isinstance(cell, str) and cell.strip().lower() in strings:
+                return True
+            if numbers:
+                try:
+                    return float(cell) in numbers
+                except (TypeError, ValueError):
+                    if not strings:
+                        raise FilterError(f"Error comparing values in row: '{cell}' is not comparable with numbers")
+            return False
+
+        return matches
+
+    def typed_matcher(self, schema: Schema) -> Callable[[Optional[str]], bool]:
+        numbers = self.numbers
+        strings = self.strings
+        column = schema.column(self.col)
+        if not numbers or (strings and not column.numeric):
+            return self.matcher()
+
+        kind = column.kind if column.numeric else 'float'
+        if kind == 'decimal':
+            numbers = {Decimal(str(number)) for number in numbers}
+        convert = schema.converter(self.col, kind)
+        if strings:
+            return lambda cell: convert(cell) in numbers or cell.strip().lower() in strings
+        return lambda cell: convert(cell) in numbers
+
+    def compile(self, schema: Optional[Schema] = None, index: Optional[Dict[str, int]] = None) -> Predicate:
+        col = self.col
+        matches = self.matcher() if schema is None else self.typed_matcher(schema)
+        return _on_column(matches, col, index)
+
+
+class Not(Expression):
+    def __init__(self, child: Expression):
+        self.child = child
+        self.cost = child.cost
+        self.selectivity = 1 - child.selectivity
+
+    def columns(self) -> List[str]:
+        return self.child.columns()
+
+    def compile(self, schema: Optional[Schema] = None, index: Optional[Dict[str, int]] = None) -> Predicate:
+        predicate = self.child.compile(schema, index)
+        return lambda row: not predicate(row)
+
+
+class And(Expression):
+    def __init__(self, children: List[Expression]):
+        self.children = children
+        self.cost = sum(child.cost for child in children)
+        self.selectivity = reduce(lambda a, b: a * b, (child.selectivity for child in children), 1.0)
+
+    def columns(self) -> List[str]:
+        return list(dict.fromkeys(col for child in self.children for col in child.columns()))
+
+    def ordered(self) -> List[Expression]:
+        # Первым идёт условие, которое дешевле всего отсекает строки
+        return sorted(self.children, key=lambda child: child.cost / max(1 - child.selectivity, 1e-6))
+
+    def compile(self, schema: Optional[Schema] = None, index: Optional[Dict[str, int]] = None) -> Predicate:
+        return reduce(_both, reversed([child.compile(schema, index) for child in self.ordered()]))
+
+
+class Or(Expression):
+    def __init__(self, children: List[Expression]):
+        self.children = children
+        self.cost = sum(child.cost for child in children)
+        self.selectivity = 1 - reduce(lambda a, b: a * b, (1 - child.selectivity for child in children), 1.0)
+
+    def columns(self) -> List[str]:
+        return list(dict.fromkeys(col for child in self.children for col in child.columns()))
+
+    def ordered(self) -> List[Expression]:
+        # Первым идёт условие, которое дешевле всего подтверждает строку
+        return sorted(self.children, key=lambda child: child.cost / max(child.selectivity, 1e-6))
+
+    def compile(self, schema: Optional[Schema] = None, index: Optional[Dict[str, int]] = None) -> Predicate:
+        return reduce(_either, reversed([child.compile(schema, index) for child in self.ordered()]))
+
+
+def _on_column(matches: Callable[[Any], bool], col: str, index: Optional[Dict[str, int]]) -> Predicate:
+    if index is None:
+        return lambda row: matches(row[col])
+    i = index[col]
+    return lambda row: matches(row.fields[i])
+
+
+def _both(rest: Predicate, first: Predicate) -> Predicate:
+    return lambda row: first(row) and rest(row)
+
+
+def _either(rest: Predicate, first: Predicate) -> Predicate:
+    return lambda row: first(row) or rest(row)
+
+
+def _tokenize(text: str) -> List[Tuple[str, str, int, int]]:
+    tokens = []
+    position = 0
+    text = text.rstrip()
+    while position < len(text):
+        match = TOKEN_PATTERN.match(text, position)
+        if match is None or match.end() == position:
+            raise FilterError(f"Invalid filter expression: unexpected '{text[position:].strip()}'")
+        kind = match.lastgroup
+        tokens.append((kind, match.group(kind), match.start(kind), match.end(kind)))
+        position = match.end()
+    return tokens
+
+
+class _Parser:
+    def __init__(self, text: str):
+        self.text = text
+        self.tokens = _tokenize(text)
+        self.position = 0
+
+    def peek(self) -> Optional[Tuple[str, str, int, int]]:
+        if self.position < len(self.tokens):
+            return self.tokens[self.position]
+        return None
+
+    def at_keyword(self, *keywords: str) -> bool:
+        token = self.peek()
+        return token is not None and token[0] == 'word' and token[1].upper() in keywords
+
+    def at_punct(self, symbol: str) -> bool:
+        token = self.peek()
+        return token is not None and token[0] == 'punct' and token[1] == symbol
+
+    def expect_punct(self, symbol: str):
+        if not self.at_punct(symbol):
+            raise self.error(f"expected '{symbol}'")
+        self.position += 1
+
+    def error(self, message: str) -> FilterError:
+        token = self.peek()
+        found = f"'{token[1]}'" if token else 'end of expression'
+        return FilterError(f"Invalid filter expression '{self.text}': {message}, found {found}")
+
+    def parse(self) -> Expression:
+        expression = self.parse_or()
+        if self.peek() is not None:
+            raise self.error("expected AND, OR or end of expression")
+        return expression
+
+    def parse_or(self) -> Expression:
+        children = [self.parse_and()]
+        while self.at_keyword('OR'):
+            self.position += 1
+            children.append(self.parse_and())
+        return children[0] if len(children) == 1 else Or(children)
+
+    def parse_and(self) -> Expression:
+        children = [self.parse_not()]
+        while self.at_keyword('AND'):
+            self.position += 1
+            children.append(self.parse_not())
+        return children[0] if len(children) == 1 else And(children)
+
+    def parse_not(self) -> Expression:
+        if self.at_keyword('NOT'):
+            self.position += 1
+            return Not(self.parse_not())
+        if self.at_punct('('):
+            self.position += 1
+            expression = self.parse_or()
+            self.expect_punct(')')
+            return expression
+        return self.parse_predicate()
+
+    def parse_words(self, what: str, keywords: Tuple[str, ...] = KEYWORDS) -> str:
+        # Несколько слов подряд — одно имя или значение, пробелы внутри сохраняются как в исходной строке
+        start = end = None
+        while True:
+            token = self.peek()
+            if token is None or token[0] != 'word' or token[1].upper() in keywords:
+                break
+            start = token[2] if start is None else start
+            end = token[3]
+            self.position += 1
+        if start is None:
+            raise self.error(f"expected {what}")
+        return self.text[start:end]
+
+    def parse_value(self) -> Value:
+        token = self.peek()
+        if token is not None and token[0] == 'string':
+            self.position += 1
+            quote = token[1][0]
+            return token[1][1:-1].replace(quote * 2, quote)
+        return infer_type(self.parse_words('value', VALUE_KEYWORDS))
+
+    def parse_predicate(self) -> Expression:
+        col = self.parse_words('column name')
+        token = self.peek()
+        if token is not None and token[0] == 'op':
+            self.position += 1
+            return Comparison(col, token[1], self.parse_value())
+
+        negated = self.at_keyword('NOT')
+        if negated:
+            self.position += 1
+
+        if self.at_keyword('IN'):
+            self.position += 1
+            self.expect_punct('(')
+            values = [self.parse_value()]
+            while self.at_punct(','):
+                self.position += 1
+                values.append(self.parse_value())
+            self.expect_punct(')')
+            expression = Membership(col, values)
+        elif self.at_keyword('BETWEEN'):
+            self.position += 1
+            low = self.parse_value()
+            if not self.at_keyword('AND'):
+                raise self.error("expected AND in BETWEEN")
+            self.position += 1
+            expression = And([Comparison(col, '>=', low), Comparison(col, '<=', self.parse_value())])
+        else:
+            raise self.error(f"expected operator after column '{col}'")
+
+        return Not(expression) if negated else expression
+
+
+def is_compound(condition: str) -> bool:
+    return COMPOUND_PATTERN.search(condition) is not None
+
+
+def is_single_comparison(condition: str) -> bool:
+    # Одно сравнение "col op value", где слова-ключи и скобки встречаются только в значении ("origin=Made in China")
+    operators = OPERATOR_PATTERN.findall(condition)
+    if len(operators) != 1:
+        return False
+    col, value = condition.split(operators[0], 1)
+    words = value.split()
+    # Ключевое слово в конце значения из нескольких слов — незаконченное выражение ("brand=apple AND"), а не значение
+    dangling = len(words) > 1 and words[-1].upper() in KEYWORDS
+    return not COMPOUND_PATTERN.search(col) and not dangling
+
+
+def parse_expression(condition: str) -> Expression:
+    # Простое условие "col op value" разбирается как раньше, чтобы значения с пробелами и кавычками не менялись
+    if not is_compound(condition):
+        return Comparison(*parse_condition(condition))
+    try:
+        return _Parser(condition).parse()
+    except FilterError:
+        # Составным выражение не разобралось: если это одно сравнение, ключевые слова и скобки — часть значения
+        if not is_single_comparison(condition):
+            raise
+        return Comparison(*parse_condition(condition))
+
+
+def compile_expression(condition: str, columns: Iterable[str], schema: Optional[Schema] = None,
+                       index: Optional[Dict[str, int]] = None) -> Predicate:
+    expression = parse_expression(condition)
+    expression.resolve(columns)
+    return expression.compile(schema, index)
@@ -0,0 +1,38 @@
+import hashlib
+import os
+from typing import Dict, Any
+
+SAMPLE_SIZE = 1 << 20
+HASH_BLOCK_SIZE = 1 << 14
+
+
+def default_cache_dir() -> str:
+    return os.environ.get('CSV_PROCESSOR_CACHE_DIR') or \
+        os.path.join(os.path.expanduser('~'), '.cache', 'processing-csv')
+
+
+def _hash_block(digest, file, size: int):
+    # Небольшими кусками: отпечаток снимается и для потоковых запросов, буфер в 1 МБ им не нужен
+    while size > 0:
+        chunk = file.read(min(size, HASH_BLOCK_SIZE))
+        if not chunk:
+            return
+        digest.update(chunk)
+        size -= len(chunk)
+
+
+def fingerprint(file_path: str) -> Dict[str, Any]:
+    stat = os.stat(file_path)
+    digest = hashlib.blake2b(digest_size=16)
+    with open(file_path, mode='rb') as file:
+        _hash_block(digest, file, SAMPLE_SIZE)
+        if stat.st_size > SAMPLE_SIZE:
+            file.seek(max(SAMPLE_SIZE, stat.st_size - SAMPLE_SIZE))
+            _hash_block(digest, file, SAMPLE_SIZE)
+
+    return {
+        'path': os.path.abspath(file_path),
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'hash': digest.hexdigest(),
+    }
@@ -0,0 +1,276 @@
+import hashlib
+import os
+import pickle
+import tempfile
+import time
+from typing import List, Dict, Any, Callable, Optional, TextIO, Tuple
+
+from src.aggregates import GroupedAggregation, DEFAULT_COMPRESSION
+from src.compression import is_compressed
+from src.csv_processor import aggregate_specs, iter_filter, prepare_grouping, feed_grouping
+from src.exceptions import ArgumentError
+from src.expressions import parse_expression
+from src.fingerprint import default_cache_dir
+from src.rows import to_rows
+from src.scanner import _split_record
+from src.schema import DEFAULT_SCHEMA_SAMPLE, Schema, load_schema
+
+HEAD_SIZE = 4096
+READ_SIZE = 1 << 20
+DEFAULT_INTERVAL = 2.0
+CHECKPOINT_VERSION = 2
+
+
+def split_records(data: bytes) -> Tuple[List[bytes], int]:
+    # Только полные записи: незаконченная последняя строка или открытая кавычка остаются до следующего чтения
+    records = []
+    start = 0
+    position = 0
+    quotes = 0
+    while True:
+        newline = data.find(b'\n', position)
+        if newline < 0:
+            return records, start
+        quotes += data.count(b'"', position, newline)
+        position = newline + 1
+        if quotes % 2 == 0:
+            records.append(data[start:position])
+            start = position
+            quotes = 0
+
+
+def default_checkpoint_path(args) -> str:
+    from src.result_cache import query_key
+    key = f"{os.path.abspath(args.file)}\0{query_key(args)}"
+    name = hashlib.blake2b(key.encode('utf-8'), digest_size=16).hexdigest()
+    return os.path.join(default_cache_dir(), 'follow', f"{name}.checkpoint")
+
+
+class FollowState:
+    def __init__(self):
+        self.offset = 0
+        self.inode: Optional[Tuple[int, int]] = None
+        self.head = b''
+        self.header: Optional[List[str]] = None
+        self.grouping: Optional[GroupedAggregation] = None
+        # Типы колонок выводятся по первым строкам данных и дальше не меняются, в том числе после перезапуска
+        self.schema: Optional[Schema] = None
+
+
+class Follower:
+    def __init__(self, file_path: str, where: Optional[str] = None, aggregate: Any = None,
+                 group_by: Optional[str] = None, compression: int = DEFAULT_COMPRESSION,
+                 checkpoint: Optional[str] = None, schema: Optional[str] = None,
+                 schema_sample: Optional[int] = None):
+        self.file_path = file_path
+        self.where = where
+        self.aggregates = aggregate_specs(aggregate)
+        self.group_by = group_by
+        self.compression = compression
+        self.checkpoint = checkpoint
+        self.schema_path = schema
+        self.schema_sample = DEFAULT_SCHEMA_SAMPLE if schema_sample is None else schema_sample
+        self.file = None
+        self.state = self._load_checkpoint() or FollowState()
+
+    @property
+    def aggregating(self) -> bool:
+        return bool(self.aggregates)
+
+    def poll(self) -> Tuple[List[Dict[str, Any]], bool]:
+        # Новые подходящие строки (или обновлённые агрегаты) и признак того, что что-то изменилось
+        matched: List[Dict[str, Any]] = []
+        if self.file is None:
+            self._open(resume=True)
+        if self.file is None:
+            return matched, False
+
+        changed = self._read(matched)
+        # Ротация проверяется после дочитывания: хвост старого файла не теряется
+        if self._rotated():
+            self.close()
+            self._open(resume=False)
+            if self.file is not None:
+                changed = self._read(matched) or changed
+
+        self._save_checkpoint()
+        if self.aggregating:
+            return (self.state.grouping.results() if changed else []), changed
+        return matched, changed
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def _open(self, resume: bool):
+        try:
+            self.file = open(self.file_path, 'rb')
+        except FileNotFoundError:
+            # Между переименованием и созданием нового файла его может не быть: ждём следующего опроса
+            return
+
+        stat = os.fstat(self.file.fileno())
+        inode = (stat.st_dev, stat.st_ino)
+        state = self.state
+        if resume and state.inode == inode and stat.st_size >= state.offset and self._head_matches(state.head):
+            self.file.seek(state.offset)
+            return
+
+        # Новый или обрезанный файл читается с начала; агрегаты продолжаются, если заголовок тот же
+        self.file.seek(0)
+        state.offset = 0
+        state.inode = inode
+        state.head = b''
+
+    def _head_matches(self, head: bytes) -> bool:
+        self.file.seek(0)
+        return self.file.read(len(head)) == head
+
+    def _rotated(self) -> bool:
+        try:
+            stat = os.stat(self.file_path)
+        except FileNotFoundError:
+            return False
+        if (stat.st_dev, stat.st_ino) != self.state.inode or stat.st_size < self.state.offset:
+            return True
+        # Обрезанный и дописанный на месте файл может дорасти до прежнего смещения: сверяем его начало
+        head = self.state.head
+        return bool(head) and os.pread(self.file.fileno(), len(head), 0) != head
+
+    def _read(self, matched: List[Dict[str, Any]]) -> bool:
+        state = self.state
+        changed = False
+        pending = b''
+        while True:
+            chunk = self.file.read(READ_SIZE)
+            if not chunk:
+                break
+            pending += chunk
+            records, consumed = split_records(pending)
+            at_start = state.offset == 0
+            if state.offset < HEAD_SIZE:
+                state.head = (state.head + pending[:consumed])[:HEAD_SIZE]
+            state.offset += consumed
+            pending = pending[consumed:]
+            changed = self._consume(records, matched, at_start) or changed
+
+        # Неполная строка будет перечитана с сохранённого смещения
+        self.file.seek(state.offset)
+        return changed
+
+    def _consume(self, records: List[bytes], matched: List[Dict[str, Any]], at_start: bool) -> bool:
+        state = self.state
+        records_fields = []
+        for record in records:
+            fields = _split_record(record)
+            if not fields:
+                continue
+            if at_start:
+                # Первая запись файла — заголовок; после ротации он обычно тот же, и накопленное сохраняется
+                at_start = False
+                if fields != state.header:
+                    self._start(fields)
+                continue
+            records_fields.append(fields)
+
+        # Те же компактные строки, что у остальных читателей: короткая запись дополняется None, а не теряет ключи
+        rows = list(to_rows(state.header, records_fields)) if state.header is not None else []
+        if not rows:
+            return False
+        if state.schema is None:
+            # Строки уже в файле, так что типы выводятся по ним, как в обычном запросе к этому файлу
+            schema = load_schema(self.file_path, self.schema_path, self.schema_sample, use_cache=False)
+            state.schema = schema.allow_nulls()
+
+        if self.where:
+            rows = list(iter_filter(rows, self.where, state.schema))
+        if self.aggregating:
+            feed_grouping(state.grouping, rows, state.schema)
+        else:
+            matched.extend(rows)
+        return bool(rows)
+
+    def _start(self, header: List[str]):
+        # Другой заголовок — другие данные: накопленное состояние и типы колонок сбрасываются
+        state = self.state
+        state.header = header
+        state.grouping = None
+        state.schema = None
+        if self.where:
+            parse_expression(self.where).resolve(header)
+        if self.aggregating:
+            state.grouping = prepare_grouping(header, self.group_by, self.aggregates, self.compression)
+
+    def _load_checkpoint(self) -> Optional[FollowState]:
+        if not self.checkpoint:
+            return None
+        try:
+            with open(self.checkpoint, 'rb') as file:
+                version, key, state = pickle.load(file)
+        except (OSError, EOFError, ValueError, TypeError, pickle.UnpicklingError):
+            return None
+        if version != CHECKPOINT_VERSION or key != self._key():
+            return None
+        return state
+
+    def _save_checkpoint(self):
+        if not self.checkpoint:
+            return
+        directory = os.path.dirname(os.path.abspath(self.checkpoint))
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as file:
+            pickle.dump((CHECKPOINT_VERSION, self._key(), self.state), file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, self.checkpoint)
+
+    def _key(self) -> List[Any]:
+        schema = os.path.abspath(self.schema_path) if self.schema_path else None
+        return [os.path.abspath(self.file_path), self.where, self.aggregates, self.group_by, self.compression,
+                schema, self.schema_sample]
+
+
+def write_batch(rows: List[Dict[str, Any]], output_format: str, stream: TextIO, first: bool):
+    from src.writers import write_delimited, write_grid, write_rows
+    if output_format == 'grid':
+        write_grid(rows, stream, None, floatfmt=".2f")
+    elif output_format in ('csv', 'tsv'):
+        # Заголовок пишется один раз, дальше идут только новые строки
+        write_delimited(rows, stream, ',' if output_format == 'csv' else '\t', header=first)
+    else:
+        write_rows(rows, output_format, stream)
+    stream.flush()
+
+
+def follow(args, stream: TextIO, interval: Optional[float] = None, polls: Optional[int] = None,
+           sleep: Callable[[float], None] = time.sleep):
+    if args.order_by or getattr(args, 'limit', None):
+        raise ArgumentError("--follow does not support --order-by or --limit: results are emitted as rows arrive")
+    if not isinstance(args.file, str):
+        raise ArgumentError("--follow watches a single file")
+    if is_compressed(args.file):
+        raise ArgumentError("--follow reads appended bytes and needs an uncompressed CSV")
+    if args.output_format == 'binary':
+        raise ArgumentError("--follow writes rows continuously; use --output-format grid, csv, tsv or jsonl")
+
+    checkpoint = getattr(args, 'checkpoint', None) or default_checkpoint_path(args)
+    follower = Follower(args.file, args.where, args.aggregate, getattr(args, 'group_by', None),
+                        getattr(args, 'quantile_compression', None) or DEFAULT_COMPRESSION, checkpoint,
+                        getattr(args, 'schema', None), getattr(args, 'schema_sample', None))
+    interval = getattr(args, 'follow_interval', None) if interval is None else interval
+    first = True
+    count = 0
+    try:
+        while True:
+            rows, _ = follower.poll()
+            if rows:
+                write_batch(rows, args.output_format, stream, first)
+                first = False
+            count += 1
+            if polls is not None and count >= polls:
+                return
+            sleep(interval or DEFAULT_INTERVAL)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        follower.close()
@@ -0,0 +1,234 @@
+import json
+import math
+import mmap
+import os
+import struct
+import tempfile
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple
+from urllib.parse import quote
+
+from src.compression import is_compressed
+from src.exceptions import ColumnNotFoundError, CSVProcessingError, FileValidationError
+from src.expressions import Expression, Comparison, Membership, And, parse_expression
+from src.rows import Row, to_rows
+from src.scanner import map_file, scan_cells, read_record_at, _read_record, _parse_record
+
+MAGIC = b'CSVIDX01'
+
+
+def index_path(file_path: str, col: str) -> str:
+    return f"{file_path}.{quote(col, safe='')}.idx"
+
+
+def file_state(file_path: str) -> Dict[str, int]:
+    stat = os.stat(file_path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def _write_sections(path: str, header: Dict[str, Any], sections: List[Tuple[str, array]]):
+    header['sections'] = {}
+    position = 0
+    blobs = []
+    for name, data in sections:
+        raw = data.tobytes()
+        header['sections'][name] = [position, len(raw), data.typecode]
+        padding = -len(raw) % 8
+        blobs.append(raw + b'\0' * padding)
+        position += len(raw) + padding
+
+    encoded = json.dumps(header).encode('utf-8')
+    prefix = MAGIC + struct.pack('<Q', len(encoded)) + encoded
+    prefix += b'\0' * (-len(prefix) % 8)
+
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            file.write(prefix)
+            for blob in blobs:
+                file.write(blob)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def build_index(file_path: str, col: str) -> str:
+    if is_compressed(file_path):
+        raise FileValidationError("Indexes point into the file by byte offset; decompress the CSV to index it")
+    source = file_state(file_path)
+    mm = map_file(file_path)
+    if mm is None:
+        raise ColumnNotFoundError(col)
+
+    with mm:
+        header = _parse_record(_read_record(mm))
+        if col not in header:
+            raise ColumnNotFoundError(col, header)
+
+        groups: Dict[str, array] = {}
+        numbers = []
+        numeric = complete = True
+        for offset, cell in scan_cells(mm, mm.tell(), mm.size(), header.index(col)):
+            if cell is None:
+                complete = numeric = False
+                continue
+
+            key = cell.strip().lower()
+            offsets = groups.get(key)
+            if offsets is None:
+                offsets = groups[key] = array('q')
+            offsets.append(offset)
+
+            if numeric:
+                try:
+                    number = float(cell)
+                except ValueError:
+                    numeric = False
+                    continue
+                if math.isnan(number):
+                    numeric = False
+                numbers.append((number, offset))
+
+    grouped_offsets = array('q')
+    ranges = {}
+    for key, offsets in groups.items():
+        ranges[key] = [len(grouped_offsets), len(grouped_offsets) + len(offsets)]
+        grouped_offsets.extend(offsets)
+    sections = [('grouped_offsets', grouped_offsets)]
+
+    if numeric:
+        # Сортированный индекс для диапазонов: ключи и смещения строк в порядке возрастания значения
+        numbers.sort()
+        sections.append(('keys', array('d', (number for number, _ in numbers))))
+        sections.append(('sorted_offsets', array('q', (offset for _, offset in numbers))))
+
+    path = index_path(file_path, col)
+    _write_sections(path, {
+        'source': source, 'column': col, 'header': header, 'numeric': numeric, 'complete': complete,
+        'groups': ranges,
+    }, sections)
+    return path
+
+
+class ColumnIndex:
+    def __init__(self, header: Dict[str, Any], sections: Dict[str, memoryview]):
+        self.column = header['column']
+        self.header = header['header']
+        self.numeric = header['numeric']
+        self.complete = header['complete']
+        self.groups = header['groups']
+        self.grouped_offsets = sections['grouped_offsets']
+        self.keys = sections.get('keys')
+        self.sorted_offsets = sections.get('sorted_offsets')
+
+    def _group(self, value: str) -> Iterable[int]:
+        start, end = self.groups.get(value.lower(), (0, 0))
+        return self.grouped_offsets[start:end]
+
+    def _range(self, op_symbol: str, value: float) -> Iterable[int]:
+        keys, offsets = self.keys, self.sorted_offsets
+        if op_symbol == '>':
+            return offsets[bisect_right(keys, value):]
+        elif op_symbol == '>=':
+            return offsets[bisect_left(keys, value):]
+        elif op_symbol == '<':
+            return offsets[:bisect_left(keys, value)]
+        elif op_symbol == '<=':
+            return offsets[:bisect_right(keys, value)]
+        elif op_symbol == '=':
+            return offsets[bisect_left(keys, value):bisect_right(keys, value)]
+        return list(offsets[:bisect_left(keys, value)]) + list(offsets[bisect_right(keys, value):])
+
+    def lookup(self, expression: Expression) -> Optional[List[int]]:
+        # None — индекс не может ответить так же, как полный просмотр, и нужен обычный путь
+        if not self.complete:
+            return None
+
+        if isinstance(expression, Membership):
+            if expression.numbers and not self.numeric:
+                return None
+            found = set()
+            for value in expression.strings:
+                found.update(self._group(value))
+            for number in expression.numbers:
+                found.update(self._range('=', number))
+            return sorted(found)
+
+        value = expression.value
+        if isinstance(value, (int, float)):
+            if not self.numeric:
+                return None
+            return sorted(self._range(expression.op_symbol, value))
+
+        if expression.op_symbol == '=':
+            return list(self._group(value))
+        if expression.op_symbol == '!=':
+            matched = set(self._group(value))
+            return sorted(offset for offset in self.grouped_offsets if offset not in matched)
+        return None
+
+
+def load_index(file_path: str, col: str) -> Optional[ColumnIndex]:
+    path = index_path(file_path, col)
+    if not os.path.exists(path):
+        return None
+
+    with open(path, mode='rb') as file:
+        mm = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    try:
+        if mm[:len(MAGIC)] != MAGIC:
+            raise ValueError(path)
+        header_length = struct.unpack_from('<Q', mm, len(MAGIC))[0]
+        start = len(MAGIC) + 8
+        header = json.loads(mm[start:start + header_length])
+        # Индекс устарел, если CSV изменился после построения
+        if header['source'] != file_state(file_path):
+            raise ValueError(path)
+    except (ValueError, KeyError, struct.error):
+        mm.close()
+        return None
+
+    base = start + header_length
+    base += -base % 8
+    view = memoryview(mm)
+    sections = {
+        name: view[base + offset:base + offset + length].cast(fmt)
+        for name, (offset, length, fmt) in header['sections'].items()
+    }
+    return ColumnIndex(header, sections)
+
+
+def read_rows(file_path: str, header: List[str], offsets: List[int]) -> Iterator[Row]:
+    mm = map_file(file_path)
+    if mm is None:
+        return
+
+    # Та же форма строки, что у iter_csv: недостающие поля — None
+    with mm:
+        yield from to_rows(header, (read_record_at(mm, offset) for offset in offsets))
+
+
+def indexed_rows(file_path: str, where: str) -> Optional[Iterator[Row]]:
+    try:
+        expression = parse_expression(where)
+    except CSVProcessingError:
+        return None
+
+    # Индекс сужает выборку по одному условию; всё выражение затем проверяется на найденных строках
+    clauses = expression.ordered() if isinstance(expression, And) else [expression]
+    for clause in clauses:
+        if not isinstance(clause, (Comparison, Membership)):
+            continue
+        index = load_index(file_path, clause.col)
+        if index is None:
+            continue
+        offsets = index.lookup(clause)
+        if offsets is None:
+            continue
+        expression.resolve(index.header)
+        return read_rows(file_path, index.header, offsets)
+
+    return None
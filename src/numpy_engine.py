@@ -0,0 +1,171 @@
+from array import array
+from typing import Iterable, Optional
+
+from src.aggregates import DEFAULT_COMPRESSION
+from src.csv_processor import OPERATORS_MAP, parse_aggregation, parse_sort, compile_condition, infer_type
+from src.exceptions import ArgumentError, ColumnNotFoundError, FilterError, AggregationError, SortError
+from src.expressions import Expression, Comparison, Membership, Not, And, Or, parse_expression
+from src.schema import Schema
+from src.table import (
+    Table, NumericColumn, StringColumn, read_table, aggregate_table, typed_matches, typed_order
+)
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def _values(column):
+    if isinstance(column, StringColumn):
+        return np.frombuffer(column.codes, dtype=np.uint32)
+    return np.frombuffer(column.data, dtype=np.int64 if column.kind == 'int' else np.float64)
+
+
+def _stable_argsort(values, reverse: bool):
+    if not reverse:
+        return np.argsort(values, kind='stable')
+    # Стабильная сортировка по убыванию: равные ключи сохраняют исходный порядок, как в sorted(reverse=True)
+    order = np.argsort(values[::-1], kind='stable')[::-1]
+    return len(values) - 1 - order
+
+
+class NumpyTable(Table):
+    def take(self, indices: Iterable[int]) -> 'NumpyTable':
+        indices = np.asarray(indices, dtype=np.int64)
+        columns = {}
+        for name, column in self.columns.items():
+            taken = _values(column)[indices].tobytes()
+            if isinstance(column, StringColumn):
+                columns[name] = StringColumn(column.values, array('I', taken))
+                continue
+
+            int_literals = None
+            if column.int_literals is not None:
+                int_literals = array('b', np.frombuffer(column.int_literals, dtype=np.int8)[indices].tobytes())
+            overrides = None
+            if column.overrides:
+                overrides = {j: column.overrides[i] for j, i in enumerate(indices.tolist()) if i in column.overrides}
+            columns[name] = NumericColumn(column.kind, array(column.typecode, taken), overrides, int_literals)
+
+        return NumpyTable(columns, len(indices))
+
+    def filter(self, condition: str, schema: Optional[Schema] = None) -> 'NumpyTable':
+        if not condition or not len(self):
+            return self
+
+        expression = parse_expression(condition)
+        expression.resolve(self.column_names)
+        return self.take(np.flatnonzero(self._mask(expression, schema)))
+
+    def _mask(self, expression: Expression, schema: Optional[Schema] = None):
+        if isinstance(expression, Not):
+            return ~self._mask(expression.child, schema)
+        if isinstance(expression, And):
+            return np.logical_and.reduce([self._mask(child, schema) for child in expression.ordered()])
+        if isinstance(expression, Or):
+            return np.logical_or.reduce([self._mask(child, schema) for child in expression.ordered()])
+
+        column = self.columns[expression.col]
+        values = _values(column)
+        if schema is not None and not (isinstance(expression, Comparison) and expression.textual):
+            if isinstance(expression, Comparison) and isinstance(column, NumericColumn):
+                kind, value = expression.typed_target(schema)
+                if kind == column.kind:
+                    # Числа колонки уже того типа, в который их перевела бы схема
+                    return OPERATORS_MAP[expression.op_symbol](values, value)
+            return np.fromiter(typed_matches(self, expression, schema), dtype=bool, count=len(values))
+        if isinstance(expression, Membership):
+            if isinstance(column, StringColumn):
+                matches = expression.matcher()
+                return np.array([bool(matches(text)) for text in column.values], dtype=bool)[values]
+            return np.isin(values, list(expression.numbers))
+
+        op_symbol, value = expression.op_symbol, expression.value
+        if isinstance(column, StringColumn):
+            matches = compile_condition(op_symbol, value)
+            matched = np.array([bool(matches(text)) for text in column.values], dtype=bool)
+            return matched[values]
+        elif isinstance(value, str):
+            if op_symbol not in ("=", "!="):
+                raise FilterError(f"Error comparing values in row: cannot compare numbers with '{value}'")
+            return np.full(len(values), op_symbol == "!=")
+        return OPERATORS_MAP[op_symbol](values, value)
+
+    def aggregate(self, operation: str, schema: Optional[Schema] = None,
+                  compression: int = DEFAULT_COMPRESSION) -> float:
+        if not len(self):
+            raise AggregationError("Cannot aggregate empty dataset")
+
+        col, func_name = parse_aggregation(operation)
+
+        if col not in self.columns:
+            raise ColumnNotFoundError(f"Column '{col}' not found in CSV")
+
+        column = self.columns[col]
+        if isinstance(column, StringColumn):
+            return aggregate_table(self, operation, schema, compression)
+        if schema is not None and (func_name not in ("min", "max", "avg", "sum") or
+                                   schema.numeric_kind(col, (func_name,)) != column.kind):
+            return aggregate_table(self, operation, schema, compression)
+
+        values = _values(column)
+        if func_name == "min":
+            return values.min().item()
+        elif func_name == "max":
+            return values.max().item()
+        elif func_name == "avg":
+            return self._sum(column, values) / len(values)
+        elif func_name == "sum":
+            return self._sum(column, values)
+        return aggregate_table(self, operation)
+
+    @staticmethod
+    def _sum(column: NumericColumn, values):
+        if column.kind == 'int':
+            bound = max(abs(int(values.min())), abs(int(values.max())))
+            if bound * len(values) < 2 ** 63:
+                return int(values.sum())
+            return sum(column.data)
+
+        # Накопительная сумма складывает слева направо, как цикл в aggregate_data
+        return np.add.accumulate(values)[-1].item()
+
+    def sort(self, condition: str, schema: Optional[Schema] = None) -> 'NumpyTable':
+        if not len(self):
+            return self
+
+        col, reverse = parse_sort(condition)
+
+        if col not in self.columns:
+            raise ColumnNotFoundError(f"Column '{col}' not found in CSV")
+
+        column = self.columns[col]
+        if schema is not None and schema.sorts_typed(col) and \
+                not (isinstance(column, NumericColumn) and schema.column(col).kind == column.kind):
+            return self.take(typed_order(self, col, reverse, schema))
+        values = _values(column)
+        if isinstance(column, StringColumn):
+            try:
+                keys = [infer_type(text) for text in column.values]
+                ranks = {key: rank for rank, key in enumerate(sorted(set(keys)))}
+            except Exception as e:
+                raise SortError(f"Sorting error: {e}")
+            values = np.array([ranks[key] for key in keys], dtype=np.int64)[values]
+
+        return self.take(_stable_argsort(values, reverse))
+
+
+def require_numpy():
+    if np is None:
+        raise ArgumentError("NumPy is not installed. Install numpy or use --engine python")
+
+
+def to_numpy_table(table: Table) -> NumpyTable:
+    require_numpy()
+    return NumpyTable(table.columns, len(table))
+
+
+def read_numpy_table(file_path: str) -> NumpyTable:
+    require_numpy()
+    return to_numpy_table(read_table(file_path))
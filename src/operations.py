@@ -1,6 +1,65 @@
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any, Union
-from .exceptions import CSVProcessingError
+from itertools import islice
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Sequence, Tuple, Union
+from .exceptions import AggregationError, ColumnNotFoundError, CSVProcessingError
+from .rows import Row, header_index
+
+DEFAULT_BATCH_SIZE = 1024
+
+
+class Batch:
+    # Пакет строк: имена колонок один раз и строки как кортежи значений в том же порядке
+    __slots__ = ('columns', 'rows')
+
+    def __init__(self, columns: Sequence[str], rows: List[Tuple[Any, ...]]):
+        self.columns = list(columns)
+        self.rows = rows
+
+    def __len__(self):
+        return len(self.rows)
+
+    def index(self, col: str) -> int:
+        try:
+            return self.columns.index(col)
+        except ValueError:
+            raise ColumnNotFoundError(col, self.columns)
+
+    def column(self, col: str) -> List[Any]:
+        i = self.index(col)
+        return [row[i] for row in self.rows]
+
+    def select(self, columns: Sequence[str]) -> 'Batch':
+        positions = [self.index(col) for col in columns]
+        return Batch(columns, [tuple(row[i] for i in positions) for row in self.rows])
+
+    def dicts(self) -> Iterator[Dict[str, Any]]:
+        columns = self.columns
+        for row in self.rows:
+            yield dict(zip(columns, row))
+
+
+def to_batches(rows: Iterable[Dict[str, Any]], size: int = DEFAULT_BATCH_SIZE) -> Iterator[Batch]:
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        keys = chunk[0].keys()
+        columns = list(keys)
+        # Строки с другим набором колонок начинают новый пакет
+        start = 0
+        for i, row in enumerate(chunk):
+            if row.keys() != keys:
+                yield Batch(columns, [tuple(item[col] for col in columns) for item in chunk[start:i]])
+                keys = row.keys()
+                columns = list(keys)
+                start = i
+        yield Batch(columns, [tuple(item[col] for col in columns) for item in chunk[start:]])
+
+
+def from_batches(batches: Iterable[Batch]) -> Iterator[Dict[str, Any]]:
+    for batch in batches:
+        yield from batch.dicts()
 
 
 class Operation(ABC):
@@ -8,24 +67,138 @@ class Operation(ABC):
     def execute(self, data: List[Dict[str, Any]], arg: str) -> Union[List[Dict[str, Any]], float]:
         pass
 
+    def stream(self, rows: Iterable[Dict[str, Any]], arg: str) -> Union[Iterable[Dict[str, Any]], float]:
+        return self.execute(list(rows), arg)
+
+
+class BatchOperation(ABC):
+    # Потоковая операция отдаёт пакеты по мере поступления; блокирующей нужен весь вход до первого результата
+    streaming = True
+
+    def columns(self, arg: str) -> Optional[List[str]]:
+        # Колонки, которые операция читает; None — нужны все
+        return None
+
+    @abstractmethod
+    def process_batches(self, batches: Iterator[Batch], arg: str) -> Union[Iterator[Batch], Any]:
+        pass
+
+
+class ListOperationAdapter(BatchOperation):
+    # Старые операции получают весь вход списком словарей, как раньше
+    streaming = False
 
-class FilterOperation(Operation):
+    def __init__(self, operation: Operation):
+        self.operation = operation
+
+    def process_batches(self, batches: Iterator[Batch], arg: str) -> Union[Iterator[Batch], Any]:
+        result = self.operation.execute(list(from_batches(batches)), arg)
+        if isinstance(result, list):
+            return to_batches(result)
+        return result
+
+
+def as_batch_operation(operation: Union[Operation, BatchOperation]) -> BatchOperation:
+    if isinstance(operation, BatchOperation):
+        return operation
+    return ListOperationAdapter(operation)
+
+
+def run_batches(rows: Iterable[Dict[str, Any]], operations: List[Tuple[Union[Operation, BatchOperation], str]],
+                batch_size: int = DEFAULT_BATCH_SIZE) -> Union[Iterator[Dict[str, Any]], Any]:
+    # Операции сцепляются через итераторы пакетов: между ними нет ни списков, ни словарей на строку
+    batches = to_batches(rows, batch_size)
+    for position, (operation, arg) in enumerate(operations):
+        result = as_batch_operation(operation).process_batches(batches, arg)
+        if not isinstance(result, (Iterator, list)):
+            if position < len(operations) - 1:
+                raise CSVProcessingError(f"Operation {type(operation).__name__} returns a single value "
+                                         "and must be the last one")
+            return result
+        batches = iter(result)
+    return from_batches(batches)
+
+
+class FilterOperation(Operation, BatchOperation):
     def execute(self, data: List[Dict[str, Any]], condition: str) -> List[Dict[str, Any]]:
         from .csv_processor import apply_filter
         return apply_filter(data, condition)
 
+    def stream(self, rows: Iterable[Dict[str, Any]], condition: str) -> Iterable[Dict[str, Any]]:
+        from .csv_processor import iter_filter
+        return iter_filter(rows, condition)
+
+    def columns(self, condition: str) -> Optional[List[str]]:
+        from .expressions import parse_expression
+        return parse_expression(condition).columns()
+
+    def process_batches(self, batches: Iterator[Batch], condition: str) -> Iterator[Batch]:
+        from .csv_processor import compile_filter
+        predicate = None
+        columns = None
+        view = None
+        for batch in batches:
+            if batch.columns != columns:
+                columns = batch.columns
+                view = Row(header_index(columns), ())
+                predicate = compile_filter(condition, columns, index=view.index)
+            # Один объект Row на весь поток: кортеж пакета подставляется в него без копирования значений
+            rows = []
+            for row in batch.rows:
+                view.fields = row
+                if predicate(view):
+                    rows.append(row)
+            if rows:
+                yield Batch(columns, rows)
+
+
+class AggregateOperation(Operation, BatchOperation):
+    streaming = False
 
-class AggregateOperation(Operation):
     def execute(self, data: List[Dict[str, Any]], operation: str) -> float:
         from .csv_processor import aggregate_data
         return aggregate_data(data, operation)
 
+    def stream(self, rows: Iterable[Dict[str, Any]], operation: str) -> float:
+        from .csv_processor import aggregate_data
+        return aggregate_data(rows, operation)
+
+    def columns(self, operation: str) -> Optional[List[str]]:
+        from .csv_processor import parse_aggregation
+        return [parse_aggregation(operation)[0]]
+
+    def process_batches(self, batches: Iterator[Batch], operation: str) -> float:
+        # Значения берутся прямо из колонки пакета, без словаря на строку
+        from .aggregates import Accumulator, is_aggregate_function
+        from .csv_processor import numeric_value, parse_aggregation
+        col, func_name = parse_aggregation(operation)
+        if not is_aggregate_function(func_name):
+            raise AggregationError(f"Unsupported aggregation function: {func_name}")
+
+        accumulator = Accumulator((func_name,))
+        for batch in batches:
+            i = batch.index(col)
+            accumulator.update(numeric_value(row[i], col) for row in batch.rows)
+        if not accumulator.count:
+            raise AggregationError("Cannot aggregate empty dataset")
+        return accumulator.result(func_name)
+
+
+class SortOperation(Operation, BatchOperation):
+    streaming = False
 
-class SortOperation(Operation):
     def execute(self, data: List[Dict[str, Any]], condition: str) -> List[Dict[str, Any]]:
         from .csv_processor import apply_sort
         return apply_sort(data, condition)
 
+    def columns(self, condition: str) -> Optional[List[str]]:
+        from .csv_processor import parse_sort
+        return [parse_sort(condition)[0]]
+
+    def process_batches(self, batches: Iterator[Batch], condition: str) -> Iterator[Batch]:
+        from .csv_processor import apply_sort
+        return to_batches(apply_sort(list(from_batches(batches)), condition))
+
 
 OPERATIONS_REGISTRY = {
     'where': FilterOperation(),
@@ -34,6 +207,5 @@ OPERATIONS_REGISTRY = {
 }
 
 
-def register_operation(name: str, operation: Operation):
+def register_operation(name: str, operation: Union[Operation, BatchOperation]):
     OPERATIONS_REGISTRY[name] = operation
-
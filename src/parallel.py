@@ -0,0 +1,174 @@
+import csv
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import chain
+from typing import List, Dict, Any, Iterator, Optional, Tuple, Union
+
+from src.aggregates import GroupedAggregation, DEFAULT_COMPRESSION
+from src.csv_processor import (
+    iter_filter, aggregate_data, apply_sort, referenced_columns, aggregate_specs, prepare_grouping, feed_grouping,
+    group_aggregate
+)
+from src.exceptions import AggregationError
+from src.rows import to_rows
+from src.scanner import projection, iter_range
+from src.schema import Schema
+from src.sorting import top_k
+
+BLOCK_SIZE = 1 << 20
+MIN_CHUNK_SIZE = 4 << 20
+MAX_CHUNK_SIZE = 64 << 20
+
+
+def read_header(file_path: str) -> Tuple[Optional[List[str]], int]:
+    with open(file_path, mode='rb') as file:
+        raw = b''
+        while True:
+            line = file.readline()
+            raw += line
+            if not line or raw.count(b'"') % 2 == 0:
+                break
+
+    header = next(csv.reader(io.TextIOWrapper(io.BytesIO(raw), encoding='utf-8')), None)
+    return header, len(raw)
+
+
+def _record_boundaries(file, start: int, targets: List[int]) -> List[int]:
+    # Перевод строки — граница записи, только если перед ним чётное число кавычек
+    file.seek(start)
+    position = start
+    quotes = 0
+    targets = iter(targets)
+    target = next(targets, None)
+    boundaries = []
+
+    while target is not None:
+        block = file.read(BLOCK_SIZE)
+        if not block:
+            break
+
+        search = 0
+        while target is not None and target < position + len(block):
+            local = max(target - position, search)
+            quotes += block.count(b'"', search, local)
+            search = local
+
+            newline = block.find(b'\n', search)
+            if newline < 0:
+                break
+            quotes += block.count(b'"', search, newline)
+            search = newline + 1
+
+            if quotes % 2 == 0:
+                boundaries.append(position + search)
+                while target is not None and target < position + search:
+                    target = next(targets, None)
+
+        quotes += block.count(b'"', search)
+        position += len(block)
+
+    return boundaries
+
+
+def split_file(file_path: str, start: int, parts: int) -> List[Tuple[int, int]]:
+    size = os.path.getsize(file_path)
+    if parts <= 1 or size <= start:
+        return [(start, size)]
+
+    step = (size - start) // parts
+    targets = [start + step * i for i in range(1, parts)]
+    with open(file_path, mode='rb') as file:
+        boundaries = _record_boundaries(file, start, targets)
+
+    edges = [start] + boundaries + [size]
+    return [(begin, end) for begin, end in zip(edges, edges[1:]) if end > begin]
+
+
+def _scan_range(file_path: str, header: List[str], where: Optional[str], aggregate: List[str],
+                group_by: Optional[str], compression: int, schema: Optional[Schema],
+                byte_range: Tuple[int, int]) -> Union[List[Dict[str, Any]], GroupedAggregation]:
+    start, end = byte_range
+    selected = None
+    if aggregate:
+        selected = projection(header, referenced_columns(where, None, aggregate, group_by) or [], selective=True)
+
+    if selected is not None:
+        rows = iter_range(file_path, start, end, *selected)
+    else:
+        with open(file_path, mode='rb') as file:
+            file.seek(start)
+            raw = file.read(end - start)
+        rows = to_rows(header, csv.reader(io.TextIOWrapper(io.BytesIO(raw), encoding='utf-8')))
+
+    if where:
+        rows = iter_filter(rows, where, schema)
+
+    if not aggregate:
+        return list(rows)
+
+    # Без --group-by все агрегаты считаются как одна группа с ключом None
+    return feed_grouping(prepare_grouping(header, group_by, aggregate, compression), rows, schema)
+
+
+def merge_groupings(results: List[GroupedAggregation], aggregate: List[str], group_by: Optional[str] = None,
+                    order_by: Optional[str] = None,
+                    limit: Optional[int] = None) -> Union[Iterator[Dict[str, Any]], float]:
+    # Частичные агрегаты сливаются в порядке кусков, поэтому порядок групп как при одном проходе;
+    # avg и дисперсия сливаются через сумму, число и моменты, а не усреднением средних
+    rows = []
+    if results:
+        grouping = results[0]
+        for partial_result in results[1:]:
+            grouping.merge(partial_result)
+        rows = grouping.results()
+    if group_by:
+        if order_by:
+            rows = apply_sort(rows, order_by)
+        return iter(rows[:limit] if limit else rows)
+    if not rows:
+        raise AggregationError("Cannot aggregate empty dataset")
+    if len(aggregate) == 1:
+        return next(iter(rows[0].values()))
+    return iter(rows)
+
+
+def run_parallel(file_path: str, workers: int, where: Optional[str] = None, order_by: Optional[str] = None,
+                 aggregate: Union[str, List[str], None] = None, limit: Optional[int] = None,
+                 group_by: Optional[str] = None, compression: int = DEFAULT_COMPRESSION,
+                 schema: Optional[Schema] = None) -> Union[Iterator[Dict[str, Any]], float]:
+    aggregate = aggregate_specs(aggregate)
+    header, start = read_header(file_path)
+    if header is None:
+        rows = iter(())
+        if group_by:
+            return iter(group_aggregate(rows, group_by, aggregate))
+        if aggregate:
+            return aggregate_data(rows, aggregate[0])
+        return rows
+
+    size = os.path.getsize(file_path) - start
+    parts = min(workers * 4, size // MIN_CHUNK_SIZE)
+    parts = max(parts, -(-size // MAX_CHUNK_SIZE), 1)
+    ranges = split_file(file_path, start, parts)
+
+    if schema is not None:
+        # Типы выводятся до запуска процессов: каждый кусок переводит ячейки одной и той же схемой
+        schema.infer()
+    scan = partial(_scan_range, file_path, header, where, aggregate, group_by, compression, schema)
+    if len(ranges) == 1:
+        results = [scan(ranges[0])]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(scan, ranges))
+
+    if aggregate:
+        return merge_groupings(results, aggregate, group_by, order_by, limit)
+
+    rows = chain.from_iterable(results)
+    if order_by and limit:
+        return iter(top_k(rows, order_by, limit, schema))
+    if order_by:
+        return iter(apply_sort(list(rows), order_by, schema))
+    return rows
@@ -0,0 +1,187 @@
+import glob
+import heapq
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import chain, islice
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple, Union
+
+from src.aggregates import GroupedAggregation, DEFAULT_COMPRESSION
+from src.csv_processor import (
+    sort_key, parse_sort, iter_filter, apply_sort, load_data, referenced_columns, aggregate_specs, prepare_grouping,
+    feed_grouping
+)
+from src.exceptions import ArgumentError, CSVProcessingError, FileValidationError, SortError
+from src.expressions import Expression, Comparison, Membership, Not, And, Or, parse_expression
+from src.index import indexed_rows
+from src.parallel import merge_groupings
+from src.schema import CONVERSION_ERRORS, Schema
+from src.sorting import top_k
+
+GLOB_CHARS = re.compile(r'[*?\[]')
+# Каталог вида date=2024-01-01 задаёт значение колонки для всех файлов внутри (раскладка Hive)
+DIRECTORY_VALUE = re.compile(r'([^=]+)=(.*)')
+
+Partition = Tuple[str, Dict[str, str]]
+
+
+def expand_inputs(patterns: Union[str, Iterable[str]]) -> Union[str, List[str]]:
+    # Один путь остаётся строкой, как раньше; несколько путей и маски дают список файлов
+    if isinstance(patterns, str):
+        patterns = [patterns]
+    paths = []
+    for pattern in patterns:
+        if not GLOB_CHARS.search(pattern):
+            paths.append(pattern)
+            continue
+        matched = sorted(path for path in glob.glob(pattern, recursive=True) if os.path.isfile(path))
+        if not matched:
+            raise FileValidationError(f"No files match: {pattern}")
+        paths.extend(matched)
+
+    paths = list(dict.fromkeys(paths))
+    return paths[0] if len(paths) == 1 else paths
+
+
+def input_paths(file: Union[str, List[str]]) -> List[str]:
+    return [file] if isinstance(file, str) else list(file)
+
+
+def partition_values(path: str, pattern: Optional[str] = None) -> Dict[str, str]:
+    values = {}
+    for part in os.path.normpath(os.path.dirname(path)).split(os.sep):
+        match = DIRECTORY_VALUE.fullmatch(part)
+        if match:
+            values[match.group(1)] = match.group(2)
+    if pattern:
+        match = re.search(pattern, path.replace(os.sep, '/'))
+        if match:
+            values.update({key: value for key, value in match.groupdict().items() if value is not None})
+    return values
+
+
+def _decide(expression: Expression, values: Dict[str, str], schema: Optional[Schema] = None) -> Optional[bool]:
+    # Трёхзначная логика: True/False, если условие определяется значениями из имени файла, иначе None
+    if isinstance(expression, (Comparison, Membership)):
+        if expression.col not in values:
+            return None
+        try:
+            return bool(expression.compile(schema)({expression.col: values[expression.col]}))
+        except (CSVProcessingError,) + CONVERSION_ERRORS:
+            return None
+    if isinstance(expression, Not):
+        decided = _decide(expression.child, values, schema)
+        return None if decided is None else not decided
+    if isinstance(expression, (And, Or)):
+        decisions = [_decide(child, values, schema) for child in expression.children]
+        final = isinstance(expression, Or)
+        if final in decisions:
+            return final
+        return None if None in decisions else not final
+    return None
+
+
+def prune_partitions(partitions: List[Partition], where: Optional[str],
+                     schema: Optional[Schema] = None) -> List[Partition]:
+    if not where:
+        return partitions
+    try:
+        expression = parse_expression(where)
+    except CSVProcessingError:
+        return partitions
+    # Файл пропускается, только если фильтр заведомо ложен для всех его строк
+    return [(path, values) for path, values in partitions if _decide(expression, values, schema) is not False]
+
+
+def _scan_partition(where: Optional[str], order_by: Optional[str], aggregate: List[str], group_by: Optional[str],
+                    limit: Optional[int], compression: int, schema: Optional[Schema],
+                    partition: Partition) -> Union[None, List[Dict[str, Any]], GroupedAggregation]:
+    path, values = partition
+    rows = None
+    if where:
+        rows = indexed_rows(path, where)
+    if rows is None:
+        columns = referenced_columns(where, None, aggregate, group_by) if aggregate else None
+        rows = load_data(path, 'python', columns)
+
+    rows = iter(rows)
+    first = next(rows, None)
+    if first is None:
+        return None
+    rows = chain((first,), rows)
+    # Колонки из имени файла, которых нет в самом файле, добавляются к каждой его строке
+    extra = {key: value for key, value in values.items() if key not in first}
+    if extra:
+        rows = ({**row, **extra} for row in rows)
+
+    if where:
+        rows = iter_filter(rows, where, schema)
+    if aggregate:
+        return feed_grouping(prepare_grouping(list(first) + list(extra), group_by, aggregate, compression), rows,
+                             schema)
+    if order_by and limit:
+        return top_k(rows, order_by, limit, schema)
+    if order_by:
+        return apply_sort(list(rows), order_by, schema)
+    return list(islice(rows, limit) if limit else rows)
+
+
+def _map(scan, partitions: List[Partition], workers: int) -> Iterator[Any]:
+    if workers <= 1 or len(partitions) <= 1:
+        yield from map(scan, partitions)
+        return
+
+    executor = ProcessPoolExecutor(max_workers=workers)
+    try:
+        yield from executor.map(scan, partitions)
+    finally:
+        # При раннем выходе (--limit) ещё не начатые файлы не читаются
+        executor.shutdown(cancel_futures=True)
+
+
+def merge_sorted(results: List[List[Dict[str, Any]]], order_by: str,
+                 schema: Optional[Schema] = None) -> Iterator[Dict[str, Any]]:
+    # Каждый файл уже отсортирован у себя: k-way слияние вместо сортировки всего результата
+    col, reverse = parse_sort(order_by)
+    if schema is not None and schema.sorts_typed(col):
+        key = schema.sort_key(col, reverse)
+    else:
+        key = lambda row: sort_key(row[col])
+    merged = heapq.merge(*results, key=key, reverse=reverse)
+    try:
+        yield from merged
+    except TypeError as e:
+        raise SortError(f"Sorting error: {e}")
+
+
+def run_partitioned(files: List[str], workers: Optional[int] = None, where: Optional[str] = None,
+                    order_by: Optional[str] = None, aggregate: Union[str, List[str], None] = None,
+                    limit: Optional[int] = None, group_by: Optional[str] = None,
+                    compression: int = DEFAULT_COMPRESSION, pattern: Optional[str] = None,
+                    schema: Optional[Schema] = None) -> Union[Iterator[Dict[str, Any]], float]:
+    aggregate = aggregate_specs(aggregate)
+    try:
+        partitions = [(path, partition_values(path, pattern)) for path in files]
+    except re.error as e:
+        raise ArgumentError(f"Invalid --partition-pattern: {e}")
+    if schema is not None:
+        # Одна схема на все файлы, сведённая из их типов: файлы сравнивают и сортируют ячейки одинаково
+        schema.infer()
+    partitions = prune_partitions(partitions, where, schema)
+
+    workers = min(workers or os.cpu_count() or 1, len(partitions))
+    grouped = bool(group_by) or len(aggregate) > 1
+    scan = partial(_scan_partition, where, None if grouped else order_by, aggregate, group_by, limit, compression,
+                   schema)
+    results = _map(scan, partitions, workers)
+
+    if aggregate:
+        return merge_groupings([result for result in results if result is not None], aggregate, group_by,
+                               order_by, limit)
+    if order_by:
+        rows = merge_sorted([result for result in results if result], order_by, schema)
+    else:
+        # Без сортировки файлы идут по порядку, и при --limit чтение останавливается на первых N строках
+        rows = chain.from_iterable(result for result in results if result)
+    return islice(rows, limit) if limit else rows
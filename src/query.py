@@ -0,0 +1,447 @@
+import csv
+import os
+from functools import partial
+from typing import List, Dict, Any, Callable, Iterator, Optional, Tuple, Union
+
+from src.aggregates import DEFAULT_COMPRESSION
+from src.compression import is_compressed, open_text
+from src.csv_processor import (
+    SCALAR_TYPES, aggregate_data, aggregate_many, aggregate_specs, apply_filter, apply_limit, apply_sort,
+    group_aggregate, iter_filter, load_data, referenced_columns
+)
+from src.exceptions import ArgumentError, CSVProcessingError
+from src.operations import OPERATIONS_REGISTRY, DEFAULT_BATCH_SIZE, as_batch_operation, run_batches
+from src.scanner import worth_projecting
+from src.schema import DEFAULT_SCHEMA_SAMPLE, Schema, load_schema
+
+
+BUILTIN_STEPS = ('where', 'order_by', 'aggregate', 'limit')
+
+
+class Step:
+    # Узел логического плана: что сделать с данными, без выбора способа
+    __slots__ = ('op', 'arg', 'group_by')
+
+    def __init__(self, op: str, arg: Any, group_by: Optional[str] = None):
+        self.op = op
+        self.arg = arg
+        self.group_by = group_by
+
+    @property
+    def scalar(self) -> bool:
+        # Агрегат без группировки даёт одну строку (или одно число), порядок и лимит к ней неприменимы
+        return self.op == 'aggregate' and not self.group_by
+
+    def __repr__(self) -> str:
+        if self.op == 'aggregate':
+            text = f"aggregate {', '.join(self.arg)}"
+            return f"{text} by {self.group_by}" if self.group_by else text
+        return f"{self.op} {self.arg}"
+
+
+class PhysicalStep:
+    # Стадия исполнения: имя для --stats, описание для explain() и функция над результатом предыдущей стадии
+    __slots__ = ('name', 'detail', 'run', 'bytes_read')
+
+    def __init__(self, name: str, detail: str, run: Callable[[Any], Any], bytes_read: Optional[int] = None):
+        self.name = name
+        self.detail = detail
+        self.run = run
+        self.bytes_read = bytes_read
+
+
+def optimize(steps: List[Step]) -> Tuple[List[Step], List[str]]:
+    # Правила применяются, пока план меняется; каждое сохраняет результат запроса
+    steps = list(steps)
+    notes = []
+    changed = True
+    while changed:
+        changed = False
+        for i in range(len(steps) - 1):
+            current, following = steps[i], steps[i + 1]
+            if current.op == 'where' and following.op == 'where':
+                steps[i:i + 2] = [Step('where', f"({current.arg}) AND ({following.arg})")]
+                notes.append(f"merged filters into one predicate: {steps[i].arg}")
+            elif current.op == 'order_by' and following.op == 'where':
+                # Фильтр сохраняет порядок строк: сортировать стоит уже отфильтрованное
+                steps[i:i + 2] = [following, current]
+                notes.append(f"pushed {following!r} below {current!r}")
+            elif current.op == 'order_by' and following.scalar:
+                # Агрегаты без группировки не зависят от порядка строк (скетч перцентилей — в пределах своей
+                # погрешности); группы же выводятся в порядке первого появления, и сортировка задаёт этот порядок
+                del steps[i]
+                notes.append(f"removed {current!r}: {following!r} does not depend on row order")
+            elif current.scalar and following.op in ('order_by', 'limit'):
+                del steps[i + 1]
+                notes.append(f"removed {following!r}: {current!r} returns a single row")
+            else:
+                continue
+            changed = True
+            break
+    return steps, notes
+
+
+def _clauses(steps: List[Step]) -> Optional[Dict[str, Any]]:
+    # Параллельное чтение и партиции исполняют запрос целиком, если он имеет обычную форму:
+    # where, order_by или агрегат, order_by по группам, limit
+    clauses = {'where': None, 'order_by': None, 'aggregate': [], 'group_by': None, 'limit': None}
+    rank = -1
+    for step in steps:
+        if step.op == 'where':
+            position = 0
+        elif step.op == 'order_by':
+            position = 3 if clauses['aggregate'] else 1
+        elif step.op == 'aggregate':
+            position = 2
+        elif step.op == 'limit':
+            position = 4
+        else:
+            return None
+        if position <= rank or (step.group_by and clauses['order_by']):
+            # Сортировка строк перед группировкой задаёт порядок групп; в этой форме order_by сортирует сами группы
+            return None
+        rank = position
+        if step.op == 'aggregate':
+            clauses['aggregate'] = list(step.arg)
+            clauses['group_by'] = step.group_by
+        else:
+            clauses[step.op] = step.arg
+    return clauses
+
+
+def _apply_operation(op_name: str, operation, data: Any, arg_value: str, engine: str, limit: Optional[int],
+                     sort_memory: Optional[int], compression: int, schema: Optional[Schema] = None) -> Any:
+    if op_name == 'order_by' and limit and engine == 'python':
+        from src.sorting import top_k
+        return top_k(data, arg_value, limit, schema)
+    elif op_name == 'order_by' and sort_memory and engine == 'python':
+        from src.sorting import external_sort
+        return external_sort(data, arg_value, sort_memory, schema)
+    elif op_name == 'aggregate' and (engine == 'python' or schema is not None):
+        return aggregate_data(data, arg_value, compression, schema)
+    elif op_name == 'where' and schema is not None:
+        if engine == 'python':
+            return iter_filter(data, arg_value, schema)
+        return apply_filter(data, arg_value, schema)
+    elif op_name == 'order_by' and schema is not None:
+        return apply_sort(list(data) if engine == 'python' else data, arg_value, schema)
+    elif engine == 'python':
+        return operation.stream(data, arg_value)
+    return operation.execute(data, arg_value)
+
+
+def _registered(op_name: str):
+    operation = OPERATIONS_REGISTRY.get(op_name)
+    if not operation:
+        raise CSVProcessingError(f"Unsupported operation: {op_name}")
+    return operation
+
+
+class Query:
+    # Ленивый запрос: методы только дописывают шаги плана, чтение начинается в execute()
+    def __init__(self, source: Union[str, List[str]], engine: str = 'python', workers: Optional[int] = None,
+                 schema: Optional[str] = None, schema_sample: Optional[int] = None, use_cache: bool = True,
+                 rebuild_cache: bool = False, sort_memory: Optional[int] = None,
+                 compression: int = DEFAULT_COMPRESSION, partition_pattern: Optional[str] = None,
+                 data: Any = None):
+        self.source = source
+        self.engine = engine
+        self.workers = workers
+        self.schema = schema
+        self.schema_sample = schema_sample
+        self.use_cache = use_cache
+        self.rebuild_cache = rebuild_cache
+        self.sort_memory = sort_memory
+        self.compression = compression
+        self.partition_pattern = partition_pattern
+        self.data = data
+        self.steps: List[Step] = []
+
+    @classmethod
+    def from_args(cls, args, data: Any = None) -> 'Query':
+        query = cls(args.file, engine=getattr(args, 'engine', None) or 'python',
+                    workers=getattr(args, 'workers', None), schema=getattr(args, 'schema', None),
+                    schema_sample=getattr(args, 'schema_sample', None),
+                    use_cache=not getattr(args, 'no_cache', False),
+                    rebuild_cache=getattr(args, 'rebuild_cache', False),
+                    sort_memory=getattr(args, 'sort_memory', None),
+                    compression=getattr(args, 'quantile_compression', None) or DEFAULT_COMPRESSION,
+                    partition_pattern=getattr(args, 'partition_pattern', None), data=data)
+        aggregates = aggregate_specs(args.aggregate)
+        group_by = getattr(args, 'group_by', None)
+        limit = getattr(args, 'limit', None)
+
+        # Логический план повторяет порядок аргументов CLI; лишнее уберёт оптимизатор
+        if args.where:
+            query = query.where(args.where)
+        if group_by:
+            # С группировкой сортируется уже сгруппированный результат
+            query = query.aggregate(*aggregates, group_by=group_by)
+            if args.order_by:
+                query = query.order_by(args.order_by)
+        else:
+            if args.order_by:
+                query = query.order_by(args.order_by)
+            if aggregates:
+                query = query.aggregate(*aggregates)
+        if limit:
+            query = query.limit(limit)
+        return query
+
+    def _then(self, step: Step) -> 'Query':
+        query = Query.__new__(Query)
+        query.__dict__.update(self.__dict__)
+        query.steps = self.steps + [step]
+        return query
+
+    def where(self, condition: str) -> 'Query':
+        if any(step.scalar for step in self.steps):
+            raise ArgumentError("Cannot filter the result of an aggregate without group_by")
+        return self._then(Step('where', condition))
+
+    def order_by(self, condition: str) -> 'Query':
+        return self._then(Step('order_by', condition))
+
+    def aggregate(self, *operations: str, group_by: Optional[str] = None) -> 'Query':
+        if not operations:
+            raise ArgumentError("aggregate() needs at least one operation such as 'price=avg'")
+        if any(step.op == 'aggregate' for step in self.steps):
+            raise ArgumentError("A query can aggregate only once")
+        return self._then(Step('aggregate', list(operations), group_by))
+
+    def group_by(self, col: str, *operations: str) -> 'Query':
+        return self.aggregate(*operations, group_by=col)
+
+    def limit(self, count: int) -> 'Query':
+        return self._then(Step('limit', count))
+
+    def apply(self, name: str, arg: str = '') -> 'Query':
+        # Операция из OPERATIONS_REGISTRY (register_operation); встроенные имена ведут к обычным шагам
+        if name in ('where', 'order_by'):
+            return getattr(self, name)(arg)
+        if name == 'aggregate':
+            return self.aggregate(arg)
+        _registered(name)
+        return self._then(Step(name, arg))
+
+    def optimized(self) -> Tuple[List[Step], List[str]]:
+        return optimize(self.steps)
+
+    def plan(self) -> List[PhysicalStep]:
+        steps, _ = self.optimized()
+        engine = self.engine
+        data = self.data
+        if data is not None and engine == 'python':
+            # Уже загруженная таблица (режим serve) обрабатывается колоночным движком
+            engine = 'columnar'
+        clauses = _clauses(steps)
+        limit = next((step.arg for step in steps if step.op == 'limit'), None)
+
+        # Типы колонок выводятся один раз на запрос, и все способы исполнения (один процесс, --workers,
+        # несколько файлов, колоночные движки, serve) переводят ячейки одними и теми же конвертерами
+        schema = self._schema()
+
+        if data is None and not isinstance(self.source, str):
+            return [self._partitions_scan(engine, clauses, schema)]
+        if data is None and not os.path.exists(self.source):
+            raise FileNotFoundError(f"File not found: {self.source}")
+
+        # Сжатый файл читается одним потоком, а --workers распаковывают его блоки параллельно
+        compressed = data is None and is_compressed(self.source)
+        workers = self.workers or 1
+
+        # Фильтр проталкивается в чтение: свежий индекс по колонке из --where заменяет полный просмотр файла
+        indexed = None
+        if steps and steps[0].op == 'where' and engine == 'python' and not compressed and data is None:
+            from src.index import indexed_rows
+            indexed = indexed_rows(self.source, steps[0].arg)
+
+        if indexed is None and workers > 1 and engine == 'python' and not compressed and clauses is not None:
+            return [self._parallel_scan(workers, clauses, schema)]
+
+        physical = []
+        if data is not None:
+            pass
+        elif indexed is not None:
+            physical.append(PhysicalStep('index', f"index lookup in {self.source} for {steps[0].arg}",
+                                         lambda _: indexed))
+        else:
+            columns = self._projection(steps)
+            detail = f"scan {self.source} ({engine} engine"
+            detail += f", columns: {', '.join(columns)})" if columns else ")"
+            physical.append(PhysicalStep('read', detail, lambda _: load_data(
+                self.source, engine, columns, use_cache=self.use_cache, rebuild_cache=self.rebuild_cache,
+                workers=workers if compressed else 1), bytes_read=os.path.getsize(self.source)))
+
+        aggregated = False
+        plugins: List[Step] = []
+        for i, step in enumerate(steps):
+            following = steps[i + 1] if i + 1 < len(steps) else None
+            if step.op not in BUILTIN_STEPS:
+                # Подряд идущие операции из реестра сцепляются в одну стадию через пакеты строк
+                plugins.append(step)
+                if following is None or following.op in BUILTIN_STEPS:
+                    physical.append(self._plugins(plugins, engine))
+                    plugins = []
+                # Операция может добавить колонки и значения не из файла: дальше типы не выводятся из CSV
+                schema = None
+            elif step.op == 'where':
+                physical.append(PhysicalStep('where', f"filter {step.arg}", partial(
+                    _apply_operation, 'where', _registered('where'), arg_value=step.arg, engine=engine, limit=None,
+                    sort_memory=None, compression=self.compression, schema=schema)))
+            elif step.op == 'order_by' and aggregated:
+                physical.append(PhysicalStep('order_by', f"sort groups by {step.arg}",
+                                             partial(apply_sort, condition=step.arg)))
+            elif step.op == 'order_by':
+                fused = limit if following is not None and following.op == 'limit' else None
+                if fused and engine == 'python':
+                    detail = f"top-{fused} by {step.arg} (sort fused with limit)"
+                elif self.sort_memory and engine == 'python':
+                    detail = f"external sort by {step.arg} within {self.sort_memory} bytes"
+                else:
+                    detail = f"sort by {step.arg}"
+                physical.append(PhysicalStep('order_by', detail, partial(
+                    _apply_operation, 'order_by', _registered('order_by'), arg_value=step.arg, engine=engine,
+                    limit=fused, sort_memory=self.sort_memory, compression=self.compression, schema=schema)))
+            elif step.op == 'aggregate':
+                physical.append(self._aggregate(step, engine, schema))
+                aggregated = True
+            elif step.op == 'limit':
+                physical.append(PhysicalStep('limit', f"first {step.arg} rows", partial(apply_limit, limit=step.arg)))
+        return physical
+
+    def _schema(self) -> Schema:
+        # --schema задаёт типы явно, остальные колонки выводятся по первым --schema-sample строкам (0 — весь файл)
+        sample = DEFAULT_SCHEMA_SAMPLE if self.schema_sample is None else self.schema_sample
+        return load_schema(self.source, self.schema, sample, use_cache=self.use_cache, rebuild=self.rebuild_cache)
+
+    def _projection(self, steps: List[Step]) -> Optional[List[str]]:
+        # Для агрегации строки целиком не нужны: читаем только колонки фильтров, операций и агрегатов
+        aggregate = next((step for step in steps if step.op == 'aggregate'), None)
+        if aggregate is None:
+            return None
+        before = steps[:steps.index(aggregate)]
+        if any(step.op == 'order_by' for step in before):
+            return None
+        filters = [step.arg for step in before if step.op == 'where']
+        where = ' AND '.join(f"({condition})" for condition in filters) if len(filters) > 1 else \
+            (filters[0] if filters else None)
+        columns = referenced_columns(where, None, aggregate.arg, aggregate.group_by)
+        if columns is None:
+            return None
+        plugins = [step for step in before if step.op != 'where']
+        for step in plugins:
+            declared = as_batch_operation(_registered(step.op)).columns(step.arg)
+            if declared is None:
+                return None
+            columns.extend(declared)
+        if not isinstance(self.source, str):
+            return list(dict.fromkeys(columns)) or None
+        header = _header(self.source)
+        if plugins:
+            # Колонки, которые добавляют сами операции, из файла не читаются
+            columns = [col for col in columns if col in header]
+        columns = list(dict.fromkeys(columns))
+        # На узком файле чтение только нужных колонок медленнее обычного csv.reader
+        if not columns or not worth_projecting(len(header), len(columns)):
+            return None
+        return columns
+
+    def _plugins(self, steps: List[Step], engine: str) -> PhysicalStep:
+        operations = [(as_batch_operation(_registered(step.op)), step.arg) for step in steps]
+        detail = ' -> '.join(f"{step!r} ({'streaming' if operation.streaming else 'blocking'})"
+                             for step, (operation, _) in zip(steps, operations))
+        return PhysicalStep('apply', f"batches of {DEFAULT_BATCH_SIZE} rows through {detail}",
+                            partial(_run_plugins, operations=operations, materialize=engine != 'python'))
+
+    def _aggregate(self, step: Step, engine: str, schema: Optional[Schema]) -> PhysicalStep:
+        aggregates = step.arg
+        if step.group_by:
+            return PhysicalStep('group_by', f"hash aggregate {', '.join(aggregates)} by {step.group_by}", partial(
+                group_aggregate, group_col=step.group_by, operations=aggregates, compression=self.compression,
+                schema=schema))
+        if len(aggregates) > 1:
+            return PhysicalStep('aggregate', f"aggregate {', '.join(aggregates)} in one pass", partial(
+                _aggregate_many, aggregates=aggregates, compression=self.compression, schema=schema))
+        return PhysicalStep('aggregate', f"aggregate {aggregates[0]}", partial(
+            _apply_operation, 'aggregate', _registered('aggregate'), arg_value=aggregates[0], engine=engine,
+            limit=None, sort_memory=None, compression=self.compression, schema=schema))
+
+    def _parallel_scan(self, workers: int, clauses: Dict[str, Any], schema: Schema) -> PhysicalStep:
+        from src.parallel import run_parallel
+        return PhysicalStep(
+            'parallel', f"parallel scan of {self.source} in {workers} processes ({_describe(clauses)})",
+            lambda _: run_parallel(self.source, workers, where=clauses['where'], order_by=clauses['order_by'],
+                                   aggregate=clauses['aggregate'], limit=clauses['limit'],
+                                   group_by=clauses['group_by'], compression=self.compression, schema=schema),
+            bytes_read=os.path.getsize(self.source))
+
+    def _partitions_scan(self, engine: str, clauses: Optional[Dict[str, Any]], schema: Schema) -> PhysicalStep:
+        # Несколько файлов (--file a.csv b.csv или маска) читаются параллельно, каждый своим процессом
+        from src.partitions import run_partitioned
+        if engine != 'python':
+            raise ArgumentError("Several input files are processed by the streaming engine; use --engine python")
+        if clauses is None:
+            raise ArgumentError("Several input files support where, order_by, aggregate and limit in that order")
+        for path in self.source:
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"File not found: {path}")
+
+        return PhysicalStep(
+            'partitions', f"parallel scan of {len(self.source)} files, merged ({_describe(clauses)})",
+            lambda _: run_partitioned(self.source, self.workers, where=clauses['where'], order_by=clauses['order_by'],
+                                      aggregate=clauses['aggregate'], limit=clauses['limit'],
+                                      group_by=clauses['group_by'], compression=self.compression,
+                                      pattern=self.partition_pattern, schema=schema),
+            bytes_read=sum(map(os.path.getsize, self.source)))
+
+    def explain(self) -> str:
+        steps, notes = self.optimized()
+        source = self.source if isinstance(self.source, str) else f"{len(self.source)} files"
+        lines = ["Logical plan:", f"  scan {'loaded table' if self.data is not None else source}"]
+        lines.extend(f"  {step!r}" for step in self.steps)
+        if notes:
+            lines.append("Optimizations:")
+            lines.extend(f"  {note}" for note in notes)
+        lines.append("Physical plan:")
+        lines.extend(f"  {step.name:<11}{step.detail}" for step in self.plan())
+        return '\n'.join(lines)
+
+    def execute(self, recorder=None) -> Union[Iterator[Dict[str, Any]], Any]:
+        # Без --stats стадии вызываются напрямую, без обёрток вокруг каждой строки
+        from src.stats import untracked
+        stage = recorder.track if recorder is not None else untracked
+        result = self.data
+        for step in self.plan():
+            result = stage(step.name, partial(step.run, result), bytes_read=step.bytes_read)
+        return result
+
+    def collect(self, recorder=None) -> Union[List[Dict[str, Any]], Any]:
+        result = self.execute(recorder)
+        if isinstance(result, SCALAR_TYPES):
+            return result
+        return list(result)
+
+
+def _describe(clauses: Dict[str, Any]) -> str:
+    parts = [f"{name} {value}" for name, value in clauses.items() if value and name != 'aggregate']
+    if clauses['aggregate']:
+        parts.append(f"aggregate {', '.join(clauses['aggregate'])}")
+    return '; '.join(parts) or 'all rows'
+
+
+def _header(file_path: str) -> List[str]:
+    with open_text(file_path, newline='') as file:
+        return next(csv.reader(file), [])
+
+
+def _aggregate_many(data: Any, aggregates: List[str], compression: int, schema: Optional[Schema]) -> Any:
+    return [aggregate_many(data, aggregates, compression, schema)]
+
+
+def _run_plugins(data: Any, operations: List[Tuple[Any, str]], materialize: bool) -> Any:
+    result = run_batches(data, operations)
+    # Колоночные движки дальше работают со списком строк, а не с итератором
+    if materialize and not isinstance(result, SCALAR_TYPES):
+        return list(result)
+    return result
@@ -0,0 +1,226 @@
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Dict, Any, Callable, Optional, Tuple
+
+from src.csv_processor import SCALAR_TYPES, aggregate_specs, parse_aggregation, process_csv
+from src.exceptions import CSVProcessingError
+from src.fingerprint import default_cache_dir
+from src.partitions import input_paths
+
+DEFAULT_MEMORY_BYTES = 256 << 20
+DEFAULT_DISK_BYTES = 1 << 30
+
+
+def file_key(file_path: str) -> Tuple[int, int, int]:
+    stat = os.stat(file_path)
+    return stat.st_size, stat.st_mtime_ns, stat.st_ino
+
+
+def query_key(args) -> str:
+    # Форматирование вывода и способ выполнения (--workers, --sort-memory) на результат не влияют
+    try:
+        aggregates = ["=".join(parse_aggregation(operation)) for operation in aggregate_specs(args.aggregate)]
+    except CSVProcessingError:
+        aggregates = aggregate_specs(args.aggregate)
+    order_by = args.order_by
+    if order_by and '=' in order_by:
+        col, direction = order_by.split('=', 1)
+        order_by = f"{col.strip()}={direction.strip().lower()}"
+    schema = getattr(args, 'schema', None)
+
+    return json.dumps({
+        'where': args.where.strip() if args.where else None,
+        'order_by': order_by,
+        'aggregate': aggregates,
+        'group_by': (getattr(args, 'group_by', None) or '').strip() or None,
+        'limit': getattr(args, 'limit', None),
+        'engine': getattr(args, 'engine', None) or 'python',
+        'compression': getattr(args, 'quantile_compression', None),
+        'schema': os.path.abspath(schema) if schema else None,
+        'schema_sample': getattr(args, 'schema_sample', None),
+        'partition_pattern': getattr(args, 'partition_pattern', None),
+    }, sort_keys=True)
+
+
+def source_state(args) -> List[Any]:
+    # Запись действительна, пока не изменились ни CSV, ни файл схемы
+    schema = getattr(args, 'schema', None)
+    return [[file_key(path) for path in input_paths(args.file)], file_key(schema) if schema else None]
+
+
+class ResultCache:
+    def __init__(self, max_bytes: int = DEFAULT_MEMORY_BYTES, ttl: Optional[float] = None):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.entries: 'OrderedDict[Tuple[str, str], Tuple[List[Any], float, Any, int]]' = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else None,
+                'evictions': self.evictions,
+                'entries': len(self.entries),
+                'bytes': self.size,
+            }
+
+    def get_or_compute(self, args, compute: Callable[[], Any]) -> Any:
+        key = ('\n'.join(map(os.path.abspath, input_paths(args.file))), query_key(args))
+        state = source_state(args)
+        found, result = self.lookup(key, state)
+        # Сервер вызывает кэш из пула потоков: счётчики меняются под тем же замком, что и LRU
+        with self.lock:
+            if found:
+                self.hits += 1
+            else:
+                self.misses += 1
+        if found:
+            return result
+
+        result = compute()
+        if not isinstance(result, SCALAR_TYPES + (list,)):
+            result = list(result)
+        self.store(key, state, result)
+        return result
+
+    def process(self, args, recorder=None) -> Any:
+        return self.get_or_compute(args, lambda: process_csv(args, recorder))
+
+    def _fresh(self, created: float) -> bool:
+        return self.ttl is None or time.time() - created < self.ttl
+
+    def lookup(self, key: Tuple[str, str], state: List[Any]) -> Tuple[bool, Any]:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return False, None
+            entry_state, created, result, size = entry
+            if entry_state != state or not self._fresh(created):
+                # Файл изменился или запись устарела: результат больше не отдаётся
+                del self.entries[key]
+                self.size -= size
+                return False, None
+            self.entries.move_to_end(key)
+            return True, result
+
+    def store(self, key: Tuple[str, str], state: List[Any], result: Any):
+        size = len(pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL))
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self.size -= previous[3]
+            self.entries[key] = (state, time.time(), result, size)
+            self.size += size
+            while self.size > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= evicted[3]
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+
+class DiskResultCache(ResultCache):
+    def __init__(self, directory: Optional[str] = None, max_bytes: int = DEFAULT_DISK_BYTES,
+                 ttl: Optional[float] = None):
+        super().__init__(max_bytes, ttl)
+        self.directory = directory or os.path.join(default_cache_dir(), 'results')
+
+    def entry_path(self, key: Tuple[str, str]) -> str:
+        # Имя зависит только от файла и запроса: после изменения CSV запись перезаписывается, а не копится
+        name = hashlib.blake2b('\0'.join(key).encode('utf-8'), digest_size=16).hexdigest()
+        return os.path.join(self.directory, f"{name}.result")
+
+    def stats(self) -> Dict[str, Any]:
+        stats = super().stats()
+        entries = self._entries()
+        stats['entries'] = len(entries)
+        stats['bytes'] = sum(size for _, size, _ in entries)
+        return stats
+
+    def lookup(self, key: Tuple[str, str], state: List[Any]) -> Tuple[bool, Any]:
+        path = self.entry_path(key)
+        try:
+            with open(path, 'rb') as file:
+                entry_key, entry_state, created, result = pickle.load(file)
+        except (OSError, EOFError, ValueError, TypeError, pickle.UnpicklingError):
+            return False, None
+
+        if entry_key != list(key) or entry_state != state or not self._fresh(created):
+            self._remove(path)
+            return False, None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return True, result
+
+    def store(self, key: Tuple[str, str], state: List[Any], result: Any):
+        payload = pickle.dumps([list(key), state, time.time(), result], protocol=pickle.HIGHEST_PROTOCOL)
+        if len(payload) > self.max_bytes:
+            return
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as file:
+                file.write(payload)
+            path = self.entry_path(key)
+            os.replace(temp_path, path)
+            self.evict(keep=path)
+        except OSError:
+            pass
+
+    def _entries(self) -> List[Tuple[float, int, str]]:
+        try:
+            scanned = list(os.scandir(self.directory))
+        except OSError:
+            return []
+        entries = []
+        for entry in scanned:
+            if entry.name.endswith('.result'):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def evict(self, keep: Optional[str] = None):
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            self._remove(path)
+            total -= size
+            self.evictions += 1
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+    def clear(self):
+        for _, _, path in self._entries():
+            self._remove(path)
@@ -0,0 +1,71 @@
+import sys
+from collections.abc import Mapping
+from operator import itemgetter
+from typing import List, Dict, Any, Callable, Iterable, Iterator, Optional, Sequence
+
+
+class Row(Mapping):
+    # Строка без своего словаря: поля списком и общая для всего файла карта колонка -> позиция.
+    # Снаружи ведёт себя как словарь (row[col], keys(), сравнение с dict), но весит в разы меньше
+    __slots__ = ('index', 'fields')
+
+    def __init__(self, index: Dict[str, int], fields: Sequence[Any]):
+        self.index = index
+        self.fields = fields
+
+    def __getitem__(self, col: str) -> Any:
+        return self.fields[self.index[col]]
+
+    def __setitem__(self, col: str, value: Any):
+        # Менять можно только существующие колонки: карта позиций общая для всех строк файла
+        self.fields[self.index[col]] = value
+
+    def __contains__(self, col: object) -> bool:
+        return col in self.index
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.index)
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __sizeof__(self) -> int:
+        return object.__sizeof__(self) + sys.getsizeof(self.fields)
+
+    def __repr__(self) -> str:
+        return repr(self.to_dict())
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(zip(self.index, self.fields))
+
+
+def header_index(header: Iterable[str]) -> Dict[str, int]:
+    return {name: i for i, name in enumerate(header)}
+
+
+def to_rows(header: List[str], records: Iterable[List[Any]]) -> Iterator[Row]:
+    # Как у csv.DictReader: пустые записи пропускаются, недостающие поля — None; лишние поля отбрасываются
+    index = header_index(header)
+    width = len(header)
+    for fields in records:
+        if len(fields) == width:
+            yield Row(index, fields)
+        elif fields:
+            yield Row(index, fields[:width] if len(fields) > width else fields + [None] * (width - len(fields)))
+
+
+def positions(first: Any) -> Optional[Dict[str, int]]:
+    # Карта позиций, если строки потока компактные; по ней горячие циклы читают row.fields[i] без поиска ключа
+    return first.index if isinstance(first, Row) else None
+
+
+def column_getter(first: Any, col: str) -> Callable[[Any], Any]:
+    index = positions(first)
+    if index is None:
+        return itemgetter(col)
+    i = index[col]
+    return lambda row: row.fields[i]
+
+
+def as_dict(row: Any) -> Any:
+    return row.to_dict() if isinstance(row, Row) else row
@@ -0,0 +1,311 @@
+import csv
+import hashlib
+import json
+import os
+import re
+import tempfile
+from datetime import date
+from decimal import Decimal
+from itertools import islice
+from operator import itemgetter
+from typing import List, Dict, Any, Callable, Iterable, Optional, Union
+
+from src.compression import open_text
+from src.exceptions import ArgumentError, TypeConversionError
+
+COLUMN_TYPES = ('int', 'float', 'decimal', 'date', 'bool', 'str')
+# Без --schema-sample типы выводятся по первым строкам: полный проход по файлу — только по запросу (--schema-sample 0)
+DEFAULT_SCHEMA_SAMPLE = 10000
+NUMERIC_TYPES = ('int', 'float', 'decimal')
+# Эти функции считаются на Decimal без потери точности, остальным нужен float
+EXACT_FUNCTIONS = frozenset(('sum', 'min', 'max', 'avg', 'count'))
+BOOLEANS = {'true': True, 'false': False}
+# Исключения, которыми конвертеры сообщают о неподходящем значении
+CONVERSION_ERRORS = (ValueError, TypeError, ArithmeticError, KeyError)
+
+# Порядок важен: int — частный случай float, остальные типы не пересекаются
+PATTERNS = {
+    'int': re.compile(r'\s*[+-]?\d+\s*'),
+    'float': re.compile(r'\s*[+-]?(?:\d+\.?\d*(?:e[+-]?\d+)?|\.\d+(?:e[+-]?\d+)?|inf(?:inity)?|nan)\s*',
+                        re.IGNORECASE),
+    'bool': re.compile(r'\s*(?:true|false)\s*', re.IGNORECASE),
+    'date': re.compile(r'\s*\d{4}-\d{2}-\d{2}\s*'),
+}
+
+
+def _parse_date(cell: str) -> date:
+    return date.fromisoformat(cell.strip())
+
+
+def _parse_bool(cell: str) -> bool:
+    return BOOLEANS[cell.strip().lower()]
+
+
+CONVERTERS: Dict[str, Callable[[str], Any]] = {
+    'int': int,
+    'float': float,
+    'decimal': lambda cell: Decimal(cell.strip()),
+    'date': _parse_date,
+    'bool': _parse_bool,
+    'str': str.strip,
+}
+
+
+def make_converter(kind: str, nullable: bool) -> Callable[[Optional[str]], Any]:
+    convert = CONVERTERS[kind]
+    if not nullable:
+        return convert
+    # Пустая ячейка в nullable-колонке — None; сравнения её не пропускают, агрегаты пропускают
+    return lambda cell: None if not cell or cell.isspace() else convert(cell)
+
+
+class ColumnType:
+    __slots__ = ('kind', 'nullable')
+
+    def __init__(self, kind: str, nullable: bool = False):
+        self.kind = kind
+        self.nullable = nullable
+
+    @property
+    def numeric(self) -> bool:
+        return self.kind in NUMERIC_TYPES
+
+    def __eq__(self, other: Any) -> bool:
+        return isinstance(other, ColumnType) and (self.kind, self.nullable) == (other.kind, other.nullable)
+
+    def __repr__(self) -> str:
+        return f"{self.kind}?" if self.nullable else self.kind
+
+    @classmethod
+    def parse(cls, text: str) -> 'ColumnType':
+        text = text.strip().lower()
+        nullable = text.endswith('?')
+        kind = text.rstrip('?')
+        if kind not in COLUMN_TYPES:
+            raise ValueError(f"Unknown column type '{text}'. Use: {', '.join(COLUMN_TYPES)} (append ? for nullable)")
+        return cls(kind, nullable)
+
+
+def _narrow(candidates: List[str], cell: str) -> List[str]:
+    matching = [kind for kind in candidates if PATTERNS[kind].fullmatch(cell)]
+    if matching == ['date']:
+        try:
+            _parse_date(cell)
+        except ValueError:
+            return []
+    return matching
+
+
+def infer_types(rows: Iterable[List[str]], header: List[str]) -> Dict[str, ColumnType]:
+    # Для каждой колонки остаётся список ещё возможных типов; проверяется только первый из них
+    candidates: List[Optional[List[str]]] = [None] * len(header)
+    nullable = [False] * len(header)
+    open_columns = list(range(len(header)))
+    for fields in rows:
+        settled = False
+        for i in open_columns:
+            cell = fields[i] if i < len(fields) else None
+            if not cell or cell.isspace():
+                nullable[i] = True
+                settled = settled or candidates[i] == []
+                continue
+            kinds = candidates[i]
+            if kinds is None:
+                kinds = candidates[i] = _narrow(list(PATTERNS), cell)
+            elif kinds and not PATTERNS[kinds[0]].fullmatch(cell):
+                kinds = candidates[i] = _narrow(kinds[1:], cell)
+            settled = settled or (kinds == [] and nullable[i])
+        if settled:
+            # Строковая nullable-колонка уже ничем не изменится — дальше её не проверяем
+            open_columns = [i for i in open_columns if candidates[i] != [] or not nullable[i]]
+
+    return {
+        name: ColumnType(kinds[0] if kinds else 'str', nullable[i])
+        for i, (name, kinds) in enumerate(zip(header, candidates))
+    }
+
+
+def merge_types(columns: Dict[str, ColumnType], other: Dict[str, ColumnType]) -> Dict[str, ColumnType]:
+    # Типы одной колонки в разных файлах: int и float дают float, прочие расхождения — str
+    merged = dict(columns)
+    for col, column in other.items():
+        known = merged.get(col)
+        if known is None:
+            merged[col] = column
+            continue
+        kinds = {known.kind, column.kind}
+        kind = known.kind if len(kinds) == 1 else ('float' if kinds == {'int', 'float'} else 'str')
+        merged[col] = ColumnType(kind, known.nullable or column.nullable)
+    return merged
+
+
+def convert_all(convert: Callable[[Optional[str]], Any], cells: Iterable[Optional[str]], col: str,
+                kind: str) -> List[Any]:
+    # Колонка целиком переводится одним циклом; виновник ошибки ищется повторным проходом только после неё
+    cells = cells if isinstance(cells, list) else list(cells)
+    try:
+        return [convert(cell) for cell in cells]
+    except CONVERSION_ERRORS:
+        for cell in cells:
+            try:
+                convert(cell)
+            except CONVERSION_ERRORS:
+                raise TypeConversionError(cell, col, kind)
+        raise
+
+
+def infer_schema(file_path: str, sample: Optional[int] = None) -> Dict[str, ColumnType]:
+    with open_text(file_path, newline='') as file:
+        reader = csv.reader(file)
+        header = next(reader, None)
+        if header is None:
+            return {}
+        rows = islice(reader, sample) if sample else reader
+        return infer_types(rows, header)
+
+
+def load_schema_file(path: str) -> Dict[str, ColumnType]:
+    try:
+        with open(path, encoding='utf-8') as file:
+            raw = json.load(file)
+        if not isinstance(raw, dict):
+            raise ValueError("expected a JSON object mapping column names to types")
+        return {col: ColumnType.parse(str(kind)) for col, kind in raw.items()}
+    except (OSError, ValueError) as e:
+        raise ArgumentError(f"Invalid schema file '{path}': {e}")
+
+
+def _cache_path(file_path: str) -> str:
+    from src.fingerprint import default_cache_dir
+    name = hashlib.blake2b(os.path.abspath(file_path).encode('utf-8'), digest_size=16).hexdigest()
+    return os.path.join(default_cache_dir(), f"{name}.schema.json")
+
+
+def cached_schema(file_path: str, sample: Optional[int] = None, use_cache: bool = True,
+                  rebuild: bool = False) -> Dict[str, ColumnType]:
+    if not use_cache:
+        return infer_schema(file_path, sample)
+
+    from src.fingerprint import fingerprint
+    source = fingerprint(file_path)
+    path = _cache_path(file_path)
+    if not rebuild:
+        try:
+            with open(path, encoding='utf-8') as file:
+                entry = json.load(file)
+            if entry['source'] == source and entry['sample'] == sample:
+                return {col: ColumnType.parse(kind) for col, kind in entry['columns'].items()}
+        except (OSError, ValueError, KeyError):
+            pass
+
+    columns = infer_schema(file_path, sample)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as file:
+            json.dump({'source': source, 'sample': sample,
+                       'columns': {col: repr(column) for col, column in columns.items()}}, file)
+        os.replace(temp_path, path)
+    except OSError:
+        pass
+    return columns
+
+
+class Schema:
+    # file_path — один файл или список файлов: типы колонок разных файлов сводятся через merge_types
+    def __init__(self, columns: Optional[Dict[str, ColumnType]] = None,
+                 file_path: Union[str, List[str], None] = None, sample: Optional[int] = None,
+                 use_cache: bool = True, rebuild: bool = False,
+                 inferred: Optional[Dict[str, ColumnType]] = None):
+        self.columns = {**(inferred or {}), **(columns or {})}
+        self.declared = frozenset(columns or ())
+        self.file_path = file_path
+        self.sample = sample
+        self.use_cache = use_cache
+        self.rebuild = rebuild
+        self.inferred = file_path is None
+        # Колонка -> тип, в который её ячейки реально переводятся; нужен, чтобы найти виновника ошибки
+        self.used: Dict[str, str] = {}
+
+    def infer(self) -> 'Schema':
+        # Вывод типов откладывается до первого запроса: текстовым фильтрам он не нужен
+        if not self.inferred:
+            paths = [self.file_path] if isinstance(self.file_path, str) else self.file_path
+            inferred: Dict[str, ColumnType] = {}
+            for path in paths:
+                inferred = merge_types(inferred, cached_schema(path, self.sample, self.use_cache, self.rebuild))
+            # Явно заданные в --schema колонки важнее выведенных
+            self.columns = {**inferred, **{col: self.columns[col] for col in self.declared}}
+            self.inferred = True
+        return self
+
+    def allow_nulls(self) -> 'Schema':
+        # Для данных, которые ещё будут дописаны: пустая ячейка в выведенной колонке — None, а не ошибка
+        self.infer()
+        self.columns = {col: column if col in self.declared else ColumnType(column.kind, True)
+                        for col, column in self.columns.items()}
+        return self
+
+    def column(self, col: str) -> ColumnType:
+        if col not in self.columns:
+            self.infer()
+        return self.columns.get(col) or ColumnType('str', True)
+
+    def converter(self, col: str, kind: Optional[str] = None) -> Callable[[Optional[str]], Any]:
+        column = self.column(col)
+        kind = kind or column.kind
+        self.used[col] = kind
+        return make_converter(kind, column.nullable)
+
+    def numeric_kind(self, col: str, functions: Iterable[str] = ()) -> str:
+        column = self.column(col)
+        kind = column.kind if column.numeric else 'float'
+        if kind == 'decimal' and not EXACT_FUNCTIONS.issuperset(functions):
+            kind = 'float'
+        return kind
+
+    def numeric_converter(self, col: str, functions: Iterable[str] = ()) -> Callable[[Optional[str]], Any]:
+        return self.converter(col, self.numeric_kind(col, functions))
+
+    def sorts_typed(self, col: str) -> bool:
+        # Выведенная строковая колонка сортируется как раньше, ключами infer_type: смесь чисел и текста даёт SortError,
+        # а не молча сортирует числа как строки. Явный "str" из --schema сортируется как текст
+        return self.column(col).kind != 'str' or col in self.declared
+
+    def null_key(self, col: str, reverse: bool) -> Optional[Callable[[Any], Any]]:
+        # Ключ для уже переведённого значения nullable-колонки: пустые всегда в конце, в любом направлении
+        if not self.column(col).nullable:
+            return None
+        if reverse:
+            return lambda value: (value is not None, value)
+        return lambda value: (value is None, value)
+
+    def sort_key(self, col: str, reverse: bool,
+                 get: Optional[Callable[[Dict[str, Any]], Any]] = None) -> Callable[[Dict[str, Any]], Any]:
+        convert = self.converter(col)
+        get = get or itemgetter(col)
+        wrap = self.null_key(col, reverse)
+        if wrap is None:
+            return lambda row: convert(get(row))
+        return lambda row: wrap(convert(get(row)))
+
+    def check(self, row: Optional[Dict[str, Any]]):
+        # Вызывается только после ошибки конвертации: ищет ячейку, которая её вызвала
+        if row is None:
+            return
+        for col, kind in self.used.items():
+            cell = row.get(col)
+            try:
+                make_converter(kind, self.column(col).nullable)(cell)
+            except CONVERSION_ERRORS:
+                raise TypeConversionError(cell, col, kind)
+
+    def as_dict(self) -> Dict[str, str]:
+        return {col: repr(column) for col, column in self.infer().columns.items()}
+
+
+def load_schema(file_path: Union[str, List[str]], schema_path: Optional[str] = None,
+                sample: Optional[int] = DEFAULT_SCHEMA_SAMPLE, use_cache: bool = True, rebuild: bool = False) -> Schema:
+    # sample=None или 0 — вывод типов по всему файлу
+    columns = load_schema_file(schema_path) if schema_path else None
+    return Schema(columns, file_path, sample or None, use_cache, rebuild)
@@ -0,0 +1,349 @@
+import argparse
+import asyncio
+import io
+import json
+import os
+import shlex
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple
+from urllib.parse import urlsplit, parse_qsl
+
+from src.aggregates import aggregate_label
+from src.cli import build_parser, parse_args, memory_size, positive_int
+from src.csv_processor import SCALAR_TYPES, run_pipeline, parse_aggregation
+from src.exceptions import ArgumentError, CSVProcessingError
+from src.index import file_state
+from src.result_cache import DEFAULT_MEMORY_BYTES, ResultCache
+from src.writers import write_grid, write_rows
+
+DEFAULT_PORT = 8765
+DEFAULT_MEMORY_BUDGET = 1 << 30
+MAX_REQUEST_SIZE = 1 << 20
+# Эти аргументы пишут в файлы или stderr процесса, для запроса к серверу они не имеют смысла
+UNSUPPORTED_ARGS = ('output', 'build_index', 'stats', 'stats_json', 'profile', 'follow', 'explain')
+CONTENT_TYPES = {
+    'grid': 'text/plain; charset=utf-8',
+    'csv': 'text/csv; charset=utf-8',
+    'tsv': 'text/tab-separated-values; charset=utf-8',
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+    'binary': 'application/octet-stream',
+}
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+           413: 'Payload Too Large', 500: 'Internal Server Error'}
+
+
+class QueryArgumentParser(argparse.ArgumentParser):
+    def error(self, message):
+        raise ArgumentError(message)
+
+    def exit(self, status=0, message=None):
+        raise ArgumentError(message or "--help is not available in serve mode")
+
+
+class Dataset:
+    __slots__ = ('table', 'state', 'nbytes')
+
+    def __init__(self, table: Any, state: Dict[str, int]):
+        self.table = table
+        self.state = state
+        self.nbytes = table.nbytes
+
+
+class DatasetCache:
+    def __init__(self, memory_budget: int = DEFAULT_MEMORY_BUDGET, use_cache: bool = True):
+        self.memory_budget = memory_budget
+        self.use_cache = use_cache
+        self.datasets: 'OrderedDict[Tuple[str, str], Dataset]' = OrderedDict()
+        self.lock = threading.Lock()
+        self.loading: Dict[Tuple[str, str], threading.Lock] = {}
+        self.loads = 0
+
+    @property
+    def nbytes(self) -> int:
+        return sum(dataset.nbytes for dataset in self.datasets.values())
+
+    def get(self, file_path: str, engine: str = 'columnar') -> Any:
+        key = (os.path.abspath(file_path), engine)
+        state = file_state(file_path)
+        dataset = self._lookup(key, state)
+        if dataset is not None:
+            return dataset.table
+
+        # Один и тот же файл загружается одним потоком, остальные запросы к нему ждут результата
+        with self.lock:
+            loading = self.loading.setdefault(key, threading.Lock())
+        try:
+            with loading:
+                dataset = self._lookup(key, state)
+                if dataset is None:
+                    dataset = Dataset(self._load(file_path, engine), state)
+                    self._store(key, dataset)
+        finally:
+            # Блокировка нужна только на время загрузки; следующие запросы найдут таблицу в datasets
+            with self.lock:
+                if self.loading.get(key) is loading:
+                    del self.loading[key]
+        return dataset.table
+
+    def _lookup(self, key: Tuple[str, str], state: Dict[str, int]) -> Optional[Dataset]:
+        with self.lock:
+            dataset = self.datasets.get(key)
+            if dataset is None:
+                return None
+            if dataset.state != state:
+                # Файл изменился: старая копия больше не нужна
+                del self.datasets[key]
+                return None
+            self.datasets.move_to_end(key)
+            return dataset
+
+    def _load(self, file_path: str, engine: str) -> Any:
+        from src.cache import load_table
+        table = load_table(file_path, use_cache=self.use_cache)
+        self.loads += 1
+        if engine == 'numpy':
+            from src.numpy_engine import require_numpy, to_numpy_table
+            require_numpy()
+            return to_numpy_table(table)
+        return table
+
+    def _store(self, key: Tuple[str, str], dataset: Dataset):
+        with self.lock:
+            self.datasets[key] = dataset
+            self.datasets.move_to_end(key)
+            # Вытесняются давно не использованные наборы; последний загруженный остаётся в любом случае
+            total = self.nbytes
+            while total > self.memory_budget and len(self.datasets) > 1:
+                _, evicted = self.datasets.popitem(last=False)
+                total -= evicted.nbytes
+
+    def describe(self) -> List[Dict[str, Any]]:
+        with self.lock:
+            return [{'file': path, 'engine': engine, 'rows': len(dataset.table), 'bytes': dataset.nbytes}
+                    for (path, engine), dataset in self.datasets.items()]
+
+
+class QueryServer:
+    def __init__(self, datasets: Optional[DatasetCache] = None, threads: Optional[int] = None,
+                 results: Optional[ResultCache] = None):
+        self.datasets = datasets or DatasetCache()
+        self.results = results if results is not None else ResultCache()
+        self.parser = build_parser(QueryArgumentParser)
+        # Клиентам удобнее построчный JSON, таблица grid доступна по --output-format grid
+        self.parser.set_defaults(output_format='jsonl')
+        self.executor = ThreadPoolExecutor(max_workers=threads)
+
+    def parse_query(self, argv: List[str]) -> argparse.Namespace:
+        try:
+            args = parse_args(argv, self.parser)
+        except ValueError as e:
+            raise ArgumentError(str(e))
+
+        for name in UNSUPPORTED_ARGS:
+            if getattr(args, name, None):
+                raise ArgumentError(f"--{name.replace('_', '-')} is not supported in serve mode")
+        return args
+
+    def execute(self, args: argparse.Namespace) -> Tuple[str, bytes]:
+        engine = 'numpy' if args.engine == 'numpy' else 'columnar'
+        if not isinstance(args.file, str):
+            # Набор файлов читается заново на каждый запрос, повторный запрос отвечает кэш результатов
+            result = self.results.get_or_compute(args, lambda: run_pipeline(args))
+        else:
+            result = self.results.get_or_compute(
+                args, lambda: run_pipeline(args, data=self.datasets.get(args.file, engine)))
+        return CONTENT_TYPES[args.output_format], render(args, result)
+
+    def respond(self, method: str, target: str, body: bytes) -> Tuple[int, str, bytes]:
+        url = urlsplit(target)
+        if url.path == '/datasets' and method == 'GET':
+            return 200, 'application/json', json.dumps(self.datasets.describe()).encode('utf-8')
+        if url.path == '/cache' and method == 'GET':
+            return 200, 'application/json', json.dumps(self.results.stats()).encode('utf-8')
+        if url.path != '/query':
+            return 404, 'application/json', _error_body("Unknown path", 404)
+        if method not in ('GET', 'POST'):
+            return 405, 'application/json', _error_body("Use GET or POST", 405)
+
+        try:
+            argv = query_argv(url.query, body if method == 'POST' else b'')
+            return (200,) + self.execute(self.parse_query(argv))
+        except CSVProcessingError as e:
+            return 400, 'application/json', _error_body(str(e), e.code)
+        except FileNotFoundError as e:
+            return 404, 'application/json', _error_body(str(e), 404)
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                request = await read_request(reader)
+                if request is None:
+                    break
+                method, target, headers, body, keep_alive = request
+                try:
+                    # Запрос выполняется в пуле потоков, цикл событий тем временем принимает следующие
+                    status, content_type, payload = await loop.run_in_executor(
+                        self.executor, self.respond, method, target, body)
+                except Exception as e:
+                    status, content_type, payload = 500, 'application/json', _error_body(f"Unexpected error: {e}", 99)
+                writer.write(response_bytes(status, content_type, payload, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except ArgumentError as e:
+            writer.write(response_bytes(413 if 'too large' in e.message else 400, 'application/json',
+                                        _error_body(str(e), e.code), False))
+        finally:
+            writer.close()
+
+    async def start(self, host: str = '127.0.0.1', port: int = DEFAULT_PORT,
+                    socket_path: Optional[str] = None) -> asyncio.AbstractServer:
+        if socket_path:
+            return await asyncio.start_unix_server(self.handle, path=socket_path, limit=MAX_REQUEST_SIZE)
+        return await asyncio.start_server(self.handle, host, port, limit=MAX_REQUEST_SIZE)
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+
+
+def query_argv(query: str, body: bytes) -> List[str]:
+    # GET: /query?file=a.csv&where=price>500&aggregate=price=avg; POST: {"args": [...]} или строка аргументов
+    if body:
+        try:
+            payload = json.loads(body)
+        except ValueError as e:
+            raise ArgumentError(f"Invalid JSON body: {e}")
+        args = payload.get('args') if isinstance(payload, dict) else None
+        if isinstance(args, str):
+            return shlex.split(args)
+        if not isinstance(args, list):
+            raise ArgumentError('Body must be {"args": [...]} with the same arguments as the command line')
+        return [str(arg) for arg in args]
+
+    argv = []
+    for name, value in parse_qsl(query, keep_blank_values=True):
+        argv.append(f"--{name.replace('_', '-')}")
+        if value:
+            argv.append(value)
+    return argv
+
+
+def render(args: argparse.Namespace, result: Any) -> bytes:
+    if isinstance(result, SCALAR_TYPES):
+        col, func = parse_aggregation(args.aggregate[0])
+        result = [{aggregate_label(col, func): result}]
+
+    if args.output_format == 'binary':
+        stream = io.BytesIO()
+        write_rows(result, 'binary', stream)
+        return stream.getvalue()
+
+    stream = io.StringIO(newline='')
+    if args.output_format == 'grid':
+        write_grid(result, stream, args.max_rows, floatfmt=".2f")
+    else:
+        write_rows(result, args.output_format, stream)
+    return stream.getvalue().encode('utf-8')
+
+
+async def read_request(reader: asyncio.StreamReader) -> Optional[Tuple[str, str, Dict[str, str], bytes, bool]]:
+    try:
+        line = await reader.readline()
+    except ValueError:
+        raise ArgumentError("Request line too large")
+    if not line.strip():
+        return None
+
+    try:
+        method, target, version = line.decode('latin-1').split()
+    except ValueError:
+        raise ArgumentError("Malformed request line")
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+    try:
+        length = int(headers.get('content-length') or 0)
+    except ValueError:
+        raise ArgumentError("Malformed Content-Length header")
+    if length < 0:
+        raise ArgumentError("Malformed Content-Length header")
+    if length > MAX_REQUEST_SIZE:
+        raise ArgumentError("Request body too large")
+    body = await reader.readexactly(length) if length else b''
+
+    connection = headers.get('connection', '').lower()
+    keep_alive = connection != 'close' if version == 'HTTP/1.1' else connection == 'keep-alive'
+    return method.upper(), target, headers, body, keep_alive
+
+
+def response_bytes(status: int, content_type: str, payload: bytes, keep_alive: bool) -> bytes:
+    head = (
+        f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+        f"Content-Type: {content_type}\r\n"
+        f"Content-Length: {len(payload)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+    )
+    return head.encode('latin-1') + payload
+
+
+def _error_body(message: str, code: int) -> bytes:
+    return json.dumps({'error': message, 'code': code}, ensure_ascii=False).encode('utf-8')
+
+
+def parse_serve_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog='main.py serve',
+        description='Answer CSV queries over HTTP, keeping parsed files in memory'
+    )
+    parser.add_argument('--host', type=str, default='127.0.0.1',
+                        help='Address to listen on (default: 127.0.0.1)')
+    parser.add_argument('--port', type=positive_int, default=DEFAULT_PORT,
+                        help=f'TCP port to listen on (default: {DEFAULT_PORT})')
+    parser.add_argument('--socket', type=str, default=None, metavar='PATH',
+                        help='Listen on this Unix socket instead of TCP')
+    parser.add_argument('--memory-budget', type=memory_size, default=DEFAULT_MEMORY_BUDGET,
+                        help='Memory for resident datasets; least recently used files are dropped (default: 1G)')
+    parser.add_argument('--threads', type=positive_int, default=None,
+                        help='Threads executing queries (default: chosen by Python)')
+    parser.add_argument('--result-cache-size', type=memory_size, default=DEFAULT_MEMORY_BYTES,
+                        help='Memory for cached query results (default: 256M)')
+    parser.add_argument('--result-cache-ttl', type=float, default=None, metavar='SECONDS',
+                        help='Recompute cached results older than this')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Do not read or write the parsed table cache when loading files')
+    return parser.parse_args(argv)
+
+
+async def serve(args: argparse.Namespace):
+    server = QueryServer(DatasetCache(args.memory_budget, use_cache=not args.no_cache), args.threads,
+                         ResultCache(args.result_cache_size, args.result_cache_ttl))
+    listener = await server.start(args.host, args.port, args.socket)
+    where = args.socket or f"http://{args.host}:{args.port}"
+    print(f"Serving queries on {where}", flush=True)
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        server.close()
+
+
+def main(argv: Optional[List[str]] = None):
+    try:
+        asyncio.run(serve(parse_serve_args(argv)))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
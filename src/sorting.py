@@ -0,0 +1,145 @@
+import heapq
+import pickle
+import sys
+import tempfile
+from itertools import chain, islice
+from operator import itemgetter
+from typing import List, Dict, Any, Callable, Iterable, Iterator, IO, Optional, Tuple
+
+from src.csv_processor import infer_type, parse_sort
+from src.exceptions import ColumnNotFoundError, SortError
+from src.rows import column_getter
+from src.schema import CONVERSION_ERRORS, Schema
+
+RUN_BATCH_SIZE = 1024
+MERGE_FAN_IN = 64
+
+
+def _resolve_key(first: Dict[str, Any], condition: str, schema: Optional[Schema] = None):
+    col, reverse = parse_sort(condition)
+    if col not in first:
+        raise ColumnNotFoundError(f"Column '{col}' not found in CSV")
+
+    get = column_getter(first, col)
+    if schema is not None and schema.sorts_typed(col):
+        return schema.sort_key(col, reverse, get), reverse
+    return (lambda row: infer_type(get(row))), reverse
+
+
+def keyed(rows: Iterable[Dict[str, Any]], key: Callable[[Dict[str, Any]], Any],
+          schema: Schema) -> Iterator[Tuple[Any, Dict[str, Any]]]:
+    # Ключи считаются здесь, чтобы ошибку конвертации можно было связать со строкой
+    row = None
+    try:
+        for row in rows:
+            yield key(row), row
+    except CONVERSION_ERRORS:
+        schema.check(row)
+        raise
+
+
+def typed_sort(rows: Iterable[Dict[str, Any]], col: str, reverse: bool, schema: Schema) -> List[Dict[str, Any]]:
+    get = column_getter(rows[0], col) if rows else None
+    pairs = list(keyed(rows, schema.sort_key(col, reverse, get), schema))
+    pairs.sort(key=itemgetter(0), reverse=reverse)
+    return [row for _, row in pairs]
+
+
+def top_k(rows: Iterable[Dict[str, Any]], condition: str, k: int,
+          schema: Optional[Schema] = None) -> List[Dict[str, Any]]:
+    rows = iter(rows)
+    first = next(rows, None)
+    if first is None:
+        return []
+
+    key, reverse = _resolve_key(first, condition, schema)
+
+    # nlargest/nsmallest устойчивы: результат совпадает с sorted(...)[:k], но хранится только k строк
+    select = heapq.nlargest if reverse else heapq.nsmallest
+    try:
+        if schema is not None:
+            return [row for _, row in select(k, keyed(chain((first,), rows), key, schema), key=itemgetter(0))]
+        return select(k, chain((first,), rows), key=key)
+    except TypeError as e:
+        raise SortError(f"Sorting error: {e}")
+
+
+def _row_size(row: Dict[str, Any]) -> int:
+    return sys.getsizeof(row) + sum(49 + len(value) for value in row.values() if isinstance(value, str))
+
+
+def _write_run(entries: Iterable[Any]) -> IO[bytes]:
+    run = tempfile.TemporaryFile()
+    entries = iter(entries)
+    while True:
+        batch = list(islice(entries, RUN_BATCH_SIZE))
+        if not batch:
+            break
+        pickle.dump(batch, run, protocol=pickle.HIGHEST_PROTOCOL)
+    run.seek(0)
+    return run
+
+
+def _read_run(run: IO[bytes]) -> Iterator[Any]:
+    while True:
+        try:
+            batch = pickle.load(run)
+        except EOFError:
+            return
+        yield from batch
+
+
+def _merge(runs: List[Iterator[Any]], reverse: bool) -> Iterator[Any]:
+    # heapq.merge при равных ключах отдаёт элементы из более ранних прогонов первыми — порядок устойчив
+    return heapq.merge(*runs, key=itemgetter(0), reverse=reverse)
+
+
+def external_sort(rows: Iterable[Dict[str, Any]], condition: str, memory_limit: int,
+                  schema: Optional[Schema] = None) -> Iterator[Dict[str, Any]]:
+    rows = iter(rows)
+    first = next(rows, None)
+    if first is None:
+        return
+
+    key, reverse = _resolve_key(first, condition, schema)
+    sort_key = itemgetter(0)
+
+    runs = []
+    try:
+        buffer = []
+        used = 0
+        pairs = keyed(chain((first,), rows), key, schema) if schema is not None else \
+            ((key(row), row) for row in chain((first,), rows))
+        for pair in pairs:
+            buffer.append(pair)
+            used += _row_size(pair[1])
+            if used >= memory_limit:
+                buffer.sort(key=sort_key, reverse=reverse)
+                runs.append(_write_run(buffer))
+                buffer = []
+                used = 0
+
+        buffer.sort(key=sort_key, reverse=reverse)
+        if not runs:
+            for _, row in buffer:
+                yield row
+            return
+        runs.append(_write_run(buffer))
+        del buffer
+
+        while len(runs) > MERGE_FAN_IN:
+            merged = []
+            for start in range(0, len(runs), MERGE_FAN_IN):
+                group = runs[start:start + MERGE_FAN_IN]
+                merged.append(_write_run(_merge([_read_run(run) for run in group], reverse)))
+                for run in group:
+                    run.close()
+            runs = merged
+
+        for _, row in _merge([_read_run(run) for run in runs], reverse):
+            yield row
+    except TypeError as e:
+        raise SortError(f"Sorting error: {e}")
+    finally:
+        for run in runs:
+            run.close()
@@ -0,0 +1,172 @@
+import cProfile
+import json
+import pstats
+import sys
+import time
+from contextlib import contextmanager
+from typing import List, Dict, Any, Callable, Iterable, Iterator, Optional, TextIO
+
+from src.csv_processor import SCALAR_TYPES
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+class Stage:
+    __slots__ = ('name', 'seconds', 'rows_in', 'rows_out', 'bytes_read', 'peak_memory', 'started')
+
+    def __init__(self, name: str, rows_in: Optional[int] = None, bytes_read: Optional[int] = None):
+        self.name = name
+        self.seconds = 0.0
+        self.rows_in = rows_in
+        self.rows_out: Optional[int] = None
+        self.bytes_read = bytes_read
+        self.peak_memory: Optional[int] = None
+        self.started = 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            'stage': self.name,
+            'seconds': self.seconds,
+            'rows_in': self.rows_in,
+            'rows_out': self.rows_out,
+            'bytes_read': self.bytes_read,
+            'peak_memory': self.peak_memory,
+        }
+
+
+def peak_rss() -> Optional[int]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux отдаёт килобайты, macOS — байты
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def untracked(name: str, produce: Callable[[], Any], bytes_read: Optional[int] = None) -> Any:
+    return produce()
+
+
+class Recorder:
+    SAMPLE_EVERY = 1024
+
+    def __init__(self):
+        self.stages: List[Stage] = []
+        self.active: List[Stage] = []
+        self.started = time.perf_counter()
+        self.total_seconds = 0.0
+        self.switches = 0
+
+    def _switch(self, now: float, force: bool = False):
+        if self.active:
+            stage = self.active[-1]
+            stage.seconds += now - stage.started
+            # Пиковый RSS процесса только растёт: рост засчитывается стадии, которая работала в момент замера
+            self.switches += 1
+            if force or self.switches % self.SAMPLE_EVERY == 0:
+                stage.peak_memory = max(stage.peak_memory or 0, peak_rss() or 0) or None
+
+    def _enter(self, stage: Stage, force: bool = False):
+        now = time.perf_counter()
+        self._switch(now, force)
+        self.active.append(stage)
+        stage.started = now
+
+    def _exit(self, force: bool = False):
+        now = time.perf_counter()
+        self._switch(now, force)
+        self.active.pop()
+        if self.active:
+            self.active[-1].started = now
+
+    def track(self, name: str, produce: Callable[[], Any], bytes_read: Optional[int] = None) -> Any:
+        # Время каждой стадии — собственное: пока она ждёт строки от предыдущей, часы идут у предыдущей
+        previous = self.stages[-1] if self.stages else None
+        stage = Stage(name, bytes_read=bytes_read)
+        self.stages.append(stage)
+
+        self._enter(stage, force=True)
+        try:
+            result = produce()
+        finally:
+            self._exit(force=True)
+
+        if previous is not None:
+            stage.rows_in = previous.rows_out
+        if result is None:
+            return None
+        if isinstance(result, SCALAR_TYPES):
+            stage.rows_out = 1
+        elif hasattr(result, '__len__'):
+            stage.rows_out = len(result)
+        else:
+            return self._iterate(stage, previous, result)
+        return result
+
+    def _iterate(self, stage: Stage, previous: Optional[Stage], rows: Iterable[Any]) -> Iterator[Any]:
+        rows = iter(rows)
+        stage.rows_out = 0
+        while True:
+            self._enter(stage)
+            try:
+                row = next(rows)
+            except StopIteration:
+                stage.peak_memory = max(stage.peak_memory or 0, peak_rss() or 0) or None
+                return
+            finally:
+                self._exit()
+                if previous is not None:
+                    stage.rows_in = previous.rows_out
+            stage.rows_out += 1
+            yield row
+
+    def finish(self):
+        self.total_seconds = time.perf_counter() - self.started
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {'total_seconds': self.total_seconds, 'stages': [stage.as_dict() for stage in self.stages]}
+
+    def write_json(self, path: str):
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(self.as_dict(), file, indent=2)
+
+    def format(self) -> str:
+        lines = [f"{'stage':<12}{'seconds':>10}{'rows in':>12}{'rows out':>12}{'bytes read':>14}{'peak RSS':>14}"]
+        for stage in self.stages:
+            lines.append(
+                f"{stage.name:<12}{stage.seconds:>10.4f}{_count(stage.rows_in):>12}{_count(stage.rows_out):>12}"
+                f"{_size(stage.bytes_read):>14}{_size(stage.peak_memory):>14}"
+            )
+        lines.append(f"{'total':<12}{self.total_seconds:>10.4f}")
+        return '\n'.join(lines)
+
+
+def _count(value: Optional[int]) -> str:
+    return '-' if value is None else f"{value:,}"
+
+
+def _size(value: Optional[int]) -> str:
+    if value is None:
+        return '-'
+    for unit in ('B', 'KB', 'MB'):
+        if value < 1024:
+            return f"{value:.0f} {unit}" if unit == 'B' else f"{value:.1f} {unit}"
+        value /= 1024
+    return f"{value:.1f} GB"
+
+
+@contextmanager
+def profiled(enabled: bool, stream: TextIO, limit: int = 30) -> Iterator[None]:
+    if not enabled:
+        yield
+        return
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        pstats.Stats(profiler, stream=stream).sort_stats('cumulative').print_stats(limit)
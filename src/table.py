@@ -0,0 +1,459 @@
+import csv
+import operator
+from array import array
+from functools import reduce
+from itertools import compress, repeat
+from typing import List, Dict, Union, Any, Callable, Iterable, Iterator, Optional, Sequence, Set
+from src.csv_processor import (
+    OPERATORS_MAP, parse_aggregation, parse_sort, compile_condition, infer_type, aggregate_data,
+    numeric_value, prepare_grouping
+)
+from src.compression import open_text
+from src.aggregates import Accumulator, DEFAULT_COMPRESSION, is_aggregate_function, percentile_of, exact_quantile
+from src.exceptions import ColumnNotFoundError, FilterError, AggregationError, SortError
+from src.expressions import Expression, Comparison, Membership, Not, And, parse_expression
+from src.rows import Row, to_rows
+from src.schema import Schema, convert_all
+
+
+TYPECODES = {'int': 'q', 'float': 'd'}
+
+
+class NumericColumn:
+    def __init__(self, kind: str, data: array, overrides: Optional[Dict[int, str]] = None,
+                 int_literals: Optional[array] = None):
+        self.kind = kind
+        self.data = data
+        self.overrides = overrides or {}
+        self.int_literals = int_literals
+
+    def __len__(self):
+        return len(self.data)
+
+    @property
+    def typecode(self) -> str:
+        return TYPECODES[self.kind]
+
+    def text(self, i: int) -> str:
+        if i in self.overrides:
+            return self.overrides[i]
+        value = self.data[i]
+        if self.kind == 'int' or self.int_literals[i]:
+            return str(int(value))
+        return repr(value)
+
+    def take(self, indices: List[int]) -> 'NumericColumn':
+        data = array(self.typecode, map(self.data.__getitem__, indices))
+        int_literals = None
+        if self.int_literals is not None:
+            int_literals = array('b', map(self.int_literals.__getitem__, indices))
+        overrides = None
+        if self.overrides:
+            overrides = {j: self.overrides[i] for j, i in enumerate(indices) if i in self.overrides}
+        return NumericColumn(self.kind, data, overrides, int_literals)
+
+    def select(self, op_symbol: str, value: Union[str, float, int]) -> Iterable[int]:
+        rows = range(len(self.data))
+        if isinstance(value, str):
+            if op_symbol == "=":
+                return []
+            if op_symbol == "!=":
+                return rows
+            raise FilterError(f"Error comparing values in row: cannot compare numbers with '{value}'")
+        return compress(rows, map(OPERATORS_MAP[op_symbol], self.data, repeat(value)))
+
+    def select_in(self, numbers: Set[float], matches: Callable[[str], bool]) -> Iterable[int]:
+        # Числовая ячейка никогда не равна строке, поэтому достаточно множества чисел
+        return compress(range(len(self.data)), map(numbers.__contains__, self.data))
+
+    def sort_keys(self) -> Any:
+        return self.data
+
+    def typed(self, kind: str) -> Optional[Any]:
+        # Готовые числа совпадают с тем, что дал бы конвертер kind по тексту ячеек; None — нужен сам текст
+        if kind == self.kind:
+            return self.data
+        if kind == 'float':
+            return array('d', self.data)
+        return None
+
+    def converted(self, kind: str, convert: Callable[[Optional[str]], Any], col: str) -> Sequence[Any]:
+        data = self.typed(kind)
+        if data is not None:
+            return data
+        return convert_all(convert, map(self.text, range(len(self))), col, kind)
+
+    def matched(self, matches: Callable[[Optional[str]], bool], col: str, kind: str) -> List[bool]:
+        return convert_all(matches, map(self.text, range(len(self))), col, kind)
+
+    @property
+    def nbytes(self) -> int:
+        size = array(self.typecode).itemsize * len(self.data)
+        if self.int_literals is not None:
+            size += len(self.int_literals)
+        return size + sum(len(text) + 64 for text in self.overrides.values())
+
+
+class StringColumn:
+    kind = 'str'
+
+    def __init__(self, values: List[Optional[str]], codes: array):
+        self.values = values
+        self.codes = codes
+
+    def __len__(self):
+        return len(self.codes)
+
+    def text(self, i: int) -> Optional[str]:
+        return self.values[self.codes[i]]
+
+    def take(self, indices: List[int]) -> 'StringColumn':
+        return StringColumn(self.values, array('I', map(self.codes.__getitem__, indices)))
+
+    def select(self, op_symbol: str, value: Union[str, float, int]) -> Iterable[int]:
+        return self.select_in(set(), compile_condition(op_symbol, value))
+
+    def select_in(self, numbers: Set[float], matches: Callable[[str], bool]) -> Iterable[int]:
+        # Условие проверяется один раз на каждое уникальное значение словаря
+        matched = [bool(matches(text)) for text in self.values]
+        return compress(range(len(self.codes)), map(matched.__getitem__, self.codes))
+
+    def sort_keys(self) -> List[Any]:
+        keys = [infer_type(text) for text in self.values]
+        return list(map(keys.__getitem__, self.codes))
+
+    def _by_code(self, convert: Callable[[Optional[str]], Any], col: str, kind: str) -> List[Any]:
+        # Словарь общий с исходной таблицей: переводятся только значения, которые есть в этих строках,
+        # каждое один раз
+        used = sorted(set(self.codes))
+        values = self.values
+        lookup = dict(zip(used, convert_all(convert, [values[code] for code in used], col, kind)))
+        return list(map(lookup.__getitem__, self.codes))
+
+    def converted(self, kind: str, convert: Callable[[Optional[str]], Any], col: str) -> List[Any]:
+        return self._by_code(convert, col, kind)
+
+    def matched(self, matches: Callable[[Optional[str]], bool], col: str, kind: str) -> List[bool]:
+        return self._by_code(matches, col, kind)
+
+    @property
+    def nbytes(self) -> int:
+        return 4 * len(self.codes) + sum(len(text or '') + 49 for text in self.values)
+
+
+Column = Union[NumericColumn, StringColumn]
+
+
+class _ColumnBuilder:
+    def __init__(self):
+        self.kind = 'int'
+        self.data = array('q')
+        self.overrides = {}
+        self.int_literals = None
+        self.values = None
+        self.lookup = None
+        self.codes = None
+
+    def append(self, cell: Optional[str]):
+        if self.kind == 'str':
+            self._append_code(cell)
+            return
+
+        try:
+            if self.kind == 'int':
+                number = int(cell)
+                self.data.append(number)
+            else:
+                number = float(cell)
+                self.data.append(number)
+        except (TypeError, ValueError):
+            self._promote(cell)
+            return
+        except OverflowError:
+            self._promote(cell, allow_float=False)
+            return
+
+        if self.kind == 'int':
+            if str(number) != cell:
+                self.overrides[len(self.data) - 1] = cell
+        elif cell == repr(number):
+            self.int_literals.append(0)
+        elif number.is_integer() and cell == str(int(number)):
+            self.int_literals.append(1)
+        else:
+            self.int_literals.append(0)
+            self.overrides[len(self.data) - 1] = cell
+
+    def _append_code(self, cell: Optional[str]):
+        code = self.lookup.get(cell)
+        if code is None:
+            code = self.lookup[cell] = len(self.values)
+            self.values.append(cell)
+        self.codes.append(code)
+
+    def _promote(self, cell: Optional[str], allow_float: bool = True):
+        if self.kind == 'int' and allow_float and cell is not None:
+            try:
+                float(cell)
+            except ValueError:
+                pass
+            else:
+                ints = self.data
+                self.kind = 'float'
+                self.data = array('d', ints)
+                self.int_literals = array('b', repeat(1, len(ints)))
+                for i, value in enumerate(ints):
+                    if i not in self.overrides and float(value) != value:
+                        self.overrides[i] = str(value)
+                self.append(cell)
+                return
+
+        column = self.build()
+        self.kind = 'str'
+        self.values = []
+        self.lookup = {}
+        self.codes = array('I')
+        for i in range(len(column)):
+            self._append_code(column.text(i))
+        self.data = self.overrides = self.int_literals = None
+        self._append_code(cell)
+
+    def build(self) -> Column:
+        if self.kind == 'str':
+            return StringColumn(self.values, self.codes)
+        return NumericColumn(self.kind, self.data, self.overrides, self.int_literals)
+
+
+class Table:
+    def __init__(self, columns: Dict[str, Column], length: int):
+        self.columns = columns
+        self.length = length
+
+    def __len__(self):
+        return self.length
+
+    @property
+    def column_names(self) -> List[str]:
+        return list(self.columns)
+
+    def __iter__(self) -> Iterator[Dict[str, Optional[str]]]:
+        columns = list(self.columns.items())
+        for i in range(self.length):
+            yield {name: column.text(i) for name, column in columns}
+
+    def rows(self, columns: Optional[List[str]] = None) -> Iterator[Row]:
+        # Компактные строки, как при потоковом чтении CSV; columns оставляет только нужные колонки
+        names = columns if columns and all(name in self.columns for name in columns) else self.column_names
+        texts = [_column_texts(self.columns[name]) for name in names]
+        return to_rows(names, map(list, zip(*texts)))
+
+    def take(self, indices: Iterable[int]) -> 'Table':
+        indices = array('q', indices)
+        columns = {name: column.take(indices) for name, column in self.columns.items()}
+        return type(self)(columns, len(indices))
+
+    def filter(self, condition: str, schema: Optional[Schema] = None) -> 'Table':
+        return filter_table(self, condition, schema)
+
+    def aggregate(self, operation: str, schema: Optional[Schema] = None,
+                  compression: int = DEFAULT_COMPRESSION) -> float:
+        return aggregate_table(self, operation, schema, compression)
+
+    def sort(self, condition: str, schema: Optional[Schema] = None) -> 'Table':
+        return sort_table(self, condition, schema)
+
+    def group_aggregate(self, group_col: Optional[str], operations: List[str],
+                        compression: int = DEFAULT_COMPRESSION, schema: Optional[Schema] = None) -> List[Dict[str, Any]]:
+        return group_table(self, group_col, operations, compression, schema)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(column.nbytes for column in self.columns.values())
+
+
+def read_table(file_path: str) -> Table:
+    with open_text(file_path) as file:
+        reader = csv.reader(file)
+        header = next(reader, None)
+        if header is None:
+            return Table({}, 0)
+
+        width = len(header)
+        builders = [_ColumnBuilder() for _ in header]
+        length = 0
+        for row in reader:
+            if not row:
+                continue
+            if len(row) != width:
+                row = (row + [None] * width)[:width]
+            for builder, cell in zip(builders, row):
+                builder.append(cell)
+            length += 1
+
+    return Table({name: builder.build() for name, builder in zip(header, builders)}, length)
+
+
+def filter_table(table: Table, condition: str, schema: Optional[Schema] = None) -> Table:
+    if not condition or not len(table):
+        return table
+
+    expression = parse_expression(condition)
+    expression.resolve(table.column_names)
+    return table.take(_select(table, expression, schema))
+
+
+def typed_matches(table: Table, expression: Union[Comparison, Membership], schema: Schema) -> Iterable[bool]:
+    # Колонка переводится тем же конвертером схемы, что и строки в движке python
+    col = expression.col
+    column = table.columns[col]
+    if isinstance(expression, Membership):
+        matches = expression.typed_matcher(schema)
+        return column.matched(matches, col, schema.used.get(col, schema.column(col).kind))
+
+    kind, value = expression.typed_target(schema)
+    values = column.converted(kind, schema.converter(col, kind), col)
+    op_func = OPERATORS_MAP[expression.op_symbol]
+    if schema.column(col).nullable:
+        return [converted is not None and op_func(converted, value) for converted in values]
+    return map(op_func, values, repeat(value))
+
+
+def _select(table: Table, expression: Expression, schema: Optional[Schema] = None) -> Iterable[int]:
+    if isinstance(expression, (Comparison, Membership)) and schema is not None and \
+            not (isinstance(expression, Comparison) and expression.textual):
+        return compress(range(len(table)), typed_matches(table, expression, schema))
+    if isinstance(expression, Comparison):
+        return table.columns[expression.col].select(expression.op_symbol, expression.value)
+    if isinstance(expression, Membership):
+        return table.columns[expression.col].select_in(expression.numbers, expression.matcher())
+    if isinstance(expression, Not):
+        chosen = set(_select(table, expression.child, schema))
+        return [i for i in range(len(table)) if i not in chosen]
+
+    # AND проверяет каждое следующее условие только на прошедших строках, OR — только на отброшенных
+    view = Table({col: table.columns[col] for col in expression.columns()}, len(table))
+    positions = range(len(table))
+    found = []
+    for child in expression.ordered():
+        chosen = list(_select(view, child, schema))
+        if isinstance(expression, And):
+            rest = chosen
+        else:
+            found.extend(map(positions.__getitem__, chosen))
+            chosen_set = set(chosen)
+            rest = [i for i in range(len(view)) if i not in chosen_set]
+        positions = list(map(positions.__getitem__, rest))
+        view = view.take(rest)
+    return positions if isinstance(expression, And) else sorted(found)
+
+
+def typed_numbers(table: Table, col: str, schema: Schema, functions: Iterable[str]) -> Sequence[Any]:
+    kind = schema.numeric_kind(col, functions)
+    values = table.columns[col].converted(kind, schema.converter(col, kind), col)
+    if schema.column(col).nullable:
+        # Пустые ячейки в агрегаты не входят
+        return [value for value in values if value is not None]
+    return values
+
+
+def aggregate_table(table: Table, operation: str, schema: Optional[Schema] = None,
+                    compression: int = DEFAULT_COMPRESSION) -> float:
+    if not len(table):
+        raise AggregationError("Cannot aggregate empty dataset")
+
+    col, func_name = parse_aggregation(operation)
+
+    if col not in table.columns:
+        raise ColumnNotFoundError(f"Column '{col}' not found in CSV")
+
+    if schema is not None:
+        # Те же аккумуляторы, что и в движке python, поэтому результат совпадает до бита
+        if not is_aggregate_function(func_name):
+            raise AggregationError(f"Unsupported aggregation function: {func_name}")
+        values = typed_numbers(table, col, schema, (func_name,))
+        return Accumulator((func_name,), compression).update(values).result(func_name)
+
+    column = table.columns[col]
+    if column.kind == 'str':
+        return aggregate_data(({col: column.text(i)} for i in range(len(column))), operation)
+
+    if func_name == "avg":
+        # Последовательное сложение, как в aggregate_data, чтобы результат совпадал до бита
+        return reduce(operator.add, column.data, 0) / len(column)
+    elif func_name == "sum":
+        return reduce(operator.add, column.data, 0)
+    elif func_name == "count":
+        return len(column)
+    elif func_name == "min":
+        return min(column.data)
+    elif func_name == "max":
+        return max(column.data)
+    elif func_name in ("stddev", "variance"):
+        return Accumulator((func_name,)).update(column.data).result(func_name)
+
+    # Все значения уже в памяти, поэтому перцентили считаются точно, без скетча
+    q = percentile_of(func_name)
+    if q is not None:
+        return exact_quantile(column.data, q)
+    raise AggregationError(f"Unsupported aggregation function: {func_name}")
+
+
+def typed_order(table: Table, col: str, reverse: bool, schema: Schema) -> List[int]:
+    keys = table.columns[col].converted(schema.column(col).kind, schema.converter(col), col)
+    wrap = schema.null_key(col, reverse)
+    if wrap is not None:
+        keys = list(map(wrap, keys))
+    return sorted(range(len(table)), key=keys.__getitem__, reverse=reverse)
+
+
+def sort_table(table: Table, condition: str, schema: Optional[Schema] = None) -> Table:
+    if not len(table):
+        return table
+
+    col, reverse = parse_sort(condition)
+
+    if col not in table.columns:
+        raise ColumnNotFoundError(f"Column '{col}' not found in CSV")
+
+    if schema is not None and schema.sorts_typed(col):
+        return table.take(typed_order(table, col, reverse, schema))
+
+    try:
+        keys = table.columns[col].sort_keys()
+        order = sorted(range(len(table)), key=keys.__getitem__, reverse=reverse)
+    except Exception as e:
+        raise SortError(f"Sorting error: {e}")
+
+    return table.take(order)
+
+
+def _column_texts(column: Column) -> Iterator[Optional[str]]:
+    if isinstance(column, StringColumn):
+        return map(column.values.__getitem__, column.codes)
+    return map(column.text, range(len(column)))
+
+
+def _column_numbers(name: str, column: Column) -> Iterator[Union[int, float]]:
+    if isinstance(column, StringColumn):
+        return (numeric_value(text, name) for text in _column_texts(column))
+    return iter(column.data)
+
+
+def group_table(table: Table, group_col: Optional[str], operations: List[str],
+                compression: int = DEFAULT_COMPRESSION, schema: Optional[Schema] = None) -> List[Dict[str, Any]]:
+    if not len(table):
+        return []
+
+    grouping = prepare_grouping(table.column_names, group_col, operations, compression)
+    keys = repeat(None) if group_col is None else _column_texts(table.columns[group_col])
+    if schema is not None:
+        # None от пустых ячеек передаётся как есть: GroupedAggregation.add их пропускает
+        kinds = [schema.numeric_kind(col, functions) for col, functions in zip(grouping.columns, grouping.functions)]
+        values = zip(*[table.columns[col].converted(kind, schema.converter(col, kind), col)
+                       for col, kind in zip(grouping.columns, kinds)])
+    else:
+        values = zip(*[_column_numbers(col, table.columns[col]) for col in grouping.columns])
+    add = grouping.add
+    for key, row in zip(keys, values):
+        add(key, row)
+    return grouping.results()
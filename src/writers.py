@@ -0,0 +1,210 @@
+import csv
+import io
+import json
+import struct
+import sys
+from array import array
+from contextlib import contextmanager
+from itertools import islice
+from operator import itemgetter
+from typing import List, Dict, Any, BinaryIO, Callable, Iterable, Iterator, Optional, TextIO, Tuple
+
+from src.rows import Row, as_dict, positions
+
+OUTPUT_FORMATS = ('grid', 'csv', 'tsv', 'jsonl', 'binary')
+BATCH_SIZE = 4096
+ROW_GROUP_SIZE = 65536
+BUFFER_SIZE = 1 << 20
+BINARY_MAGIC = b'CSVROWS1'
+GRID_MAX_ROWS = 1000
+
+
+def _batches(rows: Iterable[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _row_getter(first: Dict[str, Any], keys: List[Any]) -> Callable[[Dict[str, Any]], Tuple[Any, ...]]:
+    if len(keys) == 1:
+        key = keys[0]
+        plain = lambda row: (row[key],)
+    else:
+        plain = itemgetter(*keys)
+    index = positions(first)
+    if index is None:
+        return plain
+    # Компактная строка с тем же заголовком пишется своими полями как есть, без поиска по именам
+    return lambda row: row.fields if row.__class__ is Row and (row.index is index or row.index == index) else plain(row)
+
+
+def write_delimited(rows: Iterable[Dict[str, Any]], stream: TextIO, delimiter: str = ',',
+                    header: bool = True) -> int:
+    writer = csv.writer(stream, delimiter=delimiter, lineterminator='\n')
+    count = 0
+    getter = None
+    for batch in _batches(rows, BATCH_SIZE):
+        if getter is None:
+            keys = list(batch[0])
+            getter = _row_getter(batch[0], keys)
+            if header:
+                writer.writerow(keys)
+        writer.writerows(map(getter, batch))
+        count += len(batch)
+    return count
+
+
+def write_jsonl(rows: Iterable[Dict[str, Any]], stream: TextIO) -> int:
+    # Суммы decimal-колонок пишутся строкой, чтобы не терять точность
+    encode = json.JSONEncoder(ensure_ascii=False, default=str).encode
+    count = 0
+    for batch in _batches(rows, BATCH_SIZE):
+        stream.write('\n'.join(map(encode, map(as_dict, batch))))
+        stream.write('\n')
+        count += len(batch)
+    return count
+
+
+def _encode_column(values: List[Any]) -> Tuple[Dict[str, Any], List[bytes]]:
+    # Колонка хранится числами, только если текст восстанавливается из числа без изменений
+    text = all(isinstance(value, str) for value in values)
+    for kind, typecode, convert, render in (('int', 'q', int, str), ('float', 'd', float, repr)):
+        try:
+            numbers = [convert(value) for value in values]
+        except (TypeError, ValueError, OverflowError):
+            continue
+        if text and any(render(number) != value for number, value in zip(numbers, values)):
+            continue
+        if not text and any(type(value) is not type(number) for number, value in zip(numbers, values)):
+            continue
+        return {'type': kind, 'text': text}, [array(typecode, numbers).tobytes()]
+
+    nulls = bytearray(value is None for value in values)
+    encoded = [b'' if value is None else str(value).encode('utf-8') for value in values]
+    offsets = array('q', [0])
+    position = 0
+    for chunk in encoded:
+        position += len(chunk)
+        offsets.append(position)
+    return {'type': 'str', 'text': True}, [bytes(nulls), offsets.tobytes(), b''.join(encoded)]
+
+
+def write_binary(rows: Iterable[Dict[str, Any]], stream: BinaryIO) -> int:
+    # Колоночный формат по группам строк: в памяти одновременно только одна группа
+    stream.write(BINARY_MAGIC)
+    count = 0
+    for batch in _batches(rows, ROW_GROUP_SIZE):
+        keys = list(batch[0])
+        columns = []
+        sections = []
+        for key in keys:
+            meta, blobs = _encode_column([row.get(key) for row in batch])
+            meta['name'] = key
+            meta['lengths'] = [len(blob) for blob in blobs]
+            columns.append(meta)
+            sections.extend(blobs)
+
+        header = json.dumps({'rows': len(batch), 'columns': columns}).encode('utf-8')
+        stream.write(struct.pack('<I', len(header)))
+        stream.write(header)
+        for blob in sections:
+            stream.write(blob)
+        count += len(batch)
+
+    stream.write(struct.pack('<I', 0))
+    return count
+
+
+def _decode_column(meta: Dict[str, Any], blobs: List[bytes], rows: int) -> List[Any]:
+    if meta['type'] == 'str':
+        nulls, offsets, blob = blobs
+        offsets = array('q', offsets)
+        return [None if nulls[i] else blob[offsets[i]:offsets[i + 1]].decode('utf-8') for i in range(rows)]
+
+    numbers = array('q' if meta['type'] == 'int' else 'd', blobs[0])
+    if not meta['text']:
+        return numbers.tolist()
+    render = str if meta['type'] == 'int' else repr
+    return [render(number) for number in numbers]
+
+
+def read_binary(stream: BinaryIO) -> Iterator[Dict[str, Any]]:
+    if stream.read(len(BINARY_MAGIC)) != BINARY_MAGIC:
+        raise ValueError("Not a binary result file")
+
+    while True:
+        (length,) = struct.unpack('<I', stream.read(4))
+        if not length:
+            return
+        header = json.loads(stream.read(length))
+        columns = []
+        for meta in header['columns']:
+            blobs = [stream.read(size) for size in meta['lengths']]
+            columns.append((meta['name'], _decode_column(meta, blobs, header['rows'])))
+        names = [name for name, _ in columns]
+        for values in zip(*(values for _, values in columns)):
+            yield dict(zip(names, values))
+
+
+WRITERS = {
+    'csv': write_delimited,
+    'tsv': lambda rows, stream: write_delimited(rows, stream, delimiter='\t'),
+    'jsonl': write_jsonl,
+    'binary': write_binary,
+}
+
+
+@contextmanager
+def open_output(path: Optional[str], binary: bool = False) -> Iterator[Any]:
+    if path is None:
+        sys.stdout.flush()
+        if binary:
+            yield sys.stdout.buffer
+            sys.stdout.buffer.flush()
+            return
+        # Отдельный буфер поверх stdout, чтобы писать большими блоками
+        stream = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', newline='',
+                                  write_through=False) if hasattr(sys.stdout, 'buffer') else sys.stdout
+        try:
+            yield stream
+        finally:
+            stream.flush()
+            if stream is not sys.stdout:
+                stream.detach()
+        return
+
+    if binary:
+        with open(path, mode='wb', buffering=BUFFER_SIZE) as file:
+            yield file
+    else:
+        with open(path, mode='w', encoding='utf-8', newline='', buffering=BUFFER_SIZE) as file:
+            yield file
+
+
+def write_grid(rows: Iterable[Dict[str, Any]], stream: TextIO, max_rows: Optional[int] = GRID_MAX_ROWS,
+               **options: Any) -> int:
+    # tabulate меряет каждую ячейку до вывода, поэтому в таблицу попадают только первые max_rows строк.
+    # Дочитывается одна лишняя — её хватает, чтобы понять, что результат обрезан, не проходя остаток
+    from tabulate import tabulate
+
+    rows = iter(rows)
+    shown = [as_dict(row) for row in (islice(rows, max_rows + 1) if max_rows else rows)]
+    truncated = bool(max_rows) and len(shown) > max_rows
+    if truncated:
+        shown.pop()
+    if not shown:
+        stream.write("No matching records found\n")
+    else:
+        stream.write(tabulate(shown, headers="keys", tablefmt="grid", **options))
+        stream.write('\n')
+    if truncated:
+        stream.write(f"Showing first {max_rows} rows; "
+                     "use --max-rows 0 or --output-format csv|tsv|jsonl|binary for the full result\n")
+    return len(shown)
+
+
+def write_rows(rows: Iterable[Dict[str, Any]], output_format: str, stream: Any) -> int:
+    return WRITERS[output_format](rows, stream)
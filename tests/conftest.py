@@ -1,9 +1,25 @@
+from argparse import Namespace
+
 import pytest
 
 
+def query_args(file, **kwargs):
+    # Аргументы командной строки для process_csv/run_pipeline: всё, что не задано, — как без флага
+    values = dict(file=file, where=None, order_by=None, aggregate=None, group_by=None, engine="python", workers=1)
+    values.update(kwargs)
+    return Namespace(**values)
+
+
 @pytest.fixture(scope="session")
 def sample_data():
     return [
         {"name": "Test1", "value": "10"},
         {"name": "Test2", "value": "20"}
-    ]
\ No newline at end of file
+    ]
+
+
+@pytest.fixture(autouse=True)
+def isolated_cache_dir(tmp_path, monkeypatch):
+    cache_dir = tmp_path / "cache"
+    monkeypatch.setenv("CSV_PROCESSOR_CACHE_DIR", str(cache_dir))
+    return cache_dir
@@ -0,0 +1,49 @@
+import random
+import statistics
+import pytest
+from src.aggregates import Accumulator, QuantileSketch, exact_quantile
+
+
+def test_welford_matches_statistics():
+    values = [random.Random(1).uniform(-1e6, 1e6) + 1e9 for _ in range(5000)]
+    accumulator = Accumulator(["stddev"]).update(values)
+
+    assert accumulator.result("stddev") == pytest.approx(statistics.stdev(values), rel=1e-9)
+    assert Accumulator(["variance"]).update([5]).result("variance") == 0.0
+
+
+def test_merge_matches_single_pass():
+    values = list(range(1000))
+    functions = ["variance", "p90"]
+    whole = Accumulator(functions).update(values)
+    merged = Accumulator(functions).update(values[:300]).merge(Accumulator(functions).update(values[300:]))
+
+    for func_name in ["sum", "count", "min", "max", "p90"]:
+        assert merged.result(func_name) == whole.result(func_name)
+    assert merged.result("variance") == pytest.approx(whole.result("variance"))
+
+
+def test_sketch_is_bounded_and_accurate():
+    rng = random.Random(7)
+    values = [rng.gauss(0, 1) for _ in range(200_000)]
+    sketch = QuantileSketch(compression=100)
+    for value in values:
+        sketch.add(value)
+
+    assert not sketch.exact
+    assert len(sketch.means) + len(sketch.buffer) <= 100 * 50 + 200
+    for q in [0.01, 0.5, 0.99]:
+        approx = sketch.quantile(q, min(values), max(values))
+        rank = sum(value <= approx for value in values) / len(values)
+        assert rank == pytest.approx(q, abs=0.005)
+
+
+def test_sketch_is_exact_for_small_inputs():
+    values = [7, 1, 3, 9]
+    sketch = QuantileSketch()
+    for value in values:
+        sketch.add(value)
+
+    assert sketch.exact
+    assert sketch.quantile(0.5, 1, 9) == exact_quantile(values, 0.5) == 5.0
+    assert exact_quantile(values, 0.25) == 2.5
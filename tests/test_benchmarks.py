@@ -0,0 +1,33 @@
+import pytest
+from benchmarks.datagen import ColumnSpec, generate
+from benchmarks.suite import compare
+from src.csv_processor import read_csv
+
+
+def test_generator_is_deterministic(tmp_path):
+    columns = [ColumnSpec.parse("brand:str:card=3:width=5"), ColumnSpec.parse("price:int:low=1:high=9"),
+               ColumnSpec.parse("rating:float:low=1:high=5")]
+    first, second = tmp_path / "a.csv", tmp_path / "b.csv"
+    generate(str(first), 500, columns, seed=7)
+    generate(str(second), 500, columns, seed=7)
+
+    assert first.read_bytes() == second.read_bytes()
+    rows = read_csv(str(first))
+    assert len(rows) == 500
+    assert len({row["brand"] for row in rows}) == 3
+    assert all(len(row["brand"]) == 5 and 1 <= int(row["price"]) <= 9 for row in rows)
+
+    with pytest.raises(ValueError):
+        ColumnSpec.parse("price:decimal")
+
+
+def test_compare_reports_regressions():
+    baseline = {"results": [{"case": "read_csv", "rows": 10, "seconds": 1.0},
+                            {"case": "apply_sort", "rows": 10, "seconds": 1.0}]}
+    results = [{"case": "read_csv", "rows": 10, "seconds": 1.05},
+               {"case": "apply_sort", "rows": 10, "seconds": 1.5},
+               {"case": "main", "rows": 10, "seconds": 9.0}]
+
+    regressions = compare(results, baseline, threshold=0.1)
+    assert len(regressions) == 1 and regressions[0].startswith("apply_sort @ 10 rows")
+    assert results[0]["baseline_ratio"] == pytest.approx(1.05)
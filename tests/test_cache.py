@@ -0,0 +1,87 @@
+import os
+import pytest
+from src.cache import TableCache, load_table, fingerprint
+from src.csv_processor import read_csv, apply_filter, aggregate_data, apply_sort
+from src.table import read_table
+
+
+@pytest.fixture
+def mixed_csv(tmp_path):
+    path = tmp_path / "mixed.csv"
+    path.write_text(
+        "name,qty,score,code\n"
+        "\"multi\nline\",1,4.50,7\n"
+        "b,2,5,x\n"
+        "c, 3,1e2,\n"
+        "d,4,0.25,8\n",
+        encoding="utf-8",
+    )
+    return str(path)
+
+
+def test_cache_roundtrip(mixed_csv, isolated_cache_dir):
+    cache = TableCache()
+    first = load_table(mixed_csv, cache=cache)
+    assert os.listdir(isolated_cache_dir)
+
+    cached = cache.load(mixed_csv, fingerprint(mixed_csv))
+    assert cached is not None
+    assert isinstance(cached.columns["qty"].data, memoryview)
+    assert list(cached) == list(first) == read_csv(mixed_csv)
+
+    rows = read_csv(mixed_csv)
+    assert list(apply_filter(cached, "score>1")) == apply_filter(rows, "score>1")
+    assert list(apply_sort(cached, "qty=desc")) == apply_sort(rows, "qty=desc")
+    assert aggregate_data(cached, "score=avg") == aggregate_data(rows, "score=avg")
+
+
+def test_cache_invalidated_on_change(mixed_csv):
+    cache = TableCache()
+    load_table(mixed_csv, cache=cache)
+
+    with open(mixed_csv, "a", encoding="utf-8") as f:
+        f.write("e,5,1.5,9\n")
+
+    assert cache.load(mixed_csv, fingerprint(mixed_csv)) is None
+    assert len(load_table(mixed_csv, cache=cache)) == 5
+    assert len(cache.load(mixed_csv, fingerprint(mixed_csv))) == 5
+
+
+def test_cache_lru_eviction(tmp_path, mixed_csv):
+    cache = TableCache(directory=str(tmp_path / "small"), max_bytes=1)
+    other = tmp_path / "other.csv"
+    other.write_text("a\n1\n")
+
+    load_table(mixed_csv, cache=cache)
+    load_table(str(other), cache=cache)
+
+    assert os.listdir(cache.directory) == [os.path.basename(cache.entry_path(str(other)))]
+
+
+def test_no_cache_and_rebuild(mixed_csv, isolated_cache_dir):
+    assert list(load_table(mixed_csv, use_cache=False)) == list(read_table(mixed_csv))
+    assert not isolated_cache_dir.exists()
+
+    cache = TableCache()
+    load_table(mixed_csv, cache=cache)
+    before = os.stat(cache.entry_path(mixed_csv)).st_ino
+    load_table(mixed_csv, cache=cache, rebuild=True)
+    assert os.stat(cache.entry_path(mixed_csv)).st_ino != before
+
+
+def test_python_engine_reads_cached_table(mixed_csv, isolated_cache_dir, monkeypatch):
+    from argparse import Namespace
+    from src import csv_processor
+    from src.csv_processor import process_csv
+
+    args = Namespace(file=mixed_csv, where="qty>1", order_by="score=desc", aggregate=None)
+    expected = apply_sort(apply_filter(read_csv(mixed_csv), "qty>1"), "score=desc")
+    assert process_csv(args) == expected
+    assert os.listdir(isolated_cache_dir)
+
+    # Повторный запуск не разбирает CSV: строки берутся из таблицы в кэше
+    def fail(*args, **kwargs):
+        raise AssertionError("CSV parsed again")
+    monkeypatch.setattr(csv_processor, "iter_csv", fail)
+    assert process_csv(args) == expected
+    assert process_csv(Namespace(file=mixed_csv, where=None, order_by=None, aggregate="score=sum")) == 109.75
@@ -0,0 +1,87 @@
+import bz2
+import gzip
+import lzma
+import struct
+import zlib
+from unittest.mock import MagicMock
+
+import pytest
+from src.cli import validate_args
+from src.compression import bgzf_blocks, compression_of, open_text
+from src.csv_processor import read_csv, process_csv
+from src.exceptions import FileValidationError
+from tests.conftest import query_args
+
+
+def _write_bgzf(path, data, block_size):
+    with open(path, "wb") as f:
+        for start in range(0, len(data), block_size):
+            block = data[start:start + block_size]
+            compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+            payload = compressor.compress(block) + compressor.flush()
+            header = struct.pack("<4sIBBH2sHH", b"\x1f\x8b\x08\x04", 0, 0, 255, 6, b"BC", 2, 25 + len(payload))
+            f.write(header + payload + struct.pack("<II", zlib.crc32(block), len(block)))
+
+
+@pytest.fixture
+def products(tmp_path):
+    lines = ["name,brand,price"] + [f'"item, {i}",brand{i % 5},{i % 100}' for i in range(2000)]
+    text = "\n".join(lines) + "\n"
+    path = tmp_path / "products.csv"
+    path.write_text(text, encoding="utf-8")
+    return str(path), text.encode("utf-8")
+
+
+@pytest.mark.parametrize("suffix, compress", [
+    (".csv.gz", gzip.compress), (".csv.bz2", bz2.compress), (".csv.xz", lzma.compress),
+])
+def test_compressed_input_matches_plain(products, tmp_path, suffix, compress):
+    plain, data = products
+    path = str(tmp_path / f"products{suffix}")
+    with open(path, "wb") as f:
+        f.write(compress(data))
+
+    assert read_csv(path) == read_csv(plain)
+    for kwargs in [dict(where="price>90", order_by="price=desc"), dict(aggregate="price=avg"),
+                   dict(group_by="brand", aggregate=["price=sum"]), dict(where="brand=brand1", workers=3)]:
+        assert process_csv(query_args(path, **kwargs)) == process_csv(query_args(plain, **kwargs))
+    assert process_csv(query_args(path, engine="columnar", aggregate="price=max", no_cache=True)) == 99
+
+
+def test_compression_detected_by_magic_bytes(products, tmp_path):
+    _, data = products
+    path = tmp_path / "export.csv"
+    path.write_bytes(gzip.compress(data))
+
+    assert compression_of(str(path)) == "gzip"
+    assert compression_of(products[0]) is None
+    with open_text(str(path)) as f:
+        assert f.readline() == "name,brand,price\n"
+
+
+def test_bgzf_blocks_decompress_in_parallel(products, tmp_path, monkeypatch):
+    plain, data = products
+    path = str(tmp_path / "products.csv.bgz")
+    # Блоки режут записи посередине: граница блока не совпадает с границей строки
+    _write_bgzf(path, data, 997)
+
+    blocks = bgzf_blocks(path)
+    assert len(blocks) == -(-len(data) // 997)
+    assert bgzf_blocks(plain) is None
+
+    import src.compression as compression
+    monkeypatch.setattr(compression, "BATCH_SIZE", 4096)
+    with open_text(path, workers=4, newline="") as f:
+        assert f.read().encode("utf-8") == data
+    assert process_csv(query_args(path, where="price<5", workers=4)) == process_csv(query_args(plain, where="price<5"))
+
+
+def test_cli_accepts_compressed_csv(products, tmp_path):
+    path = tmp_path / "products.csv.gz"
+    path.write_bytes(gzip.compress(products[1]))
+    validate_args(MagicMock(file=str(path), where=None, aggregate=None, order_by=None, schema=None))
+
+    other = tmp_path / "products.txt.gz"
+    other.write_bytes(b"")
+    with pytest.raises(FileValidationError):
+        validate_args(MagicMock(file=str(other), where=None, aggregate=None, order_by=None, schema=None))
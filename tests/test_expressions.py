@@ -0,0 +1,100 @@
+import pytest
+from src.csv_processor import read_csv, apply_filter, iter_csv, iter_filter
+from src.exceptions import ColumnNotFoundError, FilterError
+from src.expressions import And, Comparison, Membership, Not, Or, parse_expression
+from src.table import read_table
+
+
+@pytest.fixture
+def sample_csv_path():
+    return "tests/test_data/products.csv"
+
+
+EXPRESSIONS = [
+    "brand=apple AND price>500",
+    "brand IN (apple, Xiaomi) and not rating<4.5",
+    "price BETWEEN 299 AND 799 OR brand = 'samsung'",
+    "(brand=apple OR brand=samsung) AND NOT (price>900 OR rating<=4.1)",
+    "brand NOT IN ('xiaomi') AND price NOT BETWEEN 500 AND 900",
+    "name IN ('iphone 14', 'galaxy s23 ultra') OR price IN (149, 1199)",
+]
+
+
+def _expected(rows, predicate):
+    return [row for row in rows if predicate(row)]
+
+
+def test_parse_expression():
+    expression = parse_expression("brand in (apple, 'a, b') and (price between 1 and 2 or not rating>4)")
+
+    assert isinstance(expression, And)
+    membership, nested = expression.children
+    assert isinstance(membership, Membership) and membership.values == ["apple", "a, b"]
+    assert isinstance(nested, Or)
+    assert isinstance(nested.children[0], And) and isinstance(nested.children[1], Not)
+    assert expression.columns() == ["brand", "price", "rating"]
+
+    simple = parse_expression("name=iphone 15 pro")
+    assert isinstance(simple, Comparison) and simple.value == "iphone 15 pro"
+    assert parse_expression("name = galaxy s23 AND price>1").children[0].value == "galaxy s23"
+
+    for invalid in ["brand IN (apple", "price BETWEEN 1 OR 2", "brand=apple AND", "(price>1", "brand apple OR x=1"]:
+        with pytest.raises(FilterError):
+            parse_expression(invalid)
+
+
+def test_keywords_and_parentheses_inside_values():
+    rows = [{"origin": "Made in China", "name": "thing (old)"}, {"origin": "or else", "name": "thing"},
+            {"origin": "made in usa", "name": "black and white"}]
+    for condition, expected in [
+        ("origin=Made in China", [rows[0]]),
+        ("origin=or else", [rows[1]]),
+        ("origin!=made in usa", rows[:2]),
+        ("name=thing (old)", [rows[0]]),
+        ("name = black and white", [rows[2]]),
+        ("origin=not in stock", []),
+    ]:
+        assert isinstance(parse_expression(condition), Comparison)
+        assert apply_filter(rows, condition) == expected
+
+    # Ключевое слово после полного условия по-прежнему связывает условия
+    assert apply_filter(rows, "origin=made in usa OR name=thing") == rows[1:]
+    assert isinstance(parse_expression("origin=Made in China AND name!=thing"), And)
+
+
+def test_selective_clauses_run_first():
+    expression = parse_expression("rating!=4.1 AND name>a AND brand=apple")
+    assert [child.columns()[0] for child in expression.ordered()] == ["brand", "name", "rating"]
+
+    calls = []
+    predicate = parse_expression("rating!=4.1 AND brand=apple").compile()
+    rows = [{"brand": "xiaomi", "rating": "4.2"}, {"brand": "apple", "rating": "x"}]
+    with pytest.raises(FilterError):
+        for row in rows:
+            calls.append(predicate(row))
+    assert calls == [False]
+
+
+def test_expressions_match_across_engines(sample_csv_path):
+    rows = read_csv(sample_csv_path)
+    table = read_table(sample_csv_path)
+    expected = {
+        EXPRESSIONS[0]: lambda r: r["brand"] == "apple" and int(r["price"]) > 500,
+        EXPRESSIONS[1]: lambda r: r["brand"] in ("apple", "xiaomi") and float(r["rating"]) >= 4.5,
+        EXPRESSIONS[2]: lambda r: 299 <= int(r["price"]) <= 799 or r["brand"] == "samsung",
+        EXPRESSIONS[3]: lambda r: r["brand"] != "xiaomi" and int(r["price"]) <= 900 and float(r["rating"]) > 4.1,
+        EXPRESSIONS[4]: lambda r: r["brand"] != "xiaomi" and not 500 <= int(r["price"]) <= 900,
+        EXPRESSIONS[5]: lambda r: r["name"] in ("iphone 14", "galaxy s23 ultra") or r["price"] in ("149", "1199"),
+    }
+
+    for condition, predicate in expected.items():
+        result = _expected(rows, predicate)
+        assert result
+        assert apply_filter(rows, condition) == result
+        assert list(iter_filter(iter_csv(sample_csv_path), condition)) == result
+        assert list(apply_filter(table, condition)) == result
+
+    with pytest.raises(ColumnNotFoundError):
+        apply_filter(rows, "brand=apple AND weight>1")
+    with pytest.raises(ColumnNotFoundError):
+        apply_filter(table, "brand=apple OR weight>1")
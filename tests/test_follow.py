@@ -0,0 +1,134 @@
+import io
+import json
+import os
+from argparse import Namespace
+
+import pytest
+from src.exceptions import ArgumentError, FilterError, TypeConversionError
+from src.follow import Follower, follow, split_records
+
+
+def _append(path, text):
+    with open(path, "a", encoding="utf-8", newline="") as f:
+        f.write(text)
+
+
+def test_split_records_keeps_partial_tail():
+    data = b'a,b\n1,"x\ny"\n2,3\n4,"open\n5,'
+    records, consumed = split_records(data)
+    assert records == [b'a,b\n', b'1,"x\ny"\n', b'2,3\n']
+    assert data[consumed:] == b'4,"open\n5,'
+
+
+def test_follow_emits_only_new_matching_rows(tmp_path):
+    path = tmp_path / "events.csv"
+    path.write_text("user,amount\nann,5\nbob,50\n", encoding="utf-8")
+    follower = Follower(str(path), where="amount>10", checkpoint=str(tmp_path / "events.checkpoint"))
+
+    assert follower.poll()[0] == [{"user": "bob", "amount": "50"}]
+    assert follower.poll() == ([], False)
+
+    _append(path, "cid,70\ndan,1")
+    assert follower.poll()[0] == [{"user": "cid", "amount": "70"}]
+    _append(path, "00\n")
+    assert follower.poll()[0] == [{"user": "dan", "amount": "100"}]
+    follower.close()
+
+    # Новый процесс продолжает с сохранённого смещения
+    _append(path, "eve,20\n")
+    resumed = Follower(str(path), where="amount>10", checkpoint=str(tmp_path / "events.checkpoint"))
+    assert resumed.poll()[0] == [{"user": "eve", "amount": "20"}]
+    resumed.close()
+
+
+def test_follow_pads_short_lines(tmp_path):
+    path = tmp_path / "events.csv"
+    path.write_text("user,amount,region\nann,5,eu\n", encoding="utf-8")
+    follower = Follower(str(path), where="amount>3")
+    strict = Follower(str(path), where="region=eu")
+    counter = Follower(str(path), aggregate=["amount=count"], group_by="region")
+    assert follower.poll()[0] == [{"user": "ann", "amount": "5", "region": "eu"}]
+    counter.poll()
+    strict.poll()
+
+    # Недостающие поля становятся None, как у остальных читателей, а не KeyError
+    _append(path, "bob,7\ncid,1,eu,extra\n")
+    assert follower.poll()[0] == [{"user": "bob", "amount": "7", "region": None}]
+    with pytest.raises(FilterError):
+        strict.poll()
+    assert counter.poll()[0] == [{"region": "eu", "amount (count)": 2},
+                                 {"region": None, "amount (count)": 1}]
+    follower.close()
+    strict.close()
+    counter.close()
+
+
+def test_follow_keeps_column_types(tmp_path):
+    path = tmp_path / "events.csv"
+    checkpoint = str(tmp_path / "typed.checkpoint")
+    path.write_text("user,amount\nann,5\n", encoding="utf-8")
+    follower = Follower(str(path), where="amount>3", checkpoint=checkpoint)
+    assert follower.poll()[0] == [{"user": "ann", "amount": "5"}]
+    follower.close()
+
+    # Типы выведены по первым строкам и сохранены в checkpoint: пустая ячейка — None, текст в int-колонке — ошибка
+    _append(path, "bob,\ncid,7\n")
+    resumed = Follower(str(path), where="amount>3", checkpoint=checkpoint)
+    assert resumed.poll()[0] == [{"user": "cid", "amount": "7"}]
+    _append(path, "dan,many\n")
+    with pytest.raises(TypeConversionError):
+        resumed.poll()
+    resumed.close()
+
+
+def test_follow_updates_aggregates_across_rotation(tmp_path):
+    path = tmp_path / "events.csv"
+    checkpoint = str(tmp_path / "agg.checkpoint")
+    path.write_text("user,amount\nann,5\nbob,50\n", encoding="utf-8")
+
+    follower = Follower(str(path), aggregate=["amount=sum", "amount=count"], group_by="user", checkpoint=checkpoint)
+    assert follower.poll()[0] == [{"user": "ann", "amount (sum)": 5, "amount (count)": 1},
+                                  {"user": "bob", "amount (sum)": 50, "amount (count)": 1}]
+    follower.close()
+
+    # Хвост старого файла дочитывается, затем новый файл читается с начала, суммы продолжаются
+    restored = Follower(str(path), aggregate=["amount=sum", "amount=count"], group_by="user", checkpoint=checkpoint)
+    assert restored.poll() == ([], False)
+    _append(path, "ann,1\n")
+    os.rename(path, tmp_path / "events.csv.1")
+    path.write_text("user,amount\nbob,2\n", encoding="utf-8")
+    assert restored.poll()[0] == [{"user": "ann", "amount (sum)": 6, "amount (count)": 2},
+                                  {"user": "bob", "amount (sum)": 52, "amount (count)": 2}]
+
+    # Обрезанный на месте файл (copytruncate) тоже читается заново
+    path.write_text("user,amount\n", encoding="utf-8")
+    _append(path, "cid,3\n")
+    assert restored.poll()[0][-1] == {"user": "cid", "amount (sum)": 3, "amount (count)": 1}
+
+    # Другой заголовок — другие данные, состояние начинается заново
+    restored.close()
+    path.write_text("amount,user\n7,zed\n", encoding="utf-8")
+    fresh = Follower(str(path), aggregate=["amount=sum", "amount=count"], group_by="user", checkpoint=checkpoint)
+    assert fresh.poll()[0] == [{"user": "zed", "amount (sum)": 7, "amount (count)": 1}]
+    fresh.close()
+
+
+def test_follow_writes_batches(tmp_path):
+    path = tmp_path / "events.csv"
+    path.write_text("user,amount\nann,5\n", encoding="utf-8")
+    args = Namespace(file=str(path), where=None, order_by=None, aggregate=None, limit=None,
+                     output_format="csv", checkpoint=str(tmp_path / "c"))
+
+    appended = iter(["bob,6\n", "cid,7\n"])
+    stream = io.StringIO()
+    follow(args, stream, interval=0, polls=3, sleep=lambda _: _append(path, next(appended)))
+    assert stream.getvalue().splitlines() == ["user,amount", "ann,5", "bob,6", "cid,7"]
+
+    args.output_format, args.aggregate, args.checkpoint = "jsonl", ["amount=max"], str(tmp_path / "d")
+    stream = io.StringIO()
+    follow(args, stream, polls=1)
+    assert json.loads(stream.getvalue()) == {"amount (maximum)": 7}
+
+    args.order_by = "amount=desc"
+    with pytest.raises(ArgumentError):
+        follow(args, stream, polls=1)
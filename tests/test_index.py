@@ -0,0 +1,61 @@
+import os
+import pytest
+from src.csv_processor import process_csv
+from src.exceptions import ColumnNotFoundError
+from src.index import build_index, load_index, indexed_rows
+from tests.conftest import query_args
+
+
+@pytest.fixture
+def catalog_csv(tmp_path):
+    path = tmp_path / "catalog.csv"
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        f.write("name,brand,price,rating\n")
+        for i in range(300):
+            name = f'"item {i}\nline, ""two"""' if i % 7 == 0 else f"item {i}"
+            brand = [" Apple", "samsung", "xiaomi", "lg"][i % 4]
+            f.write(f"{name},{brand},{i * 37 % 1000},{(i % 50) / 10}\n")
+        f.write("\n")
+    return str(path)
+
+
+def test_index_matches_full_scan(catalog_csv):
+    conditions = [
+        "brand=apple", "brand!=APPLE", "price>500", "price<=37", "price=999", "price!=74",
+        "brand IN (apple, lg)", "price IN (0, 37, 1000)", "brand=samsung AND rating>=4",
+        "price BETWEEN 100 AND 200", "brand=nokia",
+    ]
+    expected = {condition: process_csv(query_args(catalog_csv, where=condition)) for condition in conditions}
+
+    build_index(catalog_csv, "brand")
+    build_index(catalog_csv, "price")
+    assert os.path.exists(catalog_csv + ".brand.idx")
+
+    for condition in conditions:
+        assert indexed_rows(catalog_csv, condition) is not None
+        assert process_csv(query_args(catalog_csv, where=condition)) == expected[condition]
+
+
+def test_index_falls_back_when_it_cannot_answer(catalog_csv):
+    build_index(catalog_csv, "name")
+    assert load_index(catalog_csv, "name").numeric is False
+    assert indexed_rows(catalog_csv, "name>5") is None
+    assert indexed_rows(catalog_csv, "price>5 OR name=x") is None
+
+    with pytest.raises(ColumnNotFoundError):
+        process_csv(query_args(catalog_csv, where="name=nothing AND weight>1"))
+    with pytest.raises(ColumnNotFoundError):
+        build_index(catalog_csv, "weight")
+
+
+def test_stale_index_is_ignored(catalog_csv):
+    build_index(catalog_csv, "brand")
+    with open(catalog_csv, "a", encoding="utf-8") as f:
+        f.write("extra,apple,1,1.0\n")
+
+    assert load_index(catalog_csv, "brand") is None
+    rows = process_csv(query_args(catalog_csv, where="brand=apple"))
+    assert rows[-1]["name"] == "extra"
+
+    build_index(catalog_csv, "brand")
+    assert process_csv(query_args(catalog_csv, where="brand=apple")) == rows
@@ -30,3 +30,55 @@ def test_cli_aggregate(capsys, monkeypatch):
 
     captured = capsys.readouterr()
     assert "200.00" in captured.out
+
+
+@pytest.mark.parametrize("engine", ["python", "columnar"])
+def test_cli_engine(capsys, monkeypatch, engine):
+    monkeypatch.setattr(sys, 'argv', [
+        'main.py',
+        '--file', 'tests/test_data/products.csv',
+        '--where', 'brand=apple',
+        '--aggregate', 'price=min',
+        '--engine', engine
+    ])
+
+    from main import main
+    main()
+
+    captured = capsys.readouterr()
+    assert "429" in captured.out
+
+
+def test_cli_group_by(capsys, monkeypatch):
+    monkeypatch.setattr(sys, 'argv', [
+        'main.py',
+        '--file', 'tests/test_data/products.csv',
+        '--group-by', 'brand',
+        '--aggregate', 'price=avg',
+        '--aggregate', 'rating=max'
+    ])
+
+    from main import main
+    main()
+
+    captured = capsys.readouterr()
+    assert "price (average)" in captured.out
+    assert "215.67" in captured.out
+
+
+def test_cli_output_format(tmp_path, monkeypatch):
+    path = tmp_path / "out.csv"
+    monkeypatch.setattr(sys, 'argv', [
+        'main.py',
+        '--file', 'tests/test_data/products.csv',
+        '--where', 'brand=apple',
+        '--output-format', 'csv',
+        '--output', str(path)
+    ])
+
+    from main import main
+    main()
+
+    lines = path.read_text().splitlines()
+    assert lines[0] == "name,brand,price,rating"
+    assert all(",apple," in line for line in lines[1:])
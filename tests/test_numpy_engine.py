@@ -0,0 +1,45 @@
+import pytest
+from src.csv_processor import read_csv, apply_filter, aggregate_data, apply_sort
+from src.exceptions import ColumnNotFoundError, FilterError
+
+np = pytest.importorskip("numpy")
+
+from src.numpy_engine import read_numpy_table, NumpyTable
+
+
+@pytest.fixture
+def sample_csv_path():
+    return "tests/test_data/products.csv"
+
+
+def test_numpy_filter_and_sort_match_rows(sample_csv_path):
+    rows = read_csv(sample_csv_path)
+    table = read_numpy_table(sample_csv_path)
+
+    for condition in ["price>500", "brand=APPLE", "brand!=apple", "rating<=4.2", "price=999",
+                      "brand IN (apple, xiaomi) AND NOT rating<4.5", "price BETWEEN 299 AND 799 OR brand=samsung",
+                      "price IN (149, 1199) OR name IN ('iphone 14')"]:
+        filtered = apply_filter(table, condition)
+        assert isinstance(filtered, NumpyTable)
+        assert list(filtered) == apply_filter(rows, condition)
+
+    for condition in ["price=desc", "rating=asc", "rating=desc", "brand=asc"]:
+        assert list(apply_sort(table, condition)) == apply_sort(rows, condition)
+
+    with pytest.raises(ColumnNotFoundError):
+        apply_filter(table, "weight>1")
+    with pytest.raises(FilterError):
+        apply_filter(table, "price>abc")
+
+
+def test_numpy_aggregates_are_exact(tmp_path):
+    path = tmp_path / "floats.csv"
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("x,n\n")
+        for i in range(5000):
+            f.write(f"{(i * 7919 % 1000) / 7},{i * 31 % 977}\n")
+
+    rows = read_csv(str(path))
+    table = read_numpy_table(str(path))
+    for operation in ["x=avg", "x=min", "x=max", "n=avg", "n=min", "n=max"]:
+        assert aggregate_data(table, operation) == aggregate_data(rows, operation)
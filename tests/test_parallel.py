@@ -0,0 +1,54 @@
+import pytest
+from src import parallel
+from src.aggregates import DEFAULT_COMPRESSION
+from src.csv_processor import read_csv, process_csv
+from src.exceptions import ColumnNotFoundError
+from tests.conftest import query_args
+
+
+@pytest.fixture
+def quoted_csv(tmp_path):
+    path = tmp_path / "quoted.csv"
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        f.write('name,brand,price,rating\n')
+        for i in range(400):
+            name = f'"item {i}\nline, ""two"""' if i % 3 == 0 else f"item {i}"
+            f.write(f"{name},brand{i % 5},{i * 37 % 1000},{(i % 50) / 10}\n")
+    return str(path)
+
+
+def test_split_file_respects_quoted_newlines(quoted_csv):
+    header, start = parallel.read_header(quoted_csv)
+    ranges = parallel.split_file(quoted_csv, start, 7)
+
+    assert header == ["name", "brand", "price", "rating"]
+    assert len(ranges) == 7
+    assert ranges[0][0] == start
+    assert all(prev[1] == nxt[0] for prev, nxt in zip(ranges, ranges[1:]))
+
+    rows = []
+    for byte_range in ranges:
+        rows.extend(parallel._scan_range(quoted_csv, header, None, None, None, DEFAULT_COMPRESSION, None, byte_range))
+    assert rows == read_csv(quoted_csv)
+
+
+def test_parallel_matches_sequential(quoted_csv, monkeypatch):
+    monkeypatch.setattr(parallel, "MIN_CHUNK_SIZE", 256)
+
+    for kwargs in [
+        dict(where="price>500"),
+        dict(where="brand=BRAND2", order_by="price=desc"),
+        dict(where="price>500", aggregate="rating=max"),
+        dict(aggregate="price=min"),
+        dict(group_by="brand", aggregate=["price=max", "rating=min"]),
+        dict(aggregate=["price=sum", "price=count", "rating=median", "rating=p10"]),
+        dict(where="price>300", group_by="brand", aggregate=["price=min"], order_by="brand=desc"),
+    ]:
+        expected = process_csv(query_args(quoted_csv, **kwargs))
+        assert process_csv(query_args(quoted_csv, workers=3, **kwargs)) == expected
+
+    avg = process_csv(query_args(quoted_csv, workers=3, aggregate="price=avg"))
+    assert avg == pytest.approx(process_csv(query_args(quoted_csv, aggregate="price=avg")))
+
+    with pytest.raises(ColumnNotFoundError):
+        process_csv(query_args(quoted_csv, workers=3, aggregate="weight=avg"))
@@ -0,0 +1,79 @@
+import os
+
+import pytest
+from src.cli import parse_args
+from src.csv_processor import process_csv
+from src.exceptions import FileValidationError
+from src.partitions import expand_inputs, partition_values, prune_partitions
+from tests.conftest import query_args
+
+
+@pytest.fixture
+def daily(tmp_path):
+    # Три дня продаж, в каждом файле есть колонка date
+    rows = []
+    paths = []
+    for day in range(1, 4):
+        path = tmp_path / f"sales_2024-01-0{day}.csv"
+        lines = ["date,brand,price"]
+        for i in range(30):
+            lines.append(f"2024-01-0{day},brand{i % 3},{(i * 37 + day * 11) % 100}")
+        path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+        paths.append(str(path))
+        rows.extend(lines[1:])
+    combined = tmp_path / "all.csv"
+    combined.write_text("date,brand,price\n" + "\n".join(rows) + "\n", encoding="utf-8")
+    return paths, str(combined)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_partitions_match_single_file(daily, workers):
+    paths, combined = daily
+    for kwargs in [
+        dict(where="price>50"),
+        dict(where="brand=brand1", order_by="price=desc"),
+        dict(order_by="price=asc", limit=7),
+        dict(limit=40),
+        dict(aggregate="price=avg"),
+        dict(where="price>20", aggregate=["price=sum", "price=count", "price=min", "price=median"]),
+        dict(group_by="brand", aggregate=["price=avg", "price=max"], order_by="brand=desc"),
+    ]:
+        expected = process_csv(query_args(combined, **kwargs))
+        result = process_csv(query_args(paths, workers=workers, **kwargs))
+        assert result == pytest.approx(expected) if isinstance(expected, float) else result == expected
+
+    # Дисперсия сливается по моментам частей и совпадает с точностью до округления
+    stddev = process_csv(query_args(paths, workers=workers, aggregate="price=stddev"))
+    assert stddev == pytest.approx(process_csv(query_args(combined, aggregate="price=stddev")))
+
+
+def test_partitions_pruned_by_file_name(daily, tmp_path):
+    paths, _ = daily
+    partitions = [(path, partition_values(path, r"sales_(?P<date>[\d-]+)\.csv")) for path in paths]
+    assert partitions[0][1] == {"date": "2024-01-01"}
+
+    kept = prune_partitions(partitions, "date>=2024-01-02 AND price>10")
+    assert [path for path, _ in kept] == paths[1:]
+    assert prune_partitions(partitions, "date=2024-01-01 OR price>90") == partitions
+    assert prune_partitions(partitions, "NOT date IN (2024-01-01, 2024-01-03)") == partitions[1:2]
+
+    # Значение из каталога date=... подставляется в строки файла, где такой колонки нет
+    hive = tmp_path / "date=2024-02-01"
+    hive.mkdir()
+    (hive / "part.csv").write_text("brand,price\napple,5\n", encoding="utf-8")
+    args = query_args(paths + [str(hive / "part.csv")], where="date=2024-02-01")
+    assert process_csv(args) == [{"brand": "apple", "price": "5", "date": "2024-02-01"}]
+
+
+def test_globs_expand_on_the_command_line(daily, tmp_path):
+    paths, combined = daily
+    pattern = os.path.join(str(tmp_path), "sales_*.csv")
+    assert expand_inputs([pattern]) == paths
+    assert expand_inputs([combined]) == combined
+
+    args = parse_args(["--file", pattern, combined, "--aggregate", "price=count"])
+    assert args.file == paths + [combined]
+    assert process_csv(args) == 180
+
+    with pytest.raises(FileValidationError):
+        parse_args(["--file", os.path.join(str(tmp_path), "missing_*.csv")])
@@ -1,9 +1,12 @@
 import pytest
 import os
+import sys
 from src.csv_processor import read_csv, infer_type, apply_filter, aggregate_data
 from src.exceptions import ColumnNotFoundError, FilterError, AggregationError, CSVProcessingError, FileValidationError
-from src.operations import OPERATIONS_REGISTRY, register_operation
+from src.operations import OPERATIONS_REGISTRY, Batch, BatchOperation, as_batch_operation, register_operation, \
+    run_batches
 from src.cli import validate_args
+from src.rows import Row
 from unittest.mock import MagicMock
 
 
@@ -36,6 +39,25 @@ def test_read_csv(sample_csv_path):
     }
 
 
+def test_rows_share_header(tmp_path):
+    wide = tmp_path / "wide.csv"
+    header = [f"c{i}" for i in range(20)]
+    wide.write_text(",".join(header) + "\n" + "\n".join(",".join(str(r * i) for i in range(20)) for r in range(50))
+                    + "\n1,2\n", encoding="utf-8")
+    data = read_csv(str(wide))
+
+    # Одна карта позиций на весь файл, а строка весит меньше словаря с теми же значениями
+    assert all(isinstance(row, Row) and row.index is data[0].index for row in data)
+    assert sys.getsizeof(data[1]) < sys.getsizeof(dict(data[1])) * 0.7
+    assert data[2]["c3"] == "6" and list(data[2]) == header
+    assert data[2] == {col: str(2 * i) for i, col in enumerate(header)}
+    # Недостающие поля, как у csv.DictReader, — None
+    assert data[-1]["c1"] == "2" and data[-1]["c19"] is None
+
+    assert [row["c1"] for row in apply_filter(data, "c1>45 AND c2<98")] == ["46", "47", "48"]
+    assert aggregate_data(data[:-1], "c2=max") == 98
+
+
 def test_infer_type():
     assert infer_type("100") == 100
     assert infer_type("3.14") == 3.14
@@ -178,6 +200,50 @@ def test_operation_registration():
     assert len(OPERATIONS_REGISTRY) == initial_count + 1
 
 
+class Discount(BatchOperation):
+    def columns(self, percent):
+        return ["price"]
+
+    def process_batches(self, batches, percent):
+        for batch in batches:
+            i = batch.index("price")
+            yield Batch(batch.columns + ["discounted"],
+                        [row + (int(row[i]) * (100 - int(percent)) // 100,) for row in batch.rows])
+
+
+def test_batch_operations_chain_without_lists(sample_csv_path):
+    from itertools import count, islice
+    from src.query import Query
+
+    register_operation("discount", Discount())
+    query = Query(sample_csv_path).where("brand=apple").apply("discount", "10")
+    assert [row["discounted"] for row in query.order_by("price=desc").limit(2).collect()] == [899, 719]
+    assert query.aggregate("discounted=max").collect() == 899
+    assert "apply      batches of" in query.explain() and "(streaming)" in query.explain()
+
+    # Потоковые операции не ждут конца входа: бесконечный поток читается пакетами
+    rows = ({"n": str(i)} for i in count())
+    chained = run_batches(rows, [(OPERATIONS_REGISTRY["where"], "n>5"), (Discount(), "0")])
+    with pytest.raises(ColumnNotFoundError):
+        next(chained)
+    rows = ({"n": str(i), "price": str(i)} for i in count())
+    chained = run_batches(rows, [(OPERATIONS_REGISTRY["where"], "n>5"), (Discount(), "50")])
+    assert [row["discounted"] for row in islice(chained, 3)] == [3, 3, 4]
+
+    with pytest.raises(CSVProcessingError):
+        run_batches(read_csv(sample_csv_path), [(OPERATIONS_REGISTRY["aggregate"], "price=max"), (Discount(), "0")])
+
+
+def test_list_operations_run_through_adapter(sample_csv_path):
+    from src.query import Query
+
+    register_operation("test", TestOperation())
+    assert as_batch_operation(TestOperation()).streaming is False
+    assert Query(sample_csv_path).apply("test").collect() == [{"modified": True}]
+    assert run_batches(read_csv(sample_csv_path), [(OPERATIONS_REGISTRY["where"], "price>500"),
+                                                  (OPERATIONS_REGISTRY["aggregate"], "price=min")]) == 599
+
+
 def test_sort_operation(sample_csv_path):
     from src.csv_processor import read_csv
     data = read_csv(sample_csv_path)
@@ -250,10 +316,14 @@ def test_aggregate_validation(tmp_path):
         assert "Invalid aggregation format" in str(excinfo.value) or "Unsupported aggregation function" in str(
             excinfo.value)
 
-    args = MagicMock(file=str(valid_file), where=None, aggregate="price=sum", order_by=None)
-    with pytest.raises(ValueError) as excinfo:
-        validate_args(args)
-    assert "Unsupported aggregation function" in str(excinfo.value)
+    for func in ["sum", "count", "stddev", "median", "p99.9"]:
+        validate_args(MagicMock(file=str(valid_file), where=None, aggregate=f"price={func}", order_by=None))
+
+    for func in ["mode", "p101"]:
+        args = MagicMock(file=str(valid_file), where=None, aggregate=f"price={func}", order_by=None)
+        with pytest.raises(ValueError) as excinfo:
+            validate_args(args)
+        assert "Unsupported aggregation function" in str(excinfo.value)
 
 
 def test_sort_validation(tmp_path):
@@ -269,3 +339,113 @@ def test_sort_validation(tmp_path):
         with pytest.raises(ValueError) as excinfo:
             validate_args(args)
         assert "Invalid sort format" in str(excinfo.value) or "Unsupported sort direction" in str(excinfo.value)
+
+
+def _write_products(path, rows):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("name,brand,price,rating\n")
+        for i in range(rows):
+            f.write(f"item {i},brand{i % 7},{i % 1000},{(i % 50) / 10}\n")
+
+
+def test_process_csv_streams_filter_and_aggregate(tmp_path):
+    import tracemalloc
+    from argparse import Namespace
+    from src.csv_processor import process_csv
+
+    path = tmp_path / "big.csv"
+    _write_products(path, 20000)
+    args = Namespace(file=str(path), where="price>500", order_by=None, aggregate="rating=max")
+    # Первый запуск строит кэш таблицы; дальше строки идут потоком из кэша, а с --no-cache — из CSV
+    assert process_csv(args) == 4.9
+
+    for no_cache in (False, True):
+        args.no_cache = no_cache
+        tracemalloc.start()
+        try:
+            result = process_csv(args)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        assert result == 4.9
+        assert peak < os.path.getsize(path) / 4
+
+
+def test_iter_filter_is_lazy(sample_csv_path):
+    from src.csv_processor import iter_csv, iter_filter
+
+    rows = iter_filter(iter_csv(sample_csv_path), "brand=samsung")
+    assert next(rows)["name"] == "galaxy s23 ultra"
+    assert aggregate_data(iter_filter(iter_csv(sample_csv_path), "brand=apple"), "price=min") == 429
+
+
+def test_compile_filter(sample_csv_path):
+    from src.csv_processor import compile_filter
+
+    data = read_csv(sample_csv_path)
+    columns = data[0].keys()
+
+    predicate = compile_filter("price>500", columns)
+    assert sum(1 for row in data if predicate(row)) == 5
+
+    predicate = compile_filter("brand=APPLE", columns)
+    assert [row["name"] for row in data if predicate(row)][:2] == ["iphone 15 pro", "iphone 14"]
+
+    predicate = compile_filter("name>galaxy", columns)
+    assert predicate({"name": "iphone 14"})
+
+    with pytest.raises(ColumnNotFoundError):
+        compile_filter("weight>1", columns)
+
+    with pytest.raises(FilterError):
+        compile_filter("price=500", columns)({"price": "n/a"})
+
+    # Целые сравниваются точно, без округления до float
+    predicate = compile_filter("a=9007199254740992", ["a"])
+    assert not predicate({"a": "9007199254740993"}) and predicate({"a": "9007199254740992"})
+    assert compile_filter("a>1", ["a"])({"a": "1.5"})
+
+
+def test_group_aggregate(sample_csv_path):
+    from src.csv_processor import group_aggregate, iter_csv
+
+    result = group_aggregate(iter_csv(sample_csv_path), "brand", ["price=max", "rating=avg", "price=min"])
+    assert [row["brand"] for row in result] == ["apple", "samsung", "xiaomi"]
+    assert result[0] == {
+        "brand": "apple",
+        "price (maximum)": 999,
+        "rating (average)": pytest.approx(4.55),
+        "price (minimum)": 429,
+    }
+    assert group_aggregate([], "brand", "price=avg") == []
+
+    with pytest.raises(ColumnNotFoundError):
+        group_aggregate(iter_csv(sample_csv_path), "color", "price=avg")
+    with pytest.raises(AggregationError):
+        group_aggregate(iter_csv(sample_csv_path), "brand", "name=avg")
+    with pytest.raises(AggregationError):
+        group_aggregate(iter_csv(sample_csv_path), "brand", "price=mode")
+
+
+def test_extended_aggregates(sample_csv_path):
+    import statistics
+    from src.csv_processor import aggregate_many, iter_csv
+
+    prices = [float(row["price"]) for row in read_csv(sample_csv_path)]
+    operations = ["price=sum", "price=count", "price=stddev", "price=variance", "price=median", "price=p0", "price=p100"]
+    result = aggregate_many(iter_csv(sample_csv_path), operations)
+
+    assert result == {
+        "price (sum)": sum(prices),
+        "price (count)": len(prices),
+        "price (stddev)": pytest.approx(statistics.stdev(prices)),
+        "price (variance)": pytest.approx(statistics.variance(prices)),
+        "price (median)": statistics.median(prices),
+        "price (p0)": min(prices),
+        "price (p100)": max(prices),
+    }
+    assert aggregate_data(read_csv(sample_csv_path), "rating=median") == pytest.approx(4.55)
+
+    with pytest.raises(AggregationError):
+        aggregate_many([], operations)
@@ -0,0 +1,73 @@
+from argparse import Namespace
+
+import pytest
+from src.csv_processor import process_csv
+from src.exceptions import ArgumentError
+from src.query import Query, Step, optimize
+from src.stats import Recorder
+
+PRODUCTS = "tests/test_data/products.csv"
+
+
+def _ops(steps):
+    return [repr(step) for step in steps]
+
+
+def test_optimizer_rewrites_plan():
+    steps, notes = optimize([
+        Step("order_by", "price=desc"), Step("where", "price>500"), Step("where", "brand=apple"),
+        Step("aggregate", ["price=max"]), Step("limit", 3),
+    ])
+    assert _ops(steps) == ["where (price>500) AND (brand=apple)", "aggregate price=max"]
+    assert len(notes) == 5
+
+    # Сортировка групп после группировки нужна и остаётся на месте
+    steps, notes = optimize([Step("aggregate", ["price=sum"], "brand"), Step("order_by", "brand=asc"),
+                             Step("limit", 2)])
+    assert _ops(steps) == ["aggregate price=sum by brand", "order_by brand=asc", "limit 2"] and not notes
+
+    # Сортировка строк перед группировкой задаёт порядок групп и тоже остаётся
+    steps, notes = optimize([Step("order_by", "price=desc"), Step("aggregate", ["price=max"], "brand")])
+    assert _ops(steps) == ["order_by price=desc", "aggregate price=max by brand"] and not notes
+
+
+def test_query_builder_matches_cli_pipeline():
+    query = Query(PRODUCTS).where("price>500").order_by("price=desc")
+    assert query.limit(2).collect() == process_csv(Namespace(file=PRODUCTS, where="price>500", order_by="price=desc",
+                                                             aggregate=None, limit=2))
+    assert len(query.collect()) == 5 and query.steps[-1].op == "order_by"
+
+    assert query.aggregate("price=min").collect() == 599
+    assert query.group_by("brand", "price=max").order_by("brand=desc").collect() == [
+        {"brand": "samsung", "price (maximum)": 1199}, {"brand": "apple", "price (maximum)": 999},
+    ]
+    for workers in (None, 2):
+        grouped = Query(PRODUCTS, workers=workers).order_by("price=desc").group_by("brand", "price=max")
+        assert [row["brand"] for row in grouped.collect()] == ["samsung", "apple", "xiaomi"]
+
+    with pytest.raises(ArgumentError):
+        Query(PRODUCTS).aggregate("price=avg").where("price>1")
+
+
+def test_sort_before_aggregate_is_not_executed():
+    recorder = Recorder()
+    result = Query(PRODUCTS).order_by("price=desc").aggregate("price=max").execute(recorder)
+    assert result == 1199
+    assert [stage.name for stage in recorder.stages] == ["read", "aggregate"]
+
+
+def test_explain_shows_physical_plan(tmp_path):
+    text = Query(PRODUCTS).where("brand=apple").order_by("rating=desc").aggregate("price=avg").explain()
+    assert "removed order_by rating=desc" in text
+    physical = text.split("Physical plan:\n")[1].splitlines()
+    # Узкий файл читается целиком: выборочное чтение колонок окупается только на широких строках
+    assert physical[0].split()[0] == "read" and "columns:" not in physical[0]
+    assert [line.split()[0] for line in physical] == ["read", "where", "aggregate"]
+
+    wide = tmp_path / "wide.csv"
+    wide.write_text(",".join(f"c{i}" for i in range(40)) + "\n" + ",".join(["1"] * 40) + "\n", encoding="utf-8")
+    text = Query(str(wide)).where("c3>0").aggregate("c7=max").explain()
+    assert "columns: c3, c7" in text.split("Physical plan:\n")[1]
+
+    text = Query(PRODUCTS, workers=2).where("price>500").order_by("price=desc").limit(3).explain()
+    assert "parallel scan" in text.split("Physical plan:")[1]
@@ -0,0 +1,85 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import src.result_cache as result_cache
+from src.result_cache import ResultCache, DiskResultCache, query_key
+from tests.conftest import query_args
+
+
+@pytest.fixture
+def products_csv(tmp_path):
+    path = tmp_path / "products.csv"
+    path.write_text("name,brand,price\niphone,apple,999\ngalaxy,samsung,1199\nredmi,xiaomi,199\n",
+                    encoding="utf-8")
+    return str(path)
+
+
+def _counting(monkeypatch):
+    calls = []
+    process_csv = result_cache.process_csv
+
+    def counted(args, recorder=None):
+        calls.append(args)
+        return process_csv(args, recorder)
+
+    monkeypatch.setattr(result_cache, "process_csv", counted)
+    return calls
+
+
+def test_query_key_is_normalized(products_csv):
+    assert query_key(query_args(products_csv, order_by="price = DESC", aggregate=" price = AVG ")) == \
+        query_key(query_args(products_csv, order_by="price=desc", aggregate=["price=avg"], workers=4))
+    assert query_key(query_args(products_csv, where="price>1")) != query_key(query_args(products_csv, where="price>2"))
+
+
+def test_counters_are_exact_under_threads(products_csv):
+    cache = ResultCache()
+    args = query_args(products_csv, aggregate="price=max")
+    threads = 8
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(lambda _: cache.get_or_compute(args, lambda: 1199), range(400)))
+    stats = cache.stats()
+    # Каждый поток промахивается не больше раза: после первого вычисления запись уже в кэше
+    assert stats["hits"] + stats["misses"] == 400 and stats["misses"] <= threads
+
+
+@pytest.mark.parametrize("make_cache", [ResultCache, DiskResultCache])
+def test_cache_hits_until_file_changes(products_csv, monkeypatch, make_cache):
+    calls = _counting(monkeypatch)
+    cache = make_cache()
+    args = query_args(products_csv, where="price>500", order_by="price=desc")
+
+    first = cache.process(args)
+    assert [row["name"] for row in first] == ["galaxy", "iphone"]
+    assert cache.process(query_args(products_csv, where=" price>500", order_by="price=DESC")) == first
+    assert cache.process(query_args(products_csv, aggregate="price=max")) == 1199
+    assert len(calls) == 2
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 2 and cache.stats()["entries"] == 2
+
+    with open(products_csv, "a", encoding="utf-8") as f:
+        f.write("pixel,google,899\n")
+    os.utime(products_csv, ns=(0, 0))
+    assert [row["name"] for row in cache.process(args)] == ["galaxy", "iphone", "pixel"]
+    assert len(calls) == 3 and cache.stats()["entries"] == 2
+
+
+def test_ttl_and_size_bound(products_csv, monkeypatch):
+    calls = _counting(monkeypatch)
+    clock = [1000.0]
+    monkeypatch.setattr(result_cache.time, "time", lambda: clock[0])
+
+    cache = DiskResultCache(ttl=10)
+    cache.process(query_args(products_csv, aggregate="price=max"))
+    clock[0] += 5
+    cache.process(query_args(products_csv, aggregate="price=max"))
+    clock[0] += 20
+    cache.process(query_args(products_csv, aggregate="price=max"))
+    assert len(calls) == 2
+
+    small = ResultCache(max_bytes=400)
+    for where in ["price>1", "price>2", "price>3"]:
+        small.process(query_args(products_csv, where=where))
+    assert small.stats()["evictions"] >= 1 and small.stats()["bytes"] <= 400
+    small.process(query_args(products_csv, where="price>3"))
+    assert small.stats()["hits"] == 1
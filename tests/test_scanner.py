@@ -0,0 +1,35 @@
+from argparse import Namespace
+from src.csv_processor import read_csv, process_csv
+from src.scanner import iter_projected
+
+
+def test_projected_rows_match_reader(tmp_path):
+    path = tmp_path / "tricky.csv"
+    path.write_bytes(
+        b'id,name,price,note\r\n'
+        b'1,"multi\r\nline, name",10,a\r\n'
+        b'\r\n'
+        b'2,plain,20,"say ""hi"""\r\n'
+        b'3,short\r\n'
+        b'4,\xd0\xbf\xd1\x80\xd0\xb8\xd0\xb2\xd0\xb5\xd1\x82,30,z\r\n'
+    )
+
+    expected = [{"note": row["note"], "name": row["name"]} for row in read_csv(str(path))]
+    assert list(iter_projected(str(path), ["note", "name"])) == expected
+    assert iter_projected(str(path), ["weight"]) is None
+
+
+def test_aggregate_reads_only_referenced_columns(tmp_path, monkeypatch):
+    path = tmp_path / "wide.csv"
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(",".join(f"c{i}" for i in range(50)) + "\n")
+        for row in range(200):
+            f.write(",".join(str(row * i % 97) for i in range(50)) + "\n")
+
+    expected = max(int(row["c7"]) for row in read_csv(str(path)) if int(row["c3"]) > 40)
+
+    import src.csv_processor as processor
+    monkeypatch.setattr(processor, "iter_csv", None)
+
+    args = Namespace(file=str(path), where="c3>40", order_by=None, aggregate="c7=max", engine="python", workers=1)
+    assert process_csv(args) == expected
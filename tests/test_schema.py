@@ -0,0 +1,177 @@
+import importlib.util
+import json
+from datetime import date
+from decimal import Decimal
+
+import pytest
+from src.cache import load_table
+from src.csv_processor import SCALAR_TYPES, process_csv, run_pipeline
+from src.exceptions import ArgumentError, CSVProcessingError, SortError, TypeConversionError
+from src.schema import ColumnType, infer_schema, cached_schema, load_schema
+from tests.conftest import query_args
+
+
+@pytest.fixture
+def typed_csv(tmp_path):
+    path = tmp_path / "typed.csv"
+    path.write_text(
+        "name,qty,price,amount,sold,active,note\n"
+        "a,3,9.5,10.10,2024-01-05,true,x\n"
+        "b,10,12,0.20,2024-02-01,False,\n"
+        "c,,100,3.30,2023-12-31,true,z\n"
+        "d,2,1e3,4.40,2024-03-15,false,1\n",
+        encoding="utf-8",
+    )
+    return str(path)
+
+
+def test_infer_schema(typed_csv):
+    schema = infer_schema(typed_csv)
+
+    assert schema == {
+        "name": ColumnType("str"),
+        "qty": ColumnType("int", nullable=True),
+        "price": ColumnType("float"),
+        "amount": ColumnType("float"),
+        "sold": ColumnType("date"),
+        "active": ColumnType("bool"),
+        "note": ColumnType("str", nullable=True),
+    }
+    assert infer_schema(typed_csv, sample=1)["note"] == ColumnType("str")
+    assert ColumnType.parse("Date?") == ColumnType("date", nullable=True)
+    with pytest.raises(ValueError):
+        ColumnType.parse("timestamp")
+
+
+def test_schema_cache_follows_file(typed_csv, isolated_cache_dir):
+    assert cached_schema(typed_csv)["qty"] == ColumnType("int", nullable=True)
+    assert list(isolated_cache_dir.glob("*.schema.json"))
+
+    with open(typed_csv, "a", encoding="utf-8") as f:
+        f.write("e,many,1,1.00,2024-04-01,true,y\n")
+    assert cached_schema(typed_csv)["qty"] == ColumnType("str", nullable=True)
+
+
+def _typed(path, **kwargs):
+    # --schema-sample 0 выводит типы по всему файлу, а не по первым строкам
+    return query_args(path, schema_sample=0, **kwargs)
+
+
+def test_column_compares_with_one_type(typed_csv):
+    assert [row["name"] for row in process_csv(_typed(typed_csv, where="qty>2"))] == ["a", "b"]
+    assert [row["name"] for row in process_csv(_typed(typed_csv, where="sold<2024-01-10"))] == ["a", "c"]
+    assert [row["name"] for row in process_csv(_typed(typed_csv, where="active=true"))] == ["a", "c"]
+    assert [row["name"] for row in process_csv(_typed(typed_csv, order_by="qty=desc"))] == ["b", "a", "d", "c"]
+    assert [row["name"] for row in process_csv(_typed(typed_csv, order_by="qty=asc", limit=2))] == ["d", "a"]
+    assert process_csv(_typed(typed_csv, aggregate="qty=sum")) == 15
+    assert process_csv(_typed(typed_csv, aggregate=["qty=count", "price=max"])) == [
+        {"qty (count)": 3, "price (maximum)": 1000.0}
+    ]
+
+
+def test_explicit_schema(typed_csv, tmp_path):
+    schema_path = tmp_path / "schema.json"
+    schema_path.write_text(json.dumps({"amount": "decimal", "price": "str"}), encoding="utf-8")
+
+    schema = load_schema(typed_csv, str(schema_path))
+    assert schema.column("amount") == ColumnType("decimal")
+    assert schema.column("sold") == ColumnType("date")
+    assert schema.converter("sold")("2024-01-05") == date(2024, 1, 5)
+
+    assert process_csv(query_args(typed_csv, aggregate="amount=sum", schema=str(schema_path))) == Decimal("18.00")
+    ordered = process_csv(query_args(typed_csv, order_by="price=asc", schema=str(schema_path)))
+    assert [row["price"] for row in ordered] == ["100", "12", "1e3", "9.5"]
+
+    schema_path.write_text('["price"]', encoding="utf-8")
+    with pytest.raises(ArgumentError):
+        load_schema(typed_csv, str(schema_path))
+
+
+def test_type_errors_are_reported_consistently(typed_csv, tmp_path):
+    schema_path = tmp_path / "schema.json"
+    schema_path.write_text(json.dumps({"note": "int?"}), encoding="utf-8")
+
+    for kwargs in [dict(where="note>1"), dict(order_by="note=asc"), dict(aggregate="note=avg"),
+                   dict(aggregate=["note=avg", "qty=sum"])]:
+        with pytest.raises(TypeConversionError) as excinfo:
+            process_csv(query_args(typed_csv, schema=str(schema_path), **kwargs))
+        assert "'x'" in str(excinfo.value) and "'note'" in str(excinfo.value)
+
+    with pytest.raises(TypeConversionError):
+        process_csv(_typed(typed_csv, where="sold>yesterday"))
+
+
+def test_same_answer_in_every_mode(tmp_path):
+    lines = [f"n{i},{i * 7 % 50},{'' if i == 5 else i % 5}" for i in range(40)]
+    path, first, second = tmp_path / "all.csv", tmp_path / "a.csv", tmp_path / "b.csv"
+    for target, chunk in [(path, lines), (first, lines[:20]), (second, lines[20:])]:
+        target.write_text("name,price,rating\n" + "\n".join(chunk) + "\n", encoding="utf-8")
+
+    modes = [dict(), dict(workers=2), dict(engine="columnar"), dict(file=[str(first), str(second)]),
+             dict(file=[str(first), str(second)], workers=2)]
+    for query in [dict(where="price>20"), dict(order_by="price=desc", limit=5), dict(aggregate="price=avg"),
+                  dict(aggregate="rating=avg"), dict(where="rating>2"), dict(group_by="rating", aggregate="price=max")]:
+        outcomes = []
+        for mode in modes:
+            args = query_args(str(path), **query)
+            vars(args).update(mode)
+            try:
+                outcomes.append(process_csv(args))
+            except CSVProcessingError as e:
+                outcomes.append(type(e))
+        assert all(outcome == outcomes[0] for outcome in outcomes), query
+
+
+def _run(args, mode):
+    # serve держит таблицу в памяти и передаёт её запросу вместо чтения файла
+    if mode == "serve":
+        result = run_pipeline(args, data=load_table(args.file))
+        return result if isinstance(result, SCALAR_TYPES) else list(result)
+    vars(args).update(mode)
+    return process_csv(args)
+
+
+def test_typed_in_every_mode(typed_csv, tmp_path):
+    # Схема выводится по умолчанию, и все режимы переводят ячейки одними конвертерами
+    lines = open(typed_csv, encoding="utf-8").read().splitlines()
+    first, second = tmp_path / "first.csv", tmp_path / "second.csv"
+    first.write_text("\n".join(lines[:3]) + "\n", encoding="utf-8")
+    second.write_text("\n".join(lines[:1] + lines[3:]) + "\n", encoding="utf-8")
+    modes = [dict(), dict(workers=2), dict(engine="columnar"), "serve", dict(file=[str(first), str(second)]),
+             dict(file=[str(first), str(second)], workers=2)]
+    if importlib.util.find_spec("numpy"):
+        modes.append(dict(engine="numpy"))
+
+    def names(rows):
+        return [row["name"] for row in rows]
+
+    expected = [
+        (dict(where="qty>2"), names, ["a", "b"]),
+        (dict(where="qty IN (2, 3)"), names, ["a", "d"]),
+        (dict(where="sold<2024-01-10 AND active=true"), names, ["a", "c"]),
+        (dict(order_by="qty=desc"), names, ["b", "a", "d", "c"]),
+        (dict(order_by="sold=asc", limit=2), names, ["c", "a"]),
+        (dict(aggregate="qty=sum"), None, 15),
+        (dict(aggregate="price=avg"), None, 280.375),
+        (dict(group_by="active", aggregate="qty=sum"), None,
+         [{"active": "true", "qty (sum)": 3}, {"active": "False", "qty (sum)": 10}, {"active": "false", "qty (sum)": 2}]),
+    ]
+    for query, view, answer in expected:
+        for mode in modes:
+            result = _run(query_args(typed_csv, **query), mode)
+            assert (view(result) if view else result) == answer, (query, mode)
+
+    schema_path = tmp_path / "schema.json"
+    schema_path.write_text(json.dumps({"note": "int?"}), encoding="utf-8")
+    for mode in modes:
+        with pytest.raises(TypeConversionError):
+            _run(query_args(typed_csv, where="note>0", schema=str(schema_path)), mode)
+
+
+def test_mixed_column_does_not_sort_as_text(tmp_path):
+    mixed = tmp_path / "mixed.csv"
+    mixed.write_text('price\n10\n""\nN/A\n7\n', encoding="utf-8")
+    # Выведенная строковая колонка не сортирует числа как текст
+    for kwargs in [dict(), dict(schema_sample=0), dict(limit=2), dict(engine="columnar")]:
+        with pytest.raises(SortError):
+            process_csv(query_args(str(mixed), order_by="price=asc", **kwargs))
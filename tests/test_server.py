@@ -0,0 +1,102 @@
+import asyncio
+import json
+import os
+
+import pytest
+from src.server import DatasetCache, QueryServer, query_argv
+
+
+@pytest.fixture
+def products_csv(tmp_path):
+    path = tmp_path / "products.csv"
+    path.write_text(
+        "name,brand,price,rating\n"
+        "iphone,apple,999,4.9\n"
+        "galaxy,samsung,1199,4.8\n"
+        "redmi,xiaomi,199,4.6\n",
+        encoding="utf-8",
+    )
+    return str(path)
+
+
+def _rows(payload):
+    return [json.loads(line) for line in payload.decode("utf-8").splitlines()]
+
+
+def test_dataset_cache_reloads_and_evicts(products_csv, tmp_path):
+    cache = DatasetCache(memory_budget=1)
+    table = cache.get(products_csv)
+    assert cache.get(products_csv) is table and cache.loads == 1
+    assert not cache.loading
+
+    with open(products_csv, "a", encoding="utf-8") as f:
+        f.write("pixel,google,899,4.7\n")
+    os.utime(products_csv, ns=(0, 0))
+    assert len(cache.get(products_csv)) == 4 and cache.loads == 2
+
+    other = tmp_path / "other.csv"
+    other.write_text("a,b\n1,2\n", encoding="utf-8")
+    cache.get(str(other))
+    assert [entry["file"] for entry in cache.describe()] == [str(other)]
+
+
+def test_query_arguments_match_cli(products_csv):
+    assert query_argv("file=a.csv&where=price>500&aggregate=price=avg&aggregate=rating=max&no_cache", b"") == [
+        "--file", "a.csv", "--where", "price>500", "--aggregate", "price=avg", "--aggregate", "rating=max",
+        "--no-cache",
+    ]
+    assert query_argv("", b'{"args": "--file a.csv --where \'brand=apple\'"}') == ["--file", "a.csv", "--where",
+                                                                                 "brand=apple"]
+
+    server = QueryServer()
+    try:
+        status, _, payload = server.respond("GET", f"/query?file={products_csv}&where=price>500&order_by=price=desc", b"")
+        assert status == 200
+        assert [row["name"] for row in _rows(payload)] == ["galaxy", "iphone"]
+        assert server.respond("GET", f"/query?file={products_csv}&where=price>500&order_by=price=desc", b"")[2] == payload
+        assert json.loads(server.respond("GET", "/cache", b"")[2])["hits"] == 1
+
+        status, content_type, payload = server.respond(
+            "POST", "/query", json.dumps({"args": ["--file", products_csv, "--aggregate", "price=max",
+                                                   "--output-format", "csv"]}).encode())
+        assert (status, content_type) == (200, "text/csv; charset=utf-8")
+        assert payload.decode().splitlines() == ["price (maximum)", "1199"]
+
+        for query, code in [(f"file={products_csv}&where=weight>1", 401), (f"file={products_csv}&stats", 102),
+                            (f"file={products_csv}&order_by=price", 102), ("file=missing.csv", 101)]:
+            status, _, payload = server.respond("GET", f"/query?{query}", b"")
+            assert status == 400 and json.loads(payload)["code"] == code
+    finally:
+        server.close()
+
+
+def test_server_answers_concurrent_requests(products_csv):
+    async def request(port, path, headers=""):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(f"GET {path} HTTP/1.1\r\nHost: test\r\n{headers}Connection: close\r\n\r\n".encode())
+        await writer.drain()
+        response = await reader.read()
+        writer.close()
+        head, _, body = response.partition(b"\r\n\r\n")
+        return head.split(b"\r\n")[0], body
+
+    async def run():
+        server = QueryServer()
+        listener = await server.start(port=0)
+        port = listener.sockets[0].getsockname()[1]
+        try:
+            return await asyncio.gather(*[
+                request(port, f"/query?file={products_csv}&group_by=brand&aggregate=price=sum") for _ in range(8)
+            ] + [request(port, "/missing"), request(port, "/cache", "Content-Length: ten\r\n")])
+        finally:
+            listener.close()
+            await listener.wait_closed()
+            server.close()
+
+    *answers, missing, malformed = asyncio.run(run())
+    for status, body in answers:
+        assert status == b"HTTP/1.1 200 OK"
+        assert _rows(body) == [{"brand": "apple", "price (sum)": 999}, {"brand": "samsung", "price (sum)": 1199},
+                               {"brand": "xiaomi", "price (sum)": 199}]
+    assert missing[0] == b"HTTP/1.1 404 Not Found"
+    assert malformed[0] == b"HTTP/1.1 400 Bad Request" and b"Content-Length" in malformed[1]
@@ -0,0 +1,70 @@
+import pytest
+from argparse import Namespace
+from src.csv_processor import read_csv, apply_sort, iter_csv, process_csv
+from src.exceptions import ColumnNotFoundError, SortError
+from src.sorting import top_k
+
+
+@pytest.fixture
+def sample_csv_path():
+    return "tests/test_data/products.csv"
+
+
+def test_top_k_matches_sorted_prefix(sample_csv_path):
+    rows = read_csv(sample_csv_path)
+
+    for condition in ["price=desc", "price=asc", "rating=desc", "rating=asc", "brand=asc"]:
+        for k in (1, 3, 10, 20):
+            assert top_k(iter_csv(sample_csv_path), condition, k) == apply_sort(rows, condition)[:k]
+
+    assert top_k(iter([]), "price=desc", 3) == []
+    with pytest.raises(ColumnNotFoundError):
+        top_k(iter_csv(sample_csv_path), "weight=desc", 3)
+    with pytest.raises(SortError):
+        top_k(iter_csv(sample_csv_path), "price=up", 3)
+
+
+def test_limit_in_pipeline(sample_csv_path):
+    def run(**kwargs):
+        values = dict(file=sample_csv_path, where=None, order_by=None, aggregate=None, engine="python", limit=None)
+        values.update(kwargs)
+        return process_csv(Namespace(**values))
+
+    top = run(where="brand!=xiaomi", order_by="rating=desc", limit=2)
+    assert [row["name"] for row in top] == ["iphone 15 pro", "galaxy s23 ultra"]
+    assert run(order_by="price=asc", limit=3, engine="columnar") == run(order_by="price=asc")[:3]
+    assert len(run(limit=4)) == 4
+    assert run(aggregate="price=max", limit=1) == 1199
+
+
+@pytest.mark.parametrize("fan_in", [64, 2])
+def test_external_sort_matches_in_memory(tmp_path, monkeypatch, fan_in):
+    from src import sorting
+
+    monkeypatch.setattr(sorting, "MERGE_FAN_IN", fan_in)
+    path = tmp_path / "dups.csv"
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("id,group,score\n")
+        for i in range(3000):
+            f.write(f"{i},g{i % 13},{(i * 7) % 50 / 2}\n")
+
+    rows = read_csv(str(path))
+    spilled = []
+    original = sorting._write_run
+    monkeypatch.setattr(sorting, "_write_run", lambda entries: spilled.append(1) or original(entries))
+
+    for condition in ["score=asc", "score=desc", "group=desc"]:
+        result = list(sorting.external_sort(iter_csv(str(path)), condition, memory_limit=16 << 10))
+        assert result == apply_sort(rows, condition)
+    assert len(spilled) > 3
+
+    with pytest.raises(SortError):
+        list(sorting.external_sort(iter([{"v": "1"}, {"v": "a"}] * 100), "v=asc", memory_limit=1024))
+
+
+def test_sort_memory_argument():
+    from src.cli import memory_size
+
+    assert memory_size("512M") == 512 << 20
+    assert memory_size("1.5g") == 3 << 29
+    assert memory_size("4096") == 4096
@@ -0,0 +1,57 @@
+import io
+import json
+import sys
+from src.csv_processor import process_csv
+from src.stats import Recorder, profiled
+from tests.conftest import query_args
+
+PRODUCTS = "tests/test_data/products.csv"
+
+
+def test_recorder_tracks_each_stage():
+    args = query_args(PRODUCTS, where="brand=apple", order_by="price=desc", limit=2)
+    recorder = Recorder()
+    result = process_csv(args, recorder)
+    recorder.finish()
+
+    assert result == process_csv(args)
+    stages = {stage["stage"]: stage for stage in recorder.as_dict()["stages"]}
+    assert list(stages) == ["read", "where", "order_by", "limit", "collect"]
+    assert stages["read"]["rows_out"] == 10 and stages["read"]["bytes_read"] > 0
+    assert (stages["where"]["rows_in"], stages["where"]["rows_out"]) == (10, 4)
+    assert (stages["order_by"]["rows_in"], stages["order_by"]["rows_out"]) == (4, 2)
+    assert all(stage["seconds"] >= 0 for stage in stages.values())
+    assert sum(stage["seconds"] for stage in stages.values()) <= recorder.total_seconds
+    assert "where" in recorder.format()
+
+
+def test_recorder_scalar_aggregate():
+    recorder = Recorder()
+    assert process_csv(query_args(PRODUCTS, aggregate="price=min"), recorder) == 149
+    assert [(stage.name, stage.rows_in, stage.rows_out) for stage in recorder.stages] == [
+        ("read", None, 10), ("aggregate", 10, 1)
+    ]
+
+
+def test_profiled_prints_hot_spots():
+    stream = io.StringIO()
+    with profiled(True, stream):
+        process_csv(query_args(PRODUCTS, where="price>500"))
+    assert "cumulative" in stream.getvalue()
+    assert "iter_filter" in stream.getvalue()
+
+
+def test_cli_stats(capsys, monkeypatch, tmp_path):
+    path = tmp_path / "stats.json"
+    monkeypatch.setattr(sys, 'argv', [
+        'main.py', '--file', 'tests/test_data/products.csv', '--where', 'price>500', '--stats',
+        '--stats-json', str(path)
+    ])
+
+    from main import main
+    main()
+
+    captured = capsys.readouterr()
+    assert "iphone 15 pro" in captured.out
+    assert "render" in captured.err
+    assert [stage["stage"] for stage in json.loads(path.read_text())["stages"]] == ["read", "where", "render"]
@@ -0,0 +1,81 @@
+import tracemalloc
+import pytest
+from src.csv_processor import read_csv, apply_filter, aggregate_data, apply_sort, group_aggregate
+from src.exceptions import ColumnNotFoundError, AggregationError, SortError
+from src.table import read_table, NumericColumn, StringColumn
+
+
+@pytest.fixture
+def sample_csv_path():
+    return "tests/test_data/products.csv"
+
+
+def _peak_memory(func, *args):
+    tracemalloc.start()
+    try:
+        result = func(*args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, peak
+
+
+def test_read_table_roundtrip(sample_csv_path):
+    table = read_table(sample_csv_path)
+
+    assert len(table) == 10
+    assert isinstance(table.columns["price"], NumericColumn)
+    assert table.columns["rating"].kind == "float"
+    assert isinstance(table.columns["brand"], StringColumn)
+    assert list(table) == read_csv(sample_csv_path)
+
+
+def test_table_operations_match_rows(sample_csv_path):
+    rows = read_csv(sample_csv_path)
+    table = read_table(sample_csv_path)
+
+    for condition in ["price>500", "brand=Apple", "brand!=apple", "rating<=4.2", "name>iphone"]:
+        assert list(apply_filter(table, condition)) == apply_filter(rows, condition)
+
+    for operation in ["price=avg", "rating=avg", "price=min", "rating=max", "price=sum", "rating=stddev",
+                      "price=median", "rating=p90"]:
+        assert aggregate_data(table, operation) == aggregate_data(rows, operation)
+
+    for condition in ["price=desc", "rating=asc", "brand=desc"]:
+        assert list(apply_sort(table, condition)) == apply_sort(rows, condition)
+
+    operations = ["price=avg", "rating=max", "price=min", "rating=median", "price=count"]
+    assert group_aggregate(table, "brand", operations) == group_aggregate(rows, "brand", operations)
+
+    with pytest.raises(ColumnNotFoundError):
+        apply_filter(table, "weight>1")
+    with pytest.raises(AggregationError):
+        aggregate_data(table, "name=avg")
+    with pytest.raises(SortError):
+        apply_sort(table, "price=up")
+
+
+def test_table_preserves_original_text(tmp_path):
+    path = tmp_path / "mixed.csv"
+    path.write_text("qty,score,code\n1,4.50,7\n2,5,x\n 3,1e2,8\n")
+
+    table = read_table(str(path))
+    assert table.columns["qty"].kind == "int"
+    assert table.columns["score"].kind == "float"
+    assert table.columns["code"].kind == "str"
+    assert list(table) == read_csv(str(path))
+
+
+def test_table_uses_less_memory(tmp_path):
+    path = tmp_path / "wide.csv"
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("id,brand,price,rating\n")
+        for i in range(20000):
+            f.write(f"{i},brand{i % 20},{i % 1000},{(i % 50) / 10}\n")
+
+    rows, rows_peak = _peak_memory(read_csv, str(path))
+    table, table_peak = _peak_memory(read_table, str(path))
+
+    assert len(table) == len(rows)
+    assert table.nbytes * 10 < rows_peak
+    assert table_peak * 4 < rows_peak
@@ -0,0 +1,64 @@
+import io
+import json
+from src.csv_processor import read_csv
+from src.writers import write_delimited, write_jsonl, write_binary, read_binary, write_grid
+
+
+def test_delimited_and_jsonl():
+    rows = read_csv("tests/test_data/products.csv")
+
+    stream = io.StringIO()
+    assert write_delimited(iter(rows), stream) == len(rows)
+    lines = stream.getvalue().splitlines()
+    assert lines[0] == "name,brand,price,rating"
+    assert lines[1] == "iphone 15 pro,apple,999,4.9"
+
+    stream = io.StringIO()
+    write_delimited(rows, stream, delimiter='\t')
+    assert stream.getvalue().splitlines()[1] == "iphone 15 pro\tapple\t999\t4.9"
+
+    stream = io.StringIO()
+    assert write_jsonl(iter(rows), stream) == len(rows)
+    assert [json.loads(line) for line in stream.getvalue().splitlines()] == rows
+
+
+def test_binary_round_trip(monkeypatch):
+    monkeypatch.setattr("src.writers.ROW_GROUP_SIZE", 3)
+    rows = read_csv("tests/test_data/products.csv")
+    rows[2]["price"] = "0199"
+    rows.append({"name": None, "brand": "x", "price": "1e3", "rating": "5"})
+
+    stream = io.BytesIO()
+    assert write_binary(iter(rows), stream) == len(rows)
+    stream.seek(0)
+    assert list(read_binary(stream)) == rows
+
+    stream = io.BytesIO()
+    write_binary([{"brand": "apple", "count": 3, "price (average)": 12.5}], stream)
+    stream.seek(0)
+    assert list(read_binary(stream)) == [{"brand": "apple", "count": 3, "price (average)": 12.5}]
+
+
+def test_grid_caps_rows():
+    rows = read_csv("tests/test_data/products.csv")
+
+    stream = io.StringIO()
+    assert write_grid(iter(rows), stream, max_rows=2) == 2
+    output = stream.getvalue()
+    assert "galaxy s23 ultra" in output
+    assert "redmi note 12" not in output
+    assert output.endswith("Showing first 2 rows; "
+                           "use --max-rows 0 or --output-format csv|tsv|jsonl|binary for the full result\n")
+
+    # Остаток не дочитывается: после max_rows + 1 строки итератор не трогается
+    rows_iter = iter(rows)
+    write_grid(rows_iter, io.StringIO(), max_rows=2)
+    assert len(list(rows_iter)) == len(rows) - 3
+
+    stream = io.StringIO()
+    assert write_grid(iter(rows[:2]), stream, max_rows=2) == 2
+    assert "Showing first" not in stream.getvalue()
+
+    stream = io.StringIO()
+    assert write_grid(iter([]), stream) == 0
+    assert stream.getvalue() == "No matching records found\n"